@@ -1,7 +1,52 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Q
+
+from services.pagination import EstimatedCountPaginator
+from services.spatial import mechanic_index
 from .models import MechanicProfile
 
+
 @admin.register(MechanicProfile)
 class MechanicProfileAdmin(admin.ModelAdmin):
-    list_display = ('service_center_name', 'user', 'phone', 'created_at')
+    list_display = ('service_center_name', 'user', 'phone', 'approved', 'is_available', 'created_at')
+    list_filter = ('approved', 'is_available')
+    list_select_related = ('user',)
+    raw_id_fields = ('user',)
+    date_hierarchy = 'created_at'
+    ordering = ('-id',)
+    # Looked up in get_search_results()
     search_fields = ('service_center_name', 'user__username', 'phone')
+    search_help_text = "Start of the service center name (case-sensitive), or an exact username or phone number."
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    show_facets = admin.ShowFacets.NEVER
+    actions = ('approve_selected', 'suspend_selected')
+
+    def get_search_results(self, request, queryset, search_term):
+        # Name prefixes are an index range; usernames and phones are unique.
+        # See ServiceRequestAdmin for why user ids are fetched up front.
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        match = (Q(service_center_name__gte=term, service_center_name__lt=term + '\uffff')
+                 | Q(user__in=list(User.objects.filter(username=term).values_list('pk', flat=True)))
+                 | Q(phone=term))
+        return queryset.filter(match), False
+
+    def _set_approved(self, request, queryset, approved):
+        count = queryset.update(approved=approved)
+        # update() skips the signals that keep the search index current
+        transaction.on_commit(mechanic_index.invalidate)
+        return count
+
+    @admin.action(description="Approve selected mechanics", permissions=['change'])
+    def approve_selected(self, request, queryset):
+        count = self._set_approved(request, queryset, True)
+        self.message_user(request, f"Approved {count} mechanic(s).", messages.SUCCESS)
+
+    @admin.action(description="Suspend selected mechanics", permissions=['change'])
+    def suspend_selected(self, request, queryset):
+        count = self._set_approved(request, queryset, False)
+        self.message_user(request, f"Suspended {count} mechanic(s).", messages.SUCCESS)
@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 02:56
+
+from django.conf import settings
+from django.db import migrations, models
+
+from services.utils import grid_cell
+
+
+def backfill_grid_cells(apps, schema_editor):
+    MechanicProfile = apps.get_model('accounts', 'MechanicProfile')
+    profiles = list(MechanicProfile.objects.exclude(latitude=None).exclude(longitude=None))
+    for profile in profiles:
+        profile.grid_row, profile.grid_col = grid_cell(profile.latitude, profile.longitude)
+    MechanicProfile.objects.bulk_update(profiles, ['grid_row', 'grid_col'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0015_alter_mechanicprofile_phone'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mechanicprofile',
+            name='grid_col',
+            field=models.IntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='mechanicprofile',
+            name='grid_row',
+            field=models.IntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='mechanicprofile',
+            index=models.Index(fields=['grid_row', 'grid_col'], name='mechanic_grid_idx'),
+        ),
+        migrations.RunPython(backfill_grid_cells, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0017_mechanicprofile_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mechanicprofile',
+            name='location_updated_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:19
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0018_mechanicprofile_location_updated_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='mechanicprofile',
+            index=models.Index(condition=models.Q(('approved', True), ('is_available', True)), fields=['latitude', 'longitude'], name='mechanic_available_idx'),
+        ),
+    ]
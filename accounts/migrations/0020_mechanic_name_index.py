@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:30
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0019_mechanicprofile_available_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='mechanicprofile',
+            index=models.Index(fields=['service_center_name'], name='mechanic_name_idx'),
+        ),
+    ]
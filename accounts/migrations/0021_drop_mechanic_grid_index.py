@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:53
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0020_mechanic_name_index'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='mechanicprofile',
+            name='mechanic_grid_idx',
+        ),
+    ]
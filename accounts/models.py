@@ -1,7 +1,10 @@
-
 from django.db import models
 from django.contrib.auth.models import User
-from django.db.models import Avg
+from services.utils import grid_cell
+
+
+RATING_FIELDS = {'rating_sum', 'rating_count', 'rating_avg'}
+
 
 class MechanicProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
@@ -10,14 +13,52 @@ class MechanicProfile(models.Model):
     location = models.CharField(max_length=255)
     latitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
     longitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
+    # Spatial grid cell, kept in sync with latitude/longitude in save()
+    grid_row = models.IntegerField(null=True, blank=True, editable=False)
+    grid_col = models.IntegerField(null=True, blank=True, editable=False)
+    # Set when latitude/longitude come from a live GPS ping rather than the address
+    location_updated_at = models.DateTimeField(null=True, blank=True, editable=False)
     specialization = models.CharField(max_length=255, blank=True, null=True)
     approved = models.BooleanField(default=True)
     is_available = models.BooleanField(default=True)
+    # Feedback aggregates, maintained by services.ratings on every change
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+    rating_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_avg = models.FloatField(default=0.0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Name prefix searches in the admin
+            models.Index(fields=['service_center_name'], name='mechanic_name_idx'),
+            # Only approved, available mechanics are ever searched or dispatched
+            models.Index(fields=['latitude', 'longitude'], name='mechanic_available_idx',
+                         condition=models.Q(approved=True, is_available=True)),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember where the mechanic was so signals can expire cached searches there
+        instance._loaded_cell = (instance.__dict__.get('grid_row'), instance.__dict__.get('grid_col'))
+        return instance
+
+    def save(self, *args, **kwargs):
+        self.grid_row, self.grid_col = grid_cell(self.latitude, self.longitude)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'latitude', 'longitude'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'grid_row', 'grid_col'}
+        elif update_fields is None and not self._state.adding and not args:
+            # Rating totals are only changed through F() updates; never write
+            # back a possibly stale copy from this instance.
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name not in RATING_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
     def average_rating(self):
-        avg = self.feedback_set.aggregate(Avg('rating'))['rating__avg']
-        return round(avg, 1) if avg else 0.0
+        return round(self.rating_avg, 1)
     
     @property
     def rating(self):
@@ -25,4 +66,4 @@ class MechanicProfile(models.Model):
         return self.average_rating()
 
     def __str__(self):
-        return self.service_center_name
\ No newline at end of file
+        return self.service_center_name
@@ -3,7 +3,8 @@ from django.contrib import messages
 from .forms import UserRegistrationForm, MechanicRegistrationForm
 from django.contrib.auth import login
 from django.contrib.auth.decorators import login_required
-from services.models import ServiceRequest
+from roadmech.db_router import replica_reads
+from services.dashboard import mechanic_dashboard_context
 from .models import MechanicProfile
 from utils.geocode import geocode_address
 
@@ -56,6 +57,7 @@ def mechanic_register(request):
     return render(request, 'accounts/mechanic_register.html', {'form': form})
 
 @login_required
+@replica_reads
 def mechanic_dashboard(request):
     # only mechanics should access: ensure they have a MechanicProfile
     try:
@@ -64,16 +66,14 @@ def mechanic_dashboard(request):
         messages.error(request, "You must register as a mechanic to view this page.")
         return redirect('home')
 
-    pending_requests = ServiceRequest.objects.filter(status='Pending')
-    my_accepted = ServiceRequest.objects.filter(mechanic=mp)
-    context = {'pending_requests': pending_requests, 'my_accepted': my_accepted}
+    context = mechanic_dashboard_context(mp)
     return render(request, 'services/mechanic_dashboard.html', context)
 
 
 @login_required
 def redirect_after_login(request):
     # send mechanic to mechanic dashboard
-    if hasattr(request.user, "mechanicprofile"):
+    if request.role.kind == "mechanic":
         return redirect("mechanic_dashboard")
     # normal users go to home
     return redirect("home")
\ No newline at end of file
@@ -0,0 +1,9 @@
+"""
+Standalone performance checks. Run each module with ``python -m``, e.g.
+
+    python -m benchmarks.dispatch --requests 1000 --mechanics 5000
+    python -m benchmarks.load --concurrency 8 -o before.json
+
+They work on a throwaway test database, never the configured one.
+benchmarks.dataset seeds it with synthetic data around real Kerala towns.
+"""
@@ -0,0 +1,144 @@
+"""
+Synthetic Kerala-scale data for the benchmarks.
+
+Mechanics and requests are scattered around real towns, weighted roughly
+by population, so nearby searches see the same clustering as production.
+A few customers file most of the requests, statuses follow the skewed mix
+of a live system (mostly finished work, a thin layer of open requests) and
+satisfied customers leave mostly four- and five-star feedback. Everything
+is written with bulk_create, so rating totals and the mechanic index are
+refreshed explicitly at the end.
+"""
+import os
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'roadmech.settings')
+django.setup()
+
+import numpy as np  # noqa: E402
+from django.contrib.auth.models import User  # noqa: E402
+
+from accounts.models import MechanicProfile  # noqa: E402
+from services.models import Feedback, ServiceRequest  # noqa: E402
+from services.ratings import recompute_ratings  # noqa: E402
+from services.spatial import mechanic_index  # noqa: E402
+from services.utils import grid_cell  # noqa: E402
+
+# (name, latitude, longitude, relative weight)
+TOWNS = [
+    ('Thiruvananthapuram', 8.5241, 76.9366, 10),
+    ('Kochi', 9.9312, 76.2673, 10),
+    ('Kozhikode', 11.2588, 75.7804, 8),
+    ('Thrissur', 10.5276, 76.2144, 6),
+    ('Kollam', 8.8932, 76.6141, 5),
+    ('Malappuram', 11.0510, 76.0711, 5),
+    ('Kannur', 11.8745, 75.3704, 4),
+    ('Palakkad', 10.7867, 76.6548, 4),
+    ('Alappuzha', 9.4981, 76.3388, 4),
+    ('Kottayam', 9.5916, 76.5222, 4),
+    ('Tirur', 10.9146, 75.9215, 2),
+    ('Valanchery', 10.8847, 76.0382, 2),
+    ('Perinthalmanna', 10.9760, 76.2254, 2),
+    ('Kasaragod', 12.5102, 74.9852, 2),
+    ('Pathanamthitta', 9.2648, 76.7870, 2),
+    ('Kuttippuram', 10.8440, 76.0339, 1),
+    ('Kalpetta', 11.6085, 76.0830, 1),
+    ('Painavu', 9.8497, 76.9725, 1),
+]
+# Spread around a town centre, in degrees (about 5 km)
+TOWN_SPREAD_DEG = 0.05
+
+STATUS_MIX = {'Completed': 0.55, 'Cancelled': 0.15, 'Pending': 0.12, 'Accepted': 0.10, 'Rejected': 0.08}
+# Share of pending requests nobody has been assigned to yet
+UNASSIGNED_PENDING = 0.5
+FEEDBACK_RATE = 0.6
+RATING_MIX = [0.04, 0.06, 0.15, 0.35, 0.40]  # one to five stars
+
+SERVICE_TYPES = [s for s, _ in ServiceRequest.SERVICE_CHOICES]
+VEHICLE_TYPES = [v for v, _ in ServiceRequest.VEHICLE_CHOICES]
+
+
+def _town_weights():
+    weights = np.array([town[3] for town in TOWNS], dtype=float)
+    return weights / weights.sum()
+
+
+def _scatter(rng, towns):
+    """Coordinates around the centres of the given town indexes."""
+    centres = np.array([TOWNS[t][1:3] for t in towns])
+    points = centres + rng.normal(0, TOWN_SPREAD_DEG, centres.shape)
+    return points[:, 0].round(6), points[:, 1].round(6)
+
+
+def seed(customers=2000, mechanics=1500, requests=30000, seed=0, batch_size=2000):
+    """Fill the current database and return how many rows of each kind were written."""
+    rng = np.random.default_rng(seed)
+    town_weights = _town_weights()
+
+    users = User.objects.bulk_create(
+        [User(username=f'customer{i}') for i in range(customers)]
+        + [User(username=f'mechanic{i}') for i in range(mechanics)],
+        batch_size=batch_size,
+    )
+    customer_users, mechanic_users = users[:customers], users[customers:]
+
+    mechanic_towns = rng.choice(len(TOWNS), mechanics, p=town_weights)
+    lats, lons = _scatter(rng, mechanic_towns)
+    cells = [grid_cell(lat, lon) for lat, lon in zip(lats, lons)]
+    profiles = MechanicProfile.objects.bulk_create([
+        MechanicProfile(
+            user=user, service_center_name=f'{TOWNS[town][0]} Auto Care {i}', phone=f'9{i:09d}',
+            location=TOWNS[town][0], latitude=lat, longitude=lon, grid_row=row, grid_col=col,
+            approved=rng.random() > 0.05, is_available=rng.random() > 0.2,
+        )
+        for i, (user, town, lat, lon, (row, col))
+        in enumerate(zip(mechanic_users, mechanic_towns, lats, lons, cells))
+    ], batch_size=batch_size)
+    by_town = {}
+    for profile, town in zip(profiles, mechanic_towns):
+        by_town.setdefault(town, []).append(profile)
+
+    # A long tail: the first customers file far more requests than the rest
+    customer_weights = 1 / np.arange(1, customers + 1) ** 0.8
+    customer_weights /= customer_weights.sum()
+    request_customers = rng.choice(customers, requests, p=customer_weights)
+    request_towns = rng.choice(len(TOWNS), requests, p=town_weights)
+    statuses = rng.choice(list(STATUS_MIX), requests, p=list(STATUS_MIX.values()))
+    lats, lons = _scatter(rng, request_towns)
+
+    service_requests = []
+    for customer, town, status, lat, lon in zip(request_customers, request_towns, statuses.tolist(), lats, lons):
+        mechanic = None
+        if status != 'Pending' or rng.random() >= UNASSIGNED_PENDING:
+            nearby = by_town.get(town) or profiles
+            mechanic = nearby[rng.integers(len(nearby))]
+        service_requests.append(ServiceRequest(
+            user=customer_users[customer], mechanic=mechanic, status=status,
+            vehicle_type=VEHICLE_TYPES[rng.integers(len(VEHICLE_TYPES))],
+            service_type=SERVICE_TYPES[rng.integers(len(SERVICE_TYPES))],
+            location=f'Near {TOWNS[town][0]} bus stand', latitude=lat, longitude=lon,
+            phone_number=f'98{rng.integers(10**8):08d}',
+        ))
+    service_requests = ServiceRequest.objects.bulk_create(service_requests, batch_size=batch_size)
+
+    completed = [r for r in service_requests if r.status == 'Completed']
+    reviewed = [r for r in completed if rng.random() < FEEDBACK_RATE]
+    ratings = rng.choice(np.arange(1, 6), len(reviewed), p=RATING_MIX)
+    Feedback.objects.bulk_create([
+        Feedback(user=r.user, mechanic=r.mechanic, service_request=r, rating=int(rating),
+                 comment='Quick and fair.' if rating >= 4 else 'Took a while to arrive.')
+        for r, rating in zip(reviewed, ratings)
+    ], batch_size=batch_size)
+
+    # bulk_create skips the signals that keep these current
+    recompute_ratings(MechanicProfile.objects.all(), Feedback)
+    mechanic_index.invalidate()
+
+    return {
+        'customers': customers,
+        'mechanics': mechanics,
+        'requests': requests,
+        'feedback': len(reviewed),
+        'statuses': {status: int((statuses == status).sum()) for status in STATUS_MIX},
+    }
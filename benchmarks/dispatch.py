@@ -0,0 +1,116 @@
+"""
+Time one dispatch tick over a synthetic backlog.
+
+Creates a throwaway file-backed test database, fills it with random mechanics and
+pending requests around central Kerala, then reports how long the cost
+matrix, the solver and the whole tick (queries and writes included) take
+compared with the tick budget. Exits non-zero if the tick is over budget.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'roadmech.settings')
+django.setup()
+
+import numpy as np  # noqa: E402
+from django.contrib.auth.models import User  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test.utils import setup_test_environment  # noqa: E402
+
+from accounts.models import MechanicProfile  # noqa: E402
+from services import dispatch  # noqa: E402
+from services.models import ServiceRequest  # noqa: E402
+
+# Bounding box of the synthetic data: lat/lon ranges around Malappuram
+LAT_RANGE = (10.5, 11.5)
+LON_RANGE = (75.8, 76.5)
+
+
+def populate(n_requests, n_mechanics, seed):
+    rng = np.random.default_rng(seed)
+    users = User.objects.bulk_create(
+        [User(username=f'bench-mechanic-{i}') for i in range(n_mechanics)]
+        + [User(username='bench-customer')],
+        batch_size=1000,
+    )
+    customer = users[-1]
+    lats, lons = rng.uniform(*LAT_RANGE, n_mechanics), rng.uniform(*LON_RANGE, n_mechanics)
+    MechanicProfile.objects.bulk_create([
+        MechanicProfile(
+            user=user, service_center_name=f'Bench Garage {i}', phone=f'9{i:09d}',
+            location='Benchmark', latitude=round(lat, 6), longitude=round(lon, 6),
+            rating_sum=int(rating * 10), rating_count=10, rating_avg=rating,
+        )
+        for i, (user, lat, lon, rating) in enumerate(
+            zip(users, lats, lons, rng.uniform(2.5, 5.0, n_mechanics)))
+    ], batch_size=1000)
+    lats, lons = rng.uniform(*LAT_RANGE, n_requests), rng.uniform(*LON_RANGE, n_requests)
+    ServiceRequest.objects.bulk_create([
+        ServiceRequest(user=customer, vehicle_type='car', service_type='fuel', location='Benchmark',
+                       latitude=round(lat, 6), longitude=round(lon, 6))
+        for lat, lon in zip(lats, lons)
+    ], batch_size=1000)
+
+
+def run(n_requests, n_mechanics, seed):
+    populate(n_requests, n_mechanics, seed)
+
+    mechanics = dispatch._available_mechanics()
+    requests = dispatch._pending_requests()
+    _, mech_lats, mech_lons, ratings, workloads = zip(*mechanics)
+    started = time.perf_counter()
+    costs = dispatch.build_costs(
+        [float(r.latitude) for r in requests], [float(r.longitude) for r in requests],
+        mech_lats, mech_lons, ratings, workloads,
+    )
+    built = time.perf_counter()
+    dispatch.solve(costs)
+    solved = time.perf_counter()
+
+    started_tick = time.perf_counter()
+    assigned = dispatch.dispatch_pending()
+    tick = time.perf_counter() - started_tick
+
+    return {
+        'requests': n_requests,
+        'mechanics': n_mechanics,
+        'assigned': len(assigned),
+        'cost_matrix_s': round(built - started, 4),
+        'solve_s': round(solved - built, 4),
+        'tick_s': round(tick, 4),
+        'budget_s': dispatch.TICK_SECONDS,
+        'within_budget': tick <= dispatch.TICK_SECONDS,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--mechanics', type=int, default=5000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    setup_test_environment()
+    # A file, not SQLite's in-memory test database, so commits and the
+    # on_commit version bumps pay real I/O as they do in production
+    with tempfile.TemporaryDirectory() as tmp:
+        old_name = connection.settings_dict['NAME']
+        connection.settings_dict['TEST']['NAME'] = os.path.join(tmp, 'benchmark.sqlite3')
+        connection.creation.create_test_db(verbosity=0, serialize=False)
+        try:
+            result = run(args.requests, args.mechanics, args.seed)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    print(json.dumps(result, indent=2))
+    return 0 if result['within_budget'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,231 @@
+"""
+Latency and throughput of the main views under concurrent load.
+
+Creates a throwaway SQLite test database (a real file, so WAL and the
+writer lock behave as in production), seeds it with benchmarks.dataset,
+then drives each scenario in-process through the Django test client from
+--concurrency threads. Every worker thread is logged in as its own busy
+customer and busy mechanic. Prints one JSON document with p50/p95/p99
+latency, queries per request and throughput per scenario, tagged with
+the current commit so runs can be compared.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'roadmech.settings')
+django.setup()
+
+import numpy as np  # noqa: E402
+from django.contrib.auth.models import User  # noqa: E402
+from django.db import connection, connections  # noqa: E402
+from django.db.models import Count  # noqa: E402
+from django.test import Client  # noqa: E402
+from django.test.utils import override_settings  # noqa: E402
+from django.urls import reverse  # noqa: E402
+
+from accounts.models import MechanicProfile  # noqa: E402
+from benchmarks import dataset  # noqa: E402
+from roadmech.query_log import record_queries  # noqa: E402
+from services.models import ServiceRequest  # noqa: E402
+
+
+# ---------------- Workers ----------------
+class Worker:
+    """One simulated client: a logged-in customer and a logged-in mechanic."""
+
+    def __init__(self, customer, mechanic, accept_ids, seed):
+        self.rng = np.random.default_rng(seed)
+        self.customer = Client()
+        self.customer.force_login(customer)
+        self.mechanic = Client()
+        self.mechanic.force_login(mechanic.user)
+        self.request_ids = list(
+            ServiceRequest.objects.filter(user=customer).order_by('-id').values_list('id', flat=True)[:50]
+        )
+        # Pending requests assigned to this mechanic, one per accept_request call
+        self.accept_ids = accept_ids
+
+    def town_point(self):
+        _, lat, lon, _ = dataset.TOWNS[self.rng.integers(len(dataset.TOWNS))]
+        return lat + self.rng.normal(0, 0.02), lon + self.rng.normal(0, 0.02)
+
+
+def make_workers(concurrency, accepts_per_worker, seed):
+    customers = User.objects.filter(username__startswith='customer').annotate(
+        requests=Count('servicerequest')
+    ).order_by('-requests')[:concurrency]
+    mechanics = MechanicProfile.objects.filter(approved=True).select_related('user').annotate(
+        requests=Count('servicerequest')
+    ).order_by('-requests')[:concurrency]
+
+    workers = []
+    for i, (customer, mechanic) in enumerate(zip(customers, mechanics)):
+        pool = ServiceRequest.objects.bulk_create([
+            ServiceRequest(user=customer, mechanic=mechanic, status='Pending', vehicle_type='car',
+                           service_type='battery', location='Benchmark accept pool')
+            for _ in range(accepts_per_worker)
+        ])
+        workers.append(Worker(customer, mechanic, [r.pk for r in pool], seed + i))
+    return workers
+
+
+# ---------------- Scenarios ----------------
+def nearby_mechanics(worker):
+    request_id = worker.request_ids[worker.rng.integers(len(worker.request_ids))]
+    return worker.customer.get(reverse('nearby_mechanics', args=[request_id]))
+
+
+def search_mechanics(worker):
+    lat, lon = worker.town_point()
+    return worker.customer.get(reverse('search_mechanics'), {'lat': lat, 'lon': lon, 'radius': 20})
+
+
+def user_dashboard(worker):
+    return worker.customer.get(reverse('user_dashboard'))
+
+
+def mechanic_dashboard(worker):
+    return worker.mechanic.get(reverse('mechanic_dashboard'))
+
+
+def service_history(worker):
+    return worker.customer.get(reverse('service_history'))
+
+
+def request_service(worker):
+    lat, lon = worker.town_point()
+    return worker.customer.post(reverse('request_service') + '?vehicle=car', {
+        'service_type': 'fuel', 'vehicle_brand': 'Maruti', 'vehicle_model': 'Swift', 'vehicle_year': 2019,
+        'vehicle_number': 'KL 10 AB 1234', 'owner_name': 'Bench Customer', 'phone_number': '9876543210',
+        'location': 'NH 66 near the Kuttippuram bridge', 'latitude': f'{lat:.6f}', 'longitude': f'{lon:.6f}',
+    })
+
+
+def accept_request(worker):
+    return worker.mechanic.post(reverse('accept_request', args=[worker.accept_ids.pop()]))
+
+
+# name -> (view driver, expected status code)
+SCENARIOS = {
+    'nearby_mechanics': (nearby_mechanics, 200),
+    'search_mechanics': (search_mechanics, 200),
+    'user_dashboard': (user_dashboard, 200),
+    'mechanic_dashboard': (mechanic_dashboard, 200),
+    'service_history': (service_history, 200),
+    'request_service': (request_service, 302),
+    'accept_request': (accept_request, 302),
+}
+
+
+# ---------------- Measurement ----------------
+def run_scenario(name, workers, iterations, warmup):
+    drive, expected = SCENARIOS[name]
+    ready = threading.Barrier(len(workers))
+
+    def work(worker):
+        try:
+            for _ in range(warmup):
+                drive(worker)
+            ready.wait()
+            samples = []
+            started = time.perf_counter()
+            for _ in range(iterations):
+                with record_queries() as recorder:
+                    start = time.perf_counter()
+                    response = drive(worker)
+                    elapsed = time.perf_counter() - start
+                samples.append((elapsed, recorder.count, response.status_code == expected))
+            return started, time.perf_counter(), samples
+        finally:
+            connections.close_all()
+
+    with ThreadPoolExecutor(len(workers)) as pool:
+        results = list(pool.map(work, workers))
+
+    wall = max(end for _, end, _ in results) - min(start for start, _, _ in results)
+    samples = [sample for _, _, worker_samples in results for sample in worker_samples]
+    latencies = np.array([elapsed for elapsed, _, _ in samples]) * 1000
+    queries = np.array([count for _, count, _ in samples])
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    return {
+        'requests': len(samples),
+        'errors': sum(not ok for _, _, ok in samples),
+        'p50_ms': round(p50, 2),
+        'p95_ms': round(p95, 2),
+        'p99_ms': round(p99, 2),
+        'mean_ms': round(latencies.mean(), 2),
+        'queries_per_request': round(queries.mean(), 2),
+        'max_queries': int(queries.max()),
+        'throughput_rps': round(len(samples) / wall, 1),
+    }
+
+
+def current_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    started = time.perf_counter()
+    seeded = dataset.seed(args.customers, args.mechanics, args.requests, args.seed)
+    seed_s = time.perf_counter() - started
+
+    workers = make_workers(args.concurrency, args.warmup + args.iterations, args.seed)
+    scenarios = {name: run_scenario(name, workers, args.iterations, args.warmup) for name in args.scenarios}
+    return {
+        'commit': current_commit(),
+        'config': {
+            'concurrency': len(workers),
+            'iterations': args.iterations,
+            'warmup': args.warmup,
+            'seed': args.seed,
+        },
+        'dataset': dict(seeded, seed_s=round(seed_s, 2)),
+        'scenarios': scenarios,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--customers', type=int, default=2000)
+    parser.add_argument('--mechanics', type=int, default=1500)
+    parser.add_argument('--requests', type=int, default=30000)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--iterations', type=int, default=50, help="Measured requests per worker and scenario.")
+    parser.add_argument('--warmup', type=int, default=5, help="Unmeasured requests per worker first.")
+    parser.add_argument('--scenarios', nargs='+', choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('-o', '--output', help="Also write the JSON report to this file.")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp, override_settings(DEBUG=False, ALLOWED_HOSTS=['testserver']):
+        old_name = connection.settings_dict['NAME']
+        connection.settings_dict['TEST']['NAME'] = os.path.join(tmp, 'benchmark.sqlite3')
+        connection.creation.create_test_db(verbosity=0, serialize=False)
+        try:
+            result = run(args)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    report = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(report + '\n')
+    print(report)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -3,6 +3,11 @@ ASGI config for roadmech project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Serve it with an ASGI server (e.g. ``uvicorn roadmech.asgi:application``) to
+enable the live mechanic dashboard: its Server-Sent Events stream holds a
+connection open per dashboard tab, which only an event loop can do cheaply.
+Under WSGI the stream endpoint declines and dashboards fall back to polling.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -1,9 +1,10 @@
 # roadmech/context_processors.py
+from .middleware import resolve_role
+
 
 def user_type(request):
     """Adds user_type to context to check if user is a mechanic."""
-    if request.user.is_authenticated:
-        if hasattr(request.user, "mechanicprofile"):
-            return {"user_type": "mechanic"}
-        return {"user_type": "user"}
+    role = getattr(request, 'role', None) or resolve_role(request)
+    if role.kind:
+        return {"user_type": role.kind}
     return {}
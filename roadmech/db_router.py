@@ -0,0 +1,57 @@
+# roadmech/db_router.py
+"""
+Primary/replica routing.
+
+Writes always go to the primary ("default"). Reads go to the primary too,
+except inside views decorated with @replica_reads, whose GET requests read
+from the replica alias when one is configured. A client that has just
+POSTed is pinned to the primary for a few seconds (see
+PrimaryStickinessMiddleware) so they always see their own writes.
+"""
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.db import connections
+
+REPLICA_ALIAS = 'replica'
+STICKY_COOKIE = 'use_primary'
+# How long after a write a client keeps reading from the primary
+STICKY_SECONDS = getattr(settings, 'REPLICA_STICKY_SECONDS', 10)
+
+_read_alias = ContextVar('read_alias', default=None)
+
+
+def replica_configured():
+    return REPLICA_ALIAS in connections
+
+
+def replica_reads(view):
+    """Serve the view's GET/HEAD reads from the replica unless the client is pinned."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if (request.method not in ('GET', 'HEAD') or STICKY_COOKIE in request.COOKIES
+                or not replica_configured()):
+            return view(request, *args, **kwargs)
+        token = _read_alias.set(REPLICA_ALIAS)
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            _read_alias.reset(token)
+    return wrapper
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        # None lets Django fall back to the primary (or the instance's own db)
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return {obj1._state.db, obj2._state.db} <= {'default', REPLICA_ALIAS}
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica is a copy of the primary, schema included
+        return True
@@ -0,0 +1,106 @@
+# roadmech/middleware.py
+import logging
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils.functional import SimpleLazyObject
+
+from accounts.models import MechanicProfile
+from . import query_log, template_profiler
+from .db_router import STICKY_COOKIE, STICKY_SECONDS, replica_configured
+
+logger = logging.getLogger('roadmech.templates')
+
+ROLE_SESSION_KEY = '_role'
+
+# kind is 'mechanic', 'user', or None for anonymous visitors
+Role = namedtuple('Role', ['kind', 'mechanic_id'])
+ANONYMOUS = Role(None, None)
+
+
+def resolve_role(request):
+    """
+    The user's role, cached in the session. The cached copy is stamped with
+    the user's last_login, which the MechanicProfile create and delete
+    signals move forward, so a warm lookup needs no query beyond loading the
+    user itself.
+    """
+    user = request.user
+    if not user.is_authenticated:
+        return ANONYMOUS
+    stamp = user.last_login.isoformat() if user.last_login else None
+    cached = request.session.get(ROLE_SESSION_KEY)
+    if cached and cached[:2] == [user.pk, stamp]:
+        return Role(*cached[2:])
+
+    mechanic_id = MechanicProfile.objects.filter(user_id=user.pk).values_list('id', flat=True).first()
+    role = Role('mechanic' if mechanic_id else 'user', mechanic_id)
+    request.session[ROLE_SESSION_KEY] = [user.pk, stamp, *role]
+    return role
+
+
+class RoleMiddleware:
+    """Set request.role, resolved on first use. Needs AuthenticationMiddleware."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.role = SimpleLazyObject(lambda: resolve_role(request))
+        return self.get_response(request)
+
+
+class PrimaryStickinessMiddleware:
+    """After any write request, pin the client's reads to the primary for a while."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if request.method not in ('GET', 'HEAD', 'OPTIONS') and replica_configured():
+            response.set_cookie(STICKY_COOKIE, '1', max_age=STICKY_SECONDS,
+                                httponly=True, samesite='Lax')
+        return response
+
+
+class TemplateProfileMiddleware:
+    """
+    With TEMPLATE_PROFILING on, time every template a response renders,
+    report the slowest in a Server-Timing header and log the full table.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'TEMPLATE_PROFILING', False):
+            raise MiddlewareNotUsed
+        template_profiler.install()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with template_profiler.profile() as timings:
+            response = self.get_response(request)
+        if timings.stats:
+            response['Server-Timing'] = timings.server_timing()
+            logger.info("Template render times for %s:\n%s", request.path, timings.report())
+        return response
+
+
+class QueryLogMiddleware:
+    """
+    With QUERY_LOGGING on, record every query a request runs and log its
+    count, time and repeated fingerprints (likely N+1s) as one JSON line.
+    Queries run while a streaming response is consumed are not included.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'QUERY_LOGGING', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.threshold = getattr(settings, 'QUERY_REPEAT_THRESHOLD', query_log.N_PLUS_ONE_THRESHOLD)
+
+    def __call__(self, request):
+        with query_log.record_queries() as recorder:
+            response = self.get_response(request)
+        query_log.log_request(request, response, recorder, self.threshold)
+        return response
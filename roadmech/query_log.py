@@ -0,0 +1,118 @@
+# roadmech/query_log.py
+"""
+Per-request SQL instrumentation.
+
+QueryRecorder is a connection.execute_wrapper() that times every query and
+groups it by fingerprint: the SQL with literals and IN lists collapsed, so
+the same statement run for different rows counts as one shape. A
+fingerprint seen N_PLUS_ONE_THRESHOLD or more times in one request is
+almost always a query per row of some list, the classic N+1.
+
+QueryLogMiddleware (QUERY_LOGGING setting) writes one JSON line per request
+to the roadmech.queries logger. Tests use query_budget() to pin how many
+queries a view may run and to fail on repeated fingerprints.
+"""
+import json
+import logging
+import re
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.db import connections
+
+logger = logging.getLogger('roadmech.queries')
+
+N_PLUS_ONE_THRESHOLD = 5
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER_LIST = re.compile(r'\((?:\s*(?:%s|\?)\s*,)+\s*(?:%s|\?)\s*\)')
+_SPACE = re.compile(r'\s+')
+
+
+def fingerprint(sql):
+    """SQL with literals replaced by ? and IN (...) lists of any length folded."""
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = sql.replace('%s', '?')
+    sql = _PLACEHOLDER_LIST.sub('(...)', sql)
+    return _SPACE.sub(' ', sql).strip()
+
+
+class QueryRecorder:
+    """execute_wrapper that collects count and time per fingerprint."""
+
+    def __init__(self):
+        # fingerprint -> [count, seconds]
+        self.fingerprints = {}
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            entry = self.fingerprints.setdefault(fingerprint(sql), [0, 0.0])
+            entry[0] += 1
+            entry[1] += elapsed
+            self.count += 1
+            self.seconds += elapsed
+
+    def repeated(self, threshold=N_PLUS_ONE_THRESHOLD):
+        """[(fingerprint, count, seconds)] run at least `threshold` times, most first."""
+        found = [(sql, count, seconds) for sql, (count, seconds) in self.fingerprints.items()
+                 if count >= threshold]
+        return sorted(found, key=lambda row: row[1], reverse=True)
+
+    def summary(self, threshold=N_PLUS_ONE_THRESHOLD):
+        return {
+            'queries': self.count,
+            'time_ms': round(self.seconds * 1000, 2),
+            'fingerprints': len(self.fingerprints),
+            'n_plus_one': [
+                {'sql': sql, 'count': count, 'time_ms': round(seconds * 1000, 2)}
+                for sql, count, seconds in self.repeated(threshold)
+            ],
+        }
+
+
+@contextmanager
+def record_queries(using=None):
+    """Record the queries run on `using` (default: every configured database)."""
+    recorder = QueryRecorder()
+    aliases = [using] if using else list(connections)
+    with ExitStack() as stack:
+        for alias in aliases:
+            stack.enter_context(connections[alias].execute_wrapper(recorder))
+        yield recorder
+
+
+@contextmanager
+def query_budget(test_case, max_queries, max_repeats=N_PLUS_ONE_THRESHOLD - 1, using=None):
+    """
+    Fail test_case if the block runs more than max_queries queries, or any
+    single fingerprint more than max_repeats times.
+    """
+    with record_queries(using) as recorder:
+        yield recorder
+    if recorder.count > max_queries:
+        shapes = '\n'.join(f'{count}x {sql}' for sql, (count, _) in recorder.fingerprints.items())
+        test_case.fail(f"{recorder.count} queries run, budget is {max_queries}:\n{shapes}")
+    repeated = recorder.repeated(max_repeats + 1)
+    if repeated:
+        shapes = '\n'.join(f'{count}x {sql}' for sql, count, _ in repeated)
+        test_case.fail(f"Query repeated more than {max_repeats} times (N+1?):\n{shapes}")
+
+
+def log_request(request, response, recorder, threshold=N_PLUS_ONE_THRESHOLD):
+    """Write the structured log line for one request."""
+    line = {
+        'method': request.method,
+        'path': request.path,
+        'status': response.status_code,
+        **recorder.summary(threshold),
+    }
+    level = logging.WARNING if line['n_plus_one'] else logging.INFO
+    logger.log(level, json.dumps(line))
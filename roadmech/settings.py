@@ -31,13 +31,17 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'roadmech.middleware.QueryLogMiddleware',
+    'roadmech.middleware.TemplateProfileMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'roadmech.middleware.RoleMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'roadmech.middleware.PrimaryStickinessMiddleware',
 ]
 
 ROOT_URLCONF = 'roadmech.urls'
@@ -45,8 +49,20 @@ TEMPLATES = [
     {
         "BACKEND": "django.template.backends.django.DjangoTemplates",
         "DIRS": [BASE_DIR / "templates"],
-        "APP_DIRS": True,
         "OPTIONS": {
+            # Compile each template once per process (reset by runserver's
+            # autoreloader when a template changes). Always on, unlike the
+            # ROADMECH_TEMPLATE_PERF fragment caching below: since Django 4.1
+            # this is what Django uses anyway when no loaders are given, so
+            # listing it only makes the default explicit, and it never
+            # serves stale output because it caches compiled templates, not
+            # rendered ones.
+            "loaders": [
+                ("django.template.loaders.cached.Loader", [
+                    "django.template.loaders.filesystem.Loader",
+                    "django.template.loaders.app_directories.Loader",
+                ]),
+            ],
             "context_processors": [
                 "django.template.context_processors.debug",
                 "django.template.context_processors.request",
@@ -59,15 +75,75 @@ TEMPLATES = [
 ]
 
 
+# Template performance mode (ROADMECH_TEMPLATE_PERF=1): {% cache %} fragments
+# on the mechanic detail and dashboard pages are stored in the
+# "template_fragments" cache. Otherwise that cache is a dummy and every
+# fragment renders fresh. ROADMECH_TEMPLATE_PROFILING=1 times each template
+# and reports it in a Server-Timing header and the roadmech.templates log.
+TEMPLATE_PERFORMANCE = os.environ.get('ROADMECH_TEMPLATE_PERF') == '1'
+TEMPLATE_PROFILING = os.environ.get('ROADMECH_TEMPLATE_PROFILING') == '1'
+
+# ROADMECH_QUERY_LOG=1 logs each request's query count, time and any SQL
+# fingerprint repeated QUERY_REPEAT_THRESHOLD times (an N+1) to roadmech.queries.
+QUERY_LOGGING = os.environ.get('ROADMECH_QUERY_LOG') == '1'
+QUERY_REPEAT_THRESHOLD = 5
+
+# The nearby mechanics page lists at most this many mechanics, nearest
+# first; None lists every mechanic within the radius.
+NEARBY_MECHANICS_LIMIT = 50
+
+# Profiling and query logs go to stderr
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {'console': {'class': 'logging.StreamHandler'}},
+    'loggers': {'roadmech': {'handlers': ['console'], 'level': 'INFO', 'propagate': False}},
+}
+
+CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'template_fragments': {
+        'BACKEND': ('django.core.cache.backends.locmem.LocMemCache' if TEMPLATE_PERFORMANCE
+                    else 'django.core.cache.backends.dummy.DummyCache'),
+        'LOCATION': 'template-fragments',
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    },
+}
+
+
 WSGI_APPLICATION = 'roadmech.wsgi.application'
 
+# WAL lets readers run alongside the single writer; writers wait up to
+# `timeout` seconds for the lock and take it at BEGIN so they never fail
+# halfway through a transaction trying to upgrade a read lock.
+SQLITE_OPTIONS = {
+    'timeout': 20,
+    'transaction_mode': 'IMMEDIATE',
+    'init_command': (
+        'PRAGMA journal_mode=WAL;'
+        'PRAGMA synchronous=NORMAL;'
+        'PRAGMA mmap_size=268435456;'
+    ),
+}
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': SQLITE_OPTIONS,
     }
 }
 
+# Optional read replica (a copy of db.sqlite3 kept up to date by e.g.
+# Litestream). Dashboard, search and detail pages read from it.
+if os.environ.get('ROADMECH_REPLICA_DB'):
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ['ROADMECH_REPLICA_DB'],
+        'OPTIONS': SQLITE_OPTIONS,
+    }
+    DATABASE_ROUTERS = ['roadmech.db_router.PrimaryReplicaRouter']
+
 AUTH_PASSWORD_VALIDATORS = [
    # {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',},
    # {'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator',},
@@ -82,6 +158,12 @@ USE_TZ = True
 
 STATIC_URL = '/static/'
 STATICFILES_DIRS = [BASE_DIR / 'static']
+# Filled by `manage.py build_assets`: hashed names plus .gz/.br copies
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'roadmech.static_assets.PrecompressedManifestStaticFilesStorage'},
+}
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
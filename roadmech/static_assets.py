@@ -0,0 +1,209 @@
+# roadmech/static_assets.py
+"""
+Static asset pipeline: resized and WebP image variants, content-hashed
+file names with pre-compressed gzip/brotli copies, and a view that serves
+them with far-future cache headers.
+
+Run ``manage.py build_assets`` on deploy. It refreshes the image variants
+under static/image/variants/ (they are committed, so stylesheets can refer
+to them in development too) and then runs collectstatic, which hashes
+every file through PrecompressedManifestStaticFilesStorage.
+"""
+import gzip
+import io
+import mimetypes
+import os
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage, staticfiles_storage
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404
+from django.utils._os import safe_join
+from PIL import Image
+
+try:
+    import brotli
+except ImportError:  # gzip copies are still written
+    brotli = None
+
+COMPRESSIBLE = ('.css', '.js', '.svg', '.json', '.txt', '.html', '.map')
+# Only keep a compressed copy that saves at least this fraction
+MIN_SAVING = 0.05
+
+IMAGE_SOURCES = ('.jpg', '.jpeg', '.png')
+VARIANTS_DIR = 'variants'
+VARIANT_WIDTHS = (640, 1280)
+JPEG_QUALITY = 78
+WEBP_QUALITY = 72
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+SHORT_LIVED = 'public, max-age=3600'
+
+
+# ---------------- Image Variants ----------------
+# (suffix, PIL format, save options) of every variant written
+VARIANT_FORMATS = (
+    ('.jpg', 'JPEG', {'quality': JPEG_QUALITY, 'optimize': True, 'progressive': True}),
+    ('.webp', 'WEBP', {'quality': WEBP_QUALITY, 'method': 6}),
+)
+
+
+def variant_widths(width):
+    """Widths to generate for an image `width` pixels wide; never upscaled."""
+    widths = [w for w in VARIANT_WIDTHS if w < width]
+    largest = min(width, VARIANT_WIDTHS[-1])
+    return widths if largest in widths else widths + [largest]
+
+
+def _encode(image, fmt, options):
+    buffer = io.BytesIO()
+    image.save(buffer, fmt, **options)
+    return buffer.getvalue()
+
+
+def build_image_variants(image_dir, force=False):
+    """
+    Write <name>-<width>.jpg and .webp under image_dir/variants for every
+    source image, skipping variants newer than their source. A variant is
+    only kept if it is smaller than the source file, and the source's own
+    format at its own width is never re-encoded; stylesheets fall back to
+    the original image for any variant that is missing. Returns the paths
+    written.
+    """
+    image_dir = Path(image_dir)
+    out_dir = image_dir / VARIANTS_DIR
+    out_dir.mkdir(exist_ok=True)
+    written = []
+    for source in sorted(image_dir.iterdir()):
+        if source.suffix.lower() not in IMAGE_SOURCES:
+            continue
+        source_size = source.stat().st_size
+        with Image.open(source) as image:
+            source_format = image.format
+            image = image.convert('RGB')
+            for width in variant_widths(image.width):
+                height = round(image.height * width / image.width)
+                resized = None
+                for ext, fmt, options in VARIANT_FORMATS:
+                    target = out_dir / f'{source.stem}-{width}{ext}'
+                    if width == image.width and fmt == source_format:
+                        target.unlink(missing_ok=True)
+                        continue
+                    if not force and target.exists() and target.stat().st_mtime >= source.stat().st_mtime:
+                        continue
+                    if resized is None:
+                        resized = image.resize((width, height), Image.LANCZOS) if width != image.width else image
+                    data = _encode(resized, fmt, options)
+                    if len(data) >= source_size:
+                        target.unlink(missing_ok=True)
+                        continue
+                    target.write_bytes(data)
+                    written.append(target)
+    return written
+
+
+# ---------------- Hashed, Pre-compressed Files ----------------
+def precompress(path):
+    """Write path.gz and path.br next to path when they are worth keeping."""
+    data = Path(path).read_bytes()
+    encoders = [('.gz', lambda d: gzip.compress(d, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        encoders.append(('.br', lambda d: brotli.compress(d, quality=11)))
+    for suffix, encode in encoders:
+        compressed = encode(data)
+        target = Path(f'{path}{suffix}')
+        if len(compressed) <= len(data) * (1 - MIN_SAVING):
+            target.write_bytes(compressed)
+        elif target.exists():
+            target.unlink()
+
+
+class PrecompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    Manifest storage that also writes gzip and brotli copies of every
+    hashed text asset. Names missing from the manifest (collectstatic not
+    run yet, or a file that does not exist) fall back to their plain URL
+    instead of raising.
+    """
+    manifest_strict = False
+
+    def stored_name(self, name):
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            return name
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        for name in set(self.hashed_files.values()):
+            if name.endswith(COMPRESSIBLE):
+                precompress(self.path(name))
+
+
+# ---------------- Serving ----------------
+def _is_hashed(path):
+    hashed_files = getattr(staticfiles_storage, 'hashed_files', None) or {}
+    return path in hashed_files.values()
+
+
+def accepted_encodings(header):
+    """{coding: q} from an Accept-Encoding header; unparsable q-values count as 0."""
+    accepted = {}
+    for item in header.split(','):
+        coding, _, params = item.partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(';'):
+            name, _, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[coding] = q
+    return accepted
+
+
+def _choose_encoding(accepted, available):
+    """The (suffix, coding) the client rates highest; server order breaks ties."""
+    best, best_q = None, 0.0
+    for suffix, coding in available:
+        q = accepted.get(coding, accepted.get('*', 0.0))
+        if q > best_q:
+            best, best_q = (suffix, coding), q
+    return best
+
+
+def serve(request, path):
+    """
+    Serve a collected static file, preferring a pre-compressed copy the
+    client accepts. Hashed names never change, so they are cached for a year.
+    """
+    if not settings.STATIC_ROOT:
+        raise Http404("Static files are not collected")
+    try:
+        full_path = safe_join(settings.STATIC_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404(path)
+    if not os.path.isfile(full_path):
+        raise Http404(path)
+
+    content_type = mimetypes.guess_type(full_path)[0] or 'application/octet-stream'
+    encodings = [(suffix, name) for suffix, name in (('.br', 'br'), ('.gz', 'gzip'))
+                 if os.path.isfile(full_path + suffix)]
+    chosen = _choose_encoding(accepted_encodings(request.headers.get('Accept-Encoding', '')), encodings)
+
+    if chosen:
+        response = FileResponse(open(full_path + chosen[0], 'rb'), content_type=content_type)
+        response['Content-Encoding'] = chosen[1]
+    else:
+        response = FileResponse(open(full_path, 'rb'), content_type=content_type)
+    if encodings:
+        response['Vary'] = 'Accept-Encoding'
+    response['Cache-Control'] = IMMUTABLE if _is_hashed(path) else SHORT_LIVED
+    return response
@@ -0,0 +1,103 @@
+# roadmech/template_profiler.py
+"""
+Per-template render timing.
+
+install() wraps Template._render, the method every template goes through,
+including {% extends %} parents and {% include %}d partials. Timing is only
+recorded inside a profile() block, so an installed but idle profiler costs
+one context variable lookup per template. Each template gets its total
+(inclusive) time and its self time, which excludes the templates it
+rendered in turn; self time is what points at the slow template.
+"""
+import contextvars
+import time
+from contextlib import contextmanager
+
+from django.template.base import Template
+
+_active = contextvars.ContextVar('template_profile', default=None)
+
+
+class TemplateProfile:
+    def __init__(self):
+        # name -> [calls, total seconds, self seconds]
+        self.stats = {}
+        self._children = []
+
+    def _add(self, name, elapsed, self_time):
+        entry = self.stats.setdefault(name, [0, 0.0, 0.0])
+        entry[0] += 1
+        entry[1] += elapsed
+        entry[2] += self_time
+
+    def merge(self, other):
+        for name, (calls, total, self_time) in other.stats.items():
+            entry = self.stats.setdefault(name, [0, 0.0, 0.0])
+            entry[0] += calls
+            entry[1] += total
+            entry[2] += self_time
+
+    def rows(self):
+        """(name, calls, total_ms, self_ms) ordered by self time, slowest first."""
+        rows = [(name, calls, total * 1000, self_time * 1000)
+                for name, (calls, total, self_time) in self.stats.items()]
+        return sorted(rows, key=lambda row: row[3], reverse=True)
+
+    def report(self):
+        rows = self.rows()
+        if not rows:
+            return "No templates rendered."
+        width = max(len('Template'), *(len(row[0]) for row in rows))
+        lines = [f"{'Template':<{width}}  {'Calls':>6}  {'Total ms':>9}  {'Self ms':>9}"]
+        lines += [f"{name:<{width}}  {calls:>6}  {total:>9.2f}  {self_ms:>9.2f}"
+                  for name, calls, total, self_ms in rows]
+        return '\n'.join(lines)
+
+    def server_timing(self, limit=5):
+        """Server-Timing header value for the `limit` slowest templates."""
+        return ', '.join(
+            f'tpl{i};desc="{name}";dur={self_ms:.2f}'
+            for i, (name, calls, total, self_ms) in enumerate(self.rows()[:limit])
+        )
+
+
+def install():
+    """Wrap Template._render with the timer. Safe to call more than once."""
+    original = Template._render
+    if getattr(original, 'profiled', False):
+        return
+
+    def _render(self, context):
+        profile = _active.get()
+        if profile is None:
+            return original(self, context)
+        profile._children.append(0.0)
+        start = time.perf_counter()
+        try:
+            return original(self, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            children = profile._children.pop()
+            if profile._children:
+                profile._children[-1] += elapsed
+            profile._add(self.name or '<string>', elapsed, elapsed - children)
+
+    _render.profiled = True
+    _render.original = original
+    Template._render = _render
+
+
+def uninstall():
+    if getattr(Template._render, 'profiled', False):
+        Template._render = Template._render.original
+
+
+@contextmanager
+def profile():
+    """Record template timings rendered inside the block into a TemplateProfile."""
+    current = TemplateProfile()
+    token = _active.set(current)
+    try:
+        yield current
+    finally:
+        _active.reset(token)
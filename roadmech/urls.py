@@ -15,14 +15,17 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
 from services import views as service_views
+from . import static_assets
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', service_views.home, name='home'),
     path('accounts/', include('accounts.urls')),
     path('services/', include('services.urls')),
+    # Collected assets; runserver's own static handler takes over in DEBUG
+    re_path(r'^static/(?P<path>.+)$', static_assets.serve, name='static_asset'),
 ]
 
 
@@ -1,8 +1,50 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.contrib.auth.models import User
+from django.db.models import Q
+
+from accounts.models import MechanicProfile
+from .assignment import cancel_requests, release_requests
 from .models import ServiceRequest
+from .pagination import EstimatedCountPaginator
+
 
 @admin.register(ServiceRequest)
 class ServiceRequestAdmin(admin.ModelAdmin):
-    list_display = ('id','user','service_type','vehicle_type','status','mechanic','created_at')
-    list_filter = ('service_type','vehicle_type','status')
-    search_fields = ('user__username','location','vehicle_details')
+    list_display = ('id', 'user', 'service_type', 'vehicle_type', 'status', 'mechanic', 'created_at')
+    list_filter = ('status', 'service_type', 'vehicle_type')
+    list_select_related = ('user', 'mechanic')
+    raw_id_fields = ('user', 'mechanic')
+    date_hierarchy = 'created_at'
+    # The primary key follows creation order and needs no sort
+    ordering = ('-id',)
+    # Looked up exactly in get_search_results()
+    search_fields = ('id', 'user__username', 'mechanic__phone')
+    search_help_text = "Exact request id, customer username or mechanic phone number."
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    show_facets = admin.ShowFacets.NEVER
+    actions = ('cancel_selected', 'release_selected')
+
+    def get_search_results(self, request, queryset, search_term):
+        # Each term is resolved through a unique index rather than a LIKE scan.
+        # Ids are fetched first: SQLite only plans an OR of IN (subquery)
+        # terms as a table scan, but uses one index per term for literal lists.
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        match = (Q(user__in=list(User.objects.filter(username=term).values_list('pk', flat=True)))
+                 | Q(mechanic__in=list(MechanicProfile.objects.filter(phone=term).values_list('pk', flat=True))))
+        if term.isdigit():
+            match |= Q(pk=int(term))
+        return queryset.filter(match), False
+
+    @admin.action(description="Cancel selected open requests", permissions=['change'])
+    def cancel_selected(self, request, queryset):
+        count = cancel_requests(queryset)
+        self.message_user(request, f"Cancelled {count} request(s).", messages.SUCCESS)
+
+    @admin.action(description="Return selected open requests to the dispatch queue", permissions=['change'])
+    def release_selected(self, request, queryset):
+        count = release_requests(queryset)
+        self.message_user(request, f"{count} request(s) will be reassigned on the next dispatch.",
+                          messages.SUCCESS)
@@ -0,0 +1,86 @@
+# services/archive.py
+"""
+Hot/cold split for service requests.
+
+Completed and cancelled requests that have not changed for
+ARCHIVE_AFTER_DAYS move, with their feedback, into ArchivedServiceRequest
+and ArchivedFeedback. The hot ServiceRequest table then only holds recent
+and open work, which is what dashboards and the dispatcher query. History
+pages read both tables (see merged_keyset_page).
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import ArchivedFeedback, ArchivedServiceRequest, Feedback, ServiceRequest
+from .signals import archiving
+from .versions import bump_version
+
+ARCHIVE_AFTER_DAYS = getattr(settings, 'ARCHIVE_AFTER_DAYS', 90)
+ARCHIVE_BATCH_SIZE = 500
+FINISHED_STATUSES = ('Completed', 'Cancelled')
+
+REQUEST_FIELDS = [f.attname for f in ServiceRequest._meta.concrete_fields]
+FEEDBACK_FIELDS = [f.attname for f in Feedback._meta.concrete_fields]
+
+
+def _copy(model, instance, fields):
+    return model(**{name: getattr(instance, name) for name in fields})
+
+
+def _notify(user_ids, mechanic_ids):
+    for user_id in user_ids:
+        bump_version(f'requests:user:{user_id}')
+    for mechanic_id in mechanic_ids:
+        bump_version(f'requests:mechanic:{mechanic_id}')
+
+
+def archive_batch(cutoff, batch_size=ARCHIVE_BATCH_SIZE):
+    """
+    Move up to batch_size finished requests last updated before cutoff, and
+    their feedback, in one transaction. Returns how many were moved.
+    """
+    with transaction.atomic():
+        requests = list(
+            ServiceRequest.objects
+            .filter(status__in=FINISHED_STATUSES, updated_at__lt=cutoff)
+            .order_by('id')[:batch_size]
+        )
+        if not requests:
+            return 0
+        ids = [r.pk for r in requests]
+        feedback = list(Feedback.objects.filter(service_request_id__in=ids))
+
+        ArchivedServiceRequest.objects.bulk_create(
+            [_copy(ArchivedServiceRequest, r, REQUEST_FIELDS) for r in requests]
+        )
+        ArchivedFeedback.objects.bulk_create(
+            [_copy(ArchivedFeedback, f, FEEDBACK_FIELDS) for f in feedback]
+        )
+
+        # Archived feedback still counts towards the mechanic's rating, so
+        # Feedback's delete receivers must not take it off again. Deleting
+        # the requests cascades to their offers.
+        with archiving():
+            Feedback.objects.filter(pk__in=[f.pk for f in feedback]).delete()
+            ServiceRequest.objects.filter(pk__in=ids).delete()
+
+        user_ids = {r.user_id for r in requests}
+        mechanic_ids = {r.mechanic_id for r in requests} - {None}
+        transaction.on_commit(lambda: _notify(user_ids, mechanic_ids))
+    return len(requests)
+
+
+def archive_finished_requests(days=ARCHIVE_AFTER_DAYS, batch_size=ARCHIVE_BATCH_SIZE, limit=None):
+    """Archive in batches until nothing old enough is left. Returns the total moved."""
+    cutoff = timezone.now() - timedelta(days=days)
+    total = 0
+    while limit is None or total < limit:
+        size = batch_size if limit is None else min(batch_size, limit - total)
+        moved = archive_batch(cutoff, size)
+        total += moved
+        if moved < size:
+            break
+    return total
@@ -0,0 +1,145 @@
+# services/assignment.py
+"""
+Status changes for service requests as single conditional UPDATEs.
+
+Each change is written as one ``UPDATE ... WHERE`` carrying its own
+precondition (the expected status, owner, mechanic or open offer), so two
+people acting on the same request at once can never overwrite each other:
+exactly one UPDATE matches the row and the other sees zero rows changed.
+Because update() skips post_save, versions and live dashboards are
+refreshed here once the transaction commits.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+
+from accounts.models import MechanicProfile
+from .events import publish_request_change
+from .models import RequestOffer, ServiceRequest
+from .spatial import mechanic_index
+from .versions import bump_request_versions
+
+# How many of the nearest available mechanics a broadcast reaches
+OFFER_FANOUT = getattr(settings, 'DISPATCH_OFFER_FANOUT', 5)
+OFFER_RADIUS_KM = getattr(settings, 'DISPATCH_OFFER_RADIUS_KM', 50)
+
+
+def _notify(service_request, *other_mechanic_ids):
+    bump_request_versions(service_request, *other_mechanic_ids)
+    publish_request_change(service_request, *other_mechanic_ids)
+
+
+def _apply(queryset, request_id, previous_mechanic_id=None, **changes):
+    """
+    Apply changes to the request if it still matches queryset. Returns the
+    updated request, or None if someone else got there first.
+    """
+    with transaction.atomic():
+        if not queryset.filter(pk=request_id).update(updated_at=timezone.now(), **changes):
+            return None
+        service_request = ServiceRequest.objects.get(pk=request_id)
+        offered = list(service_request.offers.values_list('mechanic_id', flat=True))
+        transaction.on_commit(lambda: _notify(service_request, previous_mechanic_id, *offered))
+    return service_request
+
+
+def claim_request(request_id, mechanic):
+    """
+    Accept a pending request for the mechanic: either one assigned to them
+    or an open broadcast offered to them. First caller wins.
+    """
+    offered = Exists(RequestOffer.objects.filter(service_request=OuterRef('pk'), mechanic=mechanic))
+    claimable = ServiceRequest.objects.filter(status='Pending').filter(
+        Q(mechanic=mechanic) | (offered & Q(mechanic__isnull=True))
+    )
+    return _apply(claimable, request_id, status='Accepted', mechanic=mechanic)
+
+
+def complete_request(request_id, mechanic):
+    """Mark the mechanic's accepted request as completed."""
+    accepted = ServiceRequest.objects.filter(status='Accepted', mechanic=mechanic)
+    return _apply(accepted, request_id, status='Completed')
+
+
+def cancel_request(request_id, user):
+    """Cancel the customer's request while nobody has accepted it yet."""
+    pending = ServiceRequest.objects.filter(status='Pending', user=user)
+    return _apply(pending, request_id, status='Cancelled')
+
+
+def assign_request(request_id, user, mechanic, previous_mechanic_id=None):
+    """Point the customer's still-pending request at the chosen mechanic."""
+    pending = ServiceRequest.objects.filter(status='Pending', user=user)
+    return _apply(pending, request_id, previous_mechanic_id, mechanic=mechanic)
+
+
+# ---------------- Broadcast Offers ----------------
+def broadcast_request(service_request, count=OFFER_FANOUT, radius_km=OFFER_RADIUS_KM):
+    """
+    Offer an unassigned pending request to the `count` nearest available
+    mechanics at once. Returns the ids of the mechanics it was offered to.
+    """
+    if service_request.latitude is None or service_request.longitude is None:
+        return []
+    hits = mechanic_index.nearest(
+        float(service_request.latitude), float(service_request.longitude),
+        radius_km=radius_km, k=count,
+    )
+    available = set(MechanicProfile.objects.filter(
+        pk__in=[pk for pk, _ in hits], approved=True, is_available=True,
+    ).values_list('id', flat=True))
+    offers = [
+        RequestOffer(service_request=service_request, mechanic_id=pk, distance_km=round(distance, 2))
+        for pk, distance in hits if pk in available
+    ]
+    with transaction.atomic():
+        RequestOffer.objects.bulk_create(offers, ignore_conflicts=True)
+        mechanic_ids = [offer.mechanic_id for offer in offers]
+        transaction.on_commit(lambda: _notify(service_request, *mechanic_ids))
+    return mechanic_ids
+
+
+# ---------------- Bulk Changes ----------------
+ACTIVE_STATUSES = ('Pending', 'Accepted')
+
+
+def _apply_many(queryset, clear_offers=False, **changes):
+    """
+    Apply changes to every request in queryset with a single UPDATE, for
+    admin bulk actions. Returns how many requests changed.
+    """
+    with transaction.atomic():
+        previous = dict(queryset.values_list('pk', 'mechanic_id'))
+        if not previous:
+            return 0
+        offered = {}
+        offers = RequestOffer.objects.filter(service_request_id__in=previous)
+        for request_id, mechanic_id in offers.values_list('service_request_id', 'mechanic_id'):
+            offered.setdefault(request_id, []).append(mechanic_id)
+        if clear_offers:
+            offers.delete()
+
+        count = ServiceRequest.objects.filter(pk__in=previous).update(updated_at=timezone.now(), **changes)
+        changed = list(ServiceRequest.objects.filter(pk__in=previous))
+
+        def after_commit():
+            for sr in changed:
+                _notify(sr, previous[sr.pk], *offered.get(sr.pk, ()))
+
+        transaction.on_commit(after_commit)
+    return count
+
+
+def cancel_requests(queryset):
+    """Cancel every request in queryset that is still open."""
+    return _apply_many(queryset.filter(status__in=ACTIVE_STATUSES), status='Cancelled')
+
+
+def release_requests(queryset):
+    """
+    Take open requests away from their mechanics and put them back in the
+    dispatch queue, so the next dispatcher tick reassigns them.
+    """
+    return _apply_many(queryset.filter(status__in=ACTIVE_STATUSES), clear_offers=True,
+                       status='Pending', mechanic=None)
@@ -0,0 +1,69 @@
+# services/dashboard.py
+"""
+Data for the mechanic dashboard in a fixed number of queries.
+
+Per-status counts come from one conditional COUNT query, and every status
+list is read in a single windowed query capped at DASHBOARD_LIST_LIMIT rows
+per status, so the page costs the same for a new garage and for one with
+years of history.
+"""
+from django.conf import settings
+from django.db.models import Count, Exists, F, OuterRef, Q, Window
+from django.db.models.functions import RowNumber
+
+from .models import RequestOffer, ServiceRequest
+from .versions import mechanic_requests_version
+
+DASHBOARD_STATUSES = ['Pending', 'Accepted', 'Completed', 'Cancelled']
+DASHBOARD_LIST_LIMIT = 20
+
+
+def mechanic_requests(mechanic_id):
+    """Requests assigned to the mechanic plus open broadcasts offered to them."""
+    offered = Exists(RequestOffer.objects.filter(service_request=OuterRef('pk'), mechanic_id=mechanic_id))
+    return ServiceRequest.objects.filter(
+        Q(mechanic_id=mechanic_id) | (offered & Q(status='Pending', mechanic__isnull=True))
+    )
+
+
+def status_counts(queryset, statuses=DASHBOARD_STATUSES):
+    """Return {status_lowercase: count} using one COUNT ... FILTER query."""
+    return queryset.aggregate(**{
+        status.lower(): Count('id', filter=Q(status=status)) for status in statuses
+    })
+
+
+def latest_by_status(queryset, statuses=DASHBOARD_STATUSES, limit=DASHBOARD_LIST_LIMIT):
+    """Return {status: [newest requests]} with at most `limit` rows per status."""
+    ranked = queryset.filter(status__in=statuses).annotate(
+        status_rank=Window(
+            RowNumber(),
+            partition_by=F('status'),
+            order_by=[F('created_at').desc(), F('id').desc()],
+        )
+    ).filter(status_rank__lte=limit).select_related('user').order_by('-created_at', '-id')
+
+    lists = {status: [] for status in statuses}
+    for service_request in ranked:
+        lists[service_request.status].append(service_request)
+    return lists
+
+
+def mechanic_dashboard_context(mechanic, limit=DASHBOARD_LIST_LIMIT):
+    requests = mechanic_requests(mechanic.pk)
+    counts = status_counts(requests)
+    lists = latest_by_status(requests, limit=limit) if any(counts.values()) else {
+        status: [] for status in DASHBOARD_STATUSES
+    }
+    return {
+        'mechanic': mechanic,
+        'counts': counts,
+        'pending_requests': lists['Pending'],
+        'my_accepted': lists['Accepted'],
+        'completed_requests': lists['Completed'],
+        'cancelled_requests': lists['Cancelled'],
+        'average_rating': mechanic.average_rating(),
+        # Keys the cached card fragments; bumped on every write to these
+        # requests. Not needed (nor queried) unless fragments are cached.
+        'cards_version': mechanic_requests_version(mechanic.pk) if settings.TEMPLATE_PERFORMANCE else None,
+    }
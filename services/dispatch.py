@@ -0,0 +1,165 @@
+# services/dispatch.py
+"""
+Batch dispatcher for pending, unassigned service requests.
+
+Every tick collects the whole backlog and every available mechanic, builds
+a cost matrix from distance, rating and current workload, and solves the
+min-cost assignment over all of it at once with scipy. Each mechanic gets
+at most one new request per tick. Assignments are written in a single
+transaction with a conditional UPDATE, so a request that was cancelled or
+assigned by hand while the tick was running is left alone.
+"""
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, Count, Exists, IntegerField, OuterRef, Value, When
+from django.utils import timezone
+from scipy.optimize import linear_sum_assignment
+
+from accounts.models import MechanicProfile
+from .events import publish_request_change
+from .models import RequestOffer, ServiceRequest
+from .utils import pairwise_distances_km
+from .versions import bump_versions, request_version_names
+
+# Seconds between ticks of the dispatch_requests command
+TICK_SECONDS = getattr(settings, 'DISPATCH_TICK_SECONDS', 5.0)
+# Never send a mechanic further than this
+MAX_DISPATCH_KM = getattr(settings, 'DISPATCH_MAX_KM', 25.0)
+# Mechanics already holding this many active requests are skipped
+MAX_WORKLOAD = getattr(settings, 'DISPATCH_MAX_WORKLOAD', 3)
+# Oldest requests considered per tick; the rest wait for the next one
+MAX_BATCH = getattr(settings, 'DISPATCH_MAX_BATCH', 2000)
+
+# Cost weights, in kilometres of extra driving each unit is worth
+RATING_WEIGHT = 2.0      # per star below 5
+WORKLOAD_WEIGHT = 5.0    # per request already on the mechanic's plate
+# Mechanics without feedback are treated as average rather than as 0 stars
+DEFAULT_RATING = 3.0
+UNREACHABLE = 1e9
+
+ACTIVE_STATUSES = ('Pending', 'Accepted')
+# Rows per UPDATE statement when writing assignments
+WRITE_CHUNK = 500
+
+
+def build_costs(req_lats, req_lons, mech_lats, mech_lons, ratings, workloads, max_km=MAX_DISPATCH_KM):
+    """
+    Cost of sending each mechanic (columns) to each request (rows).
+
+    Pairs further apart than max_km cost UNREACHABLE.
+    """
+    costs = pairwise_distances_km(req_lats, req_lons, mech_lats, mech_lons)
+    out_of_range = costs > max_km
+    costs += (RATING_WEIGHT * (5.0 - np.asarray(ratings, dtype=np.float64))
+              + WORKLOAD_WEIGHT * np.asarray(workloads, dtype=np.float64))[None, :]
+    costs[out_of_range] = UNREACHABLE
+    return costs
+
+
+def solve(costs):
+    """Return (request_indices, mechanic_indices) of the reachable min-cost pairs."""
+    if not costs.size:
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+    rows, cols = linear_sum_assignment(costs)
+    reachable = costs[rows, cols] < UNREACHABLE
+    return rows[reachable], cols[reachable]
+
+
+def _pending_requests():
+    return list(
+        ServiceRequest.objects
+        .filter(status='Pending', mechanic__isnull=True,
+                latitude__isnull=False, longitude__isnull=False)
+        # Broadcast requests are waiting for an offered mechanic to accept
+        .exclude(Exists(RequestOffer.objects.filter(service_request=OuterRef('pk'))))
+        .order_by('created_at', 'id')
+        .only('id', 'user_id', 'status', 'latitude', 'longitude')[:MAX_BATCH]
+    )
+
+
+def _available_mechanics():
+    """Rows of (id, lat, lon, rating, workload) for mechanics with spare capacity."""
+    workloads = dict(
+        ServiceRequest.objects
+        .filter(status__in=ACTIVE_STATUSES, mechanic__isnull=False)
+        .order_by()
+        .values_list('mechanic_id')
+        .annotate(n=Count('id'))
+    )
+    rows = []
+    for pk, lat, lon, avg, count in (
+        MechanicProfile.objects
+        .filter(approved=True, is_available=True, latitude__isnull=False, longitude__isnull=False)
+        .values_list('id', 'latitude', 'longitude', 'rating_avg', 'rating_count')
+        .iterator(chunk_size=2000)
+    ):
+        load = workloads.get(pk, 0)
+        if load < MAX_WORKLOAD:
+            rows.append((pk, float(lat), float(lon), avg if count else DEFAULT_RATING, load))
+    return rows
+
+
+def _write_assignments(planned):
+    """
+    Assign {request_id: mechanic_id} where the request is still pending and
+    unassigned. Returns the ids that were actually assigned.
+    """
+    assigned = set()
+    now = timezone.now()
+    items = list(planned.items())
+    for start in range(0, len(items), WRITE_CHUNK):
+        chunk = dict(items[start:start + WRITE_CHUNK])
+        ServiceRequest.objects.filter(
+            pk__in=chunk, status='Pending', mechanic__isnull=True,
+        ).update(
+            mechanic_id=Case(*[When(pk=pk, then=Value(m)) for pk, m in chunk.items()],
+                             output_field=IntegerField()),
+            updated_at=now,
+        )
+        assigned.update(
+            pk for pk, mechanic_id in
+            ServiceRequest.objects.filter(pk__in=chunk).values_list('id', 'mechanic_id')
+            if mechanic_id == chunk[pk]
+        )
+    return assigned
+
+
+def _notify(service_requests):
+    # One batched bump for the whole tick; a per-request bump_request_versions()
+    # costs a few statements per request and dominated large ticks
+    bump_versions(name for sr in service_requests for name in request_version_names(sr))
+    for sr in service_requests:
+        publish_request_change(sr)
+
+
+def dispatch_pending():
+    """
+    Run one dispatch tick. Returns the list of ServiceRequests that were
+    assigned a mechanic.
+    """
+    requests = _pending_requests()
+    if not requests:
+        return []
+    mechanics = _available_mechanics()
+    if not mechanics:
+        return []
+
+    mech_ids, mech_lats, mech_lons, ratings, workloads = zip(*mechanics)
+    costs = build_costs(
+        [float(r.latitude) for r in requests], [float(r.longitude) for r in requests],
+        mech_lats, mech_lons, ratings, workloads,
+    )
+    rows, cols = solve(costs)
+    planned = {requests[i].pk: mech_ids[j] for i, j in zip(rows, cols)}
+    if not planned:
+        return []
+
+    with transaction.atomic():
+        assigned = _write_assignments(planned)
+        dispatched = [r for r in requests if r.pk in assigned]
+        for sr in dispatched:
+            sr.mechanic_id = planned[sr.pk]
+        # update() skips post_save, so refresh pollers and live dashboards here
+        transaction.on_commit(lambda: _notify(dispatched))
+    return dispatched
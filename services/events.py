@@ -0,0 +1,77 @@
+# services/events.py
+"""
+In-process publish/subscribe broker for live mechanic dashboards.
+
+Each open dashboard holds an asyncio.Queue registered under its mechanic
+id. Publishing is thread-safe, so sync views and signal handlers running in
+worker threads can hand events to the ASGI event loop. Subscribers only
+receive events published in the same process; run a single ASGI worker
+(or put a shared broker behind this interface) for multi-process setups.
+"""
+import asyncio
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+
+# Events waiting for a slow client; older clients resync on reconnect
+QUEUE_SIZE = 100
+
+
+class DashboardBroker:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+
+    @contextmanager
+    def subscribe(self, mechanic_id):
+        """Register a queue for the mechanic on the running event loop."""
+        entry = (asyncio.get_running_loop(), asyncio.Queue(maxsize=QUEUE_SIZE))
+        with self._lock:
+            self._subscribers[mechanic_id].add(entry)
+        try:
+            yield entry[1]
+        finally:
+            with self._lock:
+                self._subscribers[mechanic_id].discard(entry)
+                if not self._subscribers[mechanic_id]:
+                    del self._subscribers[mechanic_id]
+
+    def has_subscribers(self, mechanic_id):
+        with self._lock:
+            return bool(self._subscribers.get(mechanic_id))
+
+    def publish(self, mechanic_id, event):
+        with self._lock:
+            entries = list(self._subscribers.get(mechanic_id, ()))
+        for loop, queue in entries:
+            loop.call_soon_threadsafe(self._offer, queue, event)
+
+    @staticmethod
+    def _offer(queue, event):
+        try:
+            queue.put_nowait(event)
+        except asyncio.QueueFull:
+            pass
+
+
+broker = DashboardBroker()
+
+
+def publish_request_change(service_request, *other_mechanic_ids):
+    """
+    Tell the current mechanic, and any previous or offered mechanics passed
+    in other_mechanic_ids, that a request changed.
+    """
+    from .dashboard import mechanic_requests, status_counts
+
+    for mechanic_id in {service_request.mechanic_id, *other_mechanic_ids} - {None}:
+        if not broker.has_subscribers(mechanic_id):
+            continue
+        # Unassigned pending requests are open offers and stay listed
+        listed = (mechanic_id == service_request.mechanic_id
+                  or (service_request.mechanic_id is None and service_request.status == 'Pending'))
+        broker.publish(mechanic_id, {
+            'id': service_request.pk,
+            'status': service_request.status if listed else None,
+            'counts': status_counts(mechanic_requests(mechanic_id)),
+        })
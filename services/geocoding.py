@@ -0,0 +1,130 @@
+# services/geocoding.py
+"""
+Background geocoding for mechanic profiles and service requests.
+
+Saving either model with an address but no coordinates queues a
+GeocodeJob. Workers (see the process_geocode_jobs command) claim jobs with
+a conditional UPDATE, share a single upstream call budget through the
+GeocodeThrottle row, and write the coordinates back to the record.
+"""
+import time
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from utils.geocode import geocode_address
+from .models import GeocodeJob, GeocodeThrottle, ServiceRequest
+
+# Nominatim allows one request per second across all of our processes
+UPSTREAM_INTERVAL = timedelta(seconds=1)
+MAX_ATTEMPTS = 3
+RETRY_DELAY = timedelta(minutes=5)
+# A Running job older than this is assumed to belong to a dead worker
+STALE_AFTER = timedelta(minutes=5)
+
+
+def _target_model(target):
+    from accounts.models import MechanicProfile
+
+    return MechanicProfile if target == 'mechanic' else ServiceRequest
+
+
+def needs_geocoding(instance):
+    return bool(instance.location) and (instance.latitude is None or instance.longitude is None)
+
+
+def enqueue_geocode(target, instance):
+    """Queue a job for the instance unless one is already waiting."""
+    GeocodeJob.objects.get_or_create(
+        target=target,
+        object_id=instance.pk,
+        status='Pending',
+        defaults={'address': instance.location[:255]},
+    )
+
+
+# ---------------- Upstream Budget ----------------
+def acquire_upstream_slot(name='nominatim'):
+    """Block until this process owns the next upstream call slot."""
+    GeocodeThrottle.objects.get_or_create(name=name)
+    while True:
+        now = timezone.now()
+        next_call_at = GeocodeThrottle.objects.filter(name=name).values_list(
+            'next_call_at', flat=True
+        ).get()
+        if next_call_at > now:
+            time.sleep((next_call_at - now).total_seconds())
+            continue
+        # Compare-and-set: only one process can move the slot forward
+        claimed = GeocodeThrottle.objects.filter(
+            name=name, next_call_at=next_call_at
+        ).update(next_call_at=now + UPSTREAM_INTERVAL)
+        if claimed:
+            return
+
+
+# ---------------- Workers ----------------
+def claim_job():
+    """Atomically take the next runnable job, or return None."""
+    now = timezone.now()
+    runnable = (
+        Q(status='Pending', run_after__lte=now)
+        | Q(status='Running', updated_at__lt=now - STALE_AFTER)
+    )
+    job_ids = GeocodeJob.objects.filter(runnable).order_by(
+        'run_after', 'id'
+    ).values_list('id', flat=True)[:10]
+
+    for job_id in job_ids:
+        # Another worker may win the race; then try the next candidate
+        claimed = GeocodeJob.objects.filter(runnable, id=job_id).update(
+            status='Running', attempts=F('attempts') + 1, updated_at=now
+        )
+        if claimed:
+            return GeocodeJob.objects.get(id=job_id)
+    return None
+
+
+def run_job(job):
+    model = _target_model(job.target)
+    instance = model.objects.filter(pk=job.object_id).first()
+    if instance is None or not needs_geocoding(instance):
+        job.status = 'Done'
+        job.save(update_fields=['status', 'updated_at'])
+        return
+
+    # A retry follows a "not found", which is now negatively cached; ask upstream again
+    lat, lng = geocode_address(job.address, throttle=acquire_upstream_slot, skip_negative=job.attempts > 1)
+    if lat is None:
+        if job.attempts >= MAX_ATTEMPTS:
+            job.status = 'Failed'
+        else:
+            job.status = 'Pending'
+            job.run_after = timezone.now() + RETRY_DELAY * job.attempts
+        job.save(update_fields=['status', 'run_after', 'updated_at'])
+        return
+
+    with transaction.atomic():
+        instance.latitude = round(lat, 6)
+        instance.longitude = round(lng, 6)
+        fields = ['latitude', 'longitude']
+        if job.target == 'request':
+            # Customer polling and history cursors follow updated_at
+            fields.append('updated_at')
+        instance.save(update_fields=fields)
+        job.status = 'Done'
+        job.save(update_fields=['status', 'updated_at'])
+
+
+def process_jobs(limit=None):
+    """Run jobs until the queue is empty or limit is reached. Returns the count."""
+    processed = 0
+    while limit is None or processed < limit:
+        job = claim_job()
+        if job is None:
+            break
+        run_job(job)
+        processed += 1
+    return processed
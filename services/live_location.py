@@ -0,0 +1,104 @@
+# services/live_location.py
+"""
+Live GPS positions for mobile mechanics.
+
+Pings only touch memory: the newest position per mechanic replaces any
+older one in a process-local buffer, and the local mechanic index is moved
+straight away so dispatch and index queries in this process see it at
+once. A timer flushes the buffer every FLUSH_INTERVAL in one transaction.
+Each row is only written if its stored position is older than the ping, so
+when several processes buffer pings for the same mechanic the newest one
+wins, not the last flush. Other processes then fold just the moved rows
+into their indexes, and cached nearby searches (services.nearby_cache)
+around the old and new cells expire; until that flush, cached searches
+may show the previous position. Database writes are therefore bounded by
+the number of mechanics that moved per interval, not by the ping rate.
+"""
+import atexit
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .nearby_cache import bump_regions
+from .spatial import mechanic_index
+from .utils import grid_cell
+
+# Seconds between flushes of buffered positions to the database
+FLUSH_INTERVAL = getattr(settings, 'LIVE_LOCATION_FLUSH_INTERVAL', 5.0)
+
+
+class LocationBuffer:
+    def __init__(self, interval=FLUSH_INTERVAL):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._latest = {}   # mechanic id -> (lat, lon, received at)
+        self._timer = None
+
+    def add(self, mechanic_id, lat, lon):
+        """Record a ping, replacing any unflushed position for the mechanic."""
+        received_at = timezone.now()
+        with self._lock:
+            self._latest[mechanic_id] = (lat, lon, received_at)
+            self._schedule()
+        mechanic_index.move(mechanic_id, lat, lon, received_at)
+
+    def _schedule(self):
+        if self.interval and self._timer is None:
+            self._timer = threading.Timer(self.interval, self._flush_from_timer)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _flush_from_timer(self):
+        with self._lock:
+            self._timer = None
+        try:
+            self.flush()
+        finally:
+            # The timer thread owns its own connection; don't leak it
+            close_old_connections()
+
+    def flush(self):
+        """
+        Write every buffered position that is newer than the stored one.
+        Returns the number of rows written.
+        """
+        from accounts.models import MechanicProfile
+
+        with self._lock:
+            latest, self._latest = self._latest, {}
+        if not latest:
+            return 0
+
+        cells = []
+        with transaction.atomic():
+            old_cells = {
+                pk: (row, col) for pk, row, col in
+                MechanicProfile.objects.filter(pk__in=latest).values_list('id', 'grid_row', 'grid_col')
+            }
+            for pk, (lat, lon, received_at) in latest.items():
+                row, col = grid_cell(lat, lon)
+                # Another process may already have written a newer ping
+                written = MechanicProfile.objects.filter(
+                    Q(location_updated_at__isnull=True) | Q(location_updated_at__lt=received_at), pk=pk,
+                ).update(latitude=round(lat, 6), longitude=round(lon, 6), grid_row=row, grid_col=col,
+                         location_updated_at=received_at)
+                if written:
+                    cells += [old_cells[pk], (row, col)]
+            if cells:
+                # update() skips post_save; other processes read the moved
+                # rows, and cached searches around the old and new cells expire
+                transaction.on_commit(mechanic_index.publish_moves)
+                transaction.on_commit(lambda: bump_regions(*cells))
+        return len(cells) // 2
+
+    def pending(self):
+        with self._lock:
+            return len(self._latest)
+
+
+location_buffer = LocationBuffer()
+# Don't lose the last interval's positions on a clean shutdown
+atexit.register(location_buffer.flush)
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from services.archive import ARCHIVE_AFTER_DAYS, ARCHIVE_BATCH_SIZE, archive_finished_requests
+
+
+class Command(BaseCommand):
+    help = ("Move completed and cancelled service requests, and their feedback, into the archive "
+            "tables. Meant to run on a schedule, e.g. nightly from cron.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=ARCHIVE_AFTER_DAYS,
+                            help="Archive requests that have not changed for this many days.")
+        parser.add_argument('--batch-size', type=int, default=ARCHIVE_BATCH_SIZE,
+                            help="Requests moved per transaction.")
+        parser.add_argument('--limit', type=int, default=None,
+                            help="Stop after archiving this many requests.")
+
+    def handle(self, *args, **options):
+        total = archive_finished_requests(
+            days=options['days'], batch_size=options['batch_size'], limit=options['limit'],
+        )
+        self.stdout.write(self.style.SUCCESS(f"Archived {total} service request(s)."))
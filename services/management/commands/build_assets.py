@@ -0,0 +1,29 @@
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+from roadmech.static_assets import build_image_variants
+
+
+class Command(BaseCommand):
+    help = ("Build static assets for deployment: resized JPEG and WebP variants of static/image, "
+            "then collectstatic into content-hashed files with gzip and brotli copies.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true',
+                            help="Regenerate image variants even when they are up to date.")
+        parser.add_argument('--images-only', action='store_true',
+                            help="Only refresh image variants; skip collectstatic.")
+
+    def handle(self, *args, **options):
+        written = []
+        for static_dir in settings.STATICFILES_DIRS:
+            image_dir = static_dir / 'image'
+            if image_dir.is_dir():
+                written += build_image_variants(image_dir, force=options['force'])
+        self.stdout.write(f"Wrote {len(written)} image variant(s).")
+
+        if not options['images_only']:
+            call_command('collectstatic', interactive=False, verbosity=options['verbosity'],
+                         stdout=self.stdout)
+            self.stdout.write(self.style.SUCCESS(f"Assets ready in {settings.STATIC_ROOT}."))
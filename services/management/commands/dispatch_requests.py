@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from services.dispatch import TICK_SECONDS, dispatch_pending
+
+
+class Command(BaseCommand):
+    help = "Assign pending, unassigned service requests to nearby available mechanics."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--watch', action='store_true',
+                            help="Keep dispatching every --interval seconds instead of running one tick.")
+        parser.add_argument('--interval', type=float, default=TICK_SECONDS,
+                            help="Seconds between the start of consecutive ticks in --watch mode.")
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.monotonic()
+            assigned = dispatch_pending()
+            elapsed = time.monotonic() - started
+            self.stdout.write(f"Assigned {len(assigned)} request(s) in {elapsed:.2f}s.")
+            if not options['watch']:
+                break
+            if elapsed > options['interval']:
+                self.stderr.write(self.style.WARNING(
+                    f"Tick took {elapsed:.2f}s, longer than the {options['interval']:.2f}s interval."))
+            time.sleep(max(0.0, options['interval'] - elapsed))
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from services.exports import EXPORT_CHUNK_SIZE, EXPORTS, FORMATS, export_filters, export_lines, export_querysets
+
+
+class Command(BaseCommand):
+    help = "Stream service requests or feedback, live and archived, as CSV or JSON Lines."
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(EXPORTS))
+        parser.add_argument('--format', choices=sorted(FORMATS), default='csv')
+        parser.add_argument('--output', '-o', default='-', help="File to write, '-' for stdout.")
+        parser.add_argument('--since', help="Only rows created on or after this date (YYYY-MM-DD).")
+        parser.add_argument('--until', help="Only rows created on or before this date (YYYY-MM-DD).")
+        parser.add_argument('--status', help="Only requests with this status.")
+        parser.add_argument('--mechanic', type=int, help="Only rows for this mechanic id.")
+        parser.add_argument('--chunk-size', type=int, default=EXPORT_CHUNK_SIZE,
+                            help="Rows fetched from the database at a time.")
+        parser.add_argument('--database', default=None,
+                            help="Database alias to read from, e.g. a replica.")
+
+    def handle(self, *args, **options):
+        kind = options['kind']
+        try:
+            filters = export_filters(kind, since=options['since'], until=options['until'],
+                                     status=options['status'], mechanic=options['mechanic'])
+        except ValueError as exc:
+            raise CommandError(exc)
+
+        querysets = export_querysets(kind, filters, using=options['database'])
+        lines = export_lines(kind, options['format'], querysets, options['chunk_size'])
+        if options['output'] == '-':
+            for line in lines:
+                self.stdout.write(line, ending='')
+            return
+
+        count = 0
+        with open(options['output'], 'w', newline='', encoding='utf-8') as handle:
+            for line in lines:
+                handle.write(line)
+                count += 1
+        rows = count - 1 if options['format'] == 'csv' else count
+        self.stderr.write(self.style.SUCCESS(f"Exported {rows} row(s) to {options['output']}."))
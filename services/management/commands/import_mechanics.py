@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from services.onboarding import IMPORT_CHUNK_SIZE, checkpoint_path, import_mechanics
+
+
+class Command(BaseCommand):
+    help = ("Create mechanic accounts in bulk from a .csv or .jsonl file with the columns username, "
+            "email, password, service_center_name, phone, location and optionally latitude, "
+            "longitude and specialization. Re-running resumes after the last committed chunk.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV or JSON Lines file to import.")
+        parser.add_argument('--chunk-size', type=int, default=IMPORT_CHUNK_SIZE,
+                            help="Rows written per transaction.")
+        parser.add_argument('--workers', type=int, default=None,
+                            help="Password hashing processes (default: one per CPU, 0 hashes inline).")
+        parser.add_argument('--no-geocode', action='store_true',
+                            help="Queue missing coordinates for process_geocode_jobs instead of geocoding now.")
+        parser.add_argument('--restart', action='store_true',
+                            help="Ignore the checkpoint and read the file from the first row.")
+
+    def handle(self, *args, **options):
+        try:
+            result = import_mechanics(
+                options['path'], chunk_size=options['chunk_size'], workers=options['workers'],
+                geocode=not options['no_geocode'], resume=not options['restart'],
+            )
+        except (OSError, ValueError) as exc:
+            raise CommandError(f"Could not import {options['path']}: {exc}")
+
+        if result.start:
+            self.stdout.write(f"Resumed after row {result.start}.")
+        for number, reason in result.rejected:
+            self.stderr.write(f"Row {number}: {reason}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {result.created} mechanic(s), rejected {len(result.rejected)}, "
+            f"queued {result.geocode_queued} for geocoding. Progress saved to {checkpoint_path(options['path'])}."
+        ))
@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from services.geocoding import process_jobs
+
+
+class Command(BaseCommand):
+    help = "Geocode queued mechanic and service request addresses."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--watch', action='store_true',
+                            help="Keep running and poll for new jobs instead of exiting when the queue is empty.")
+        parser.add_argument('--interval', type=float, default=2.0,
+                            help="Seconds to wait between polls in --watch mode.")
+        parser.add_argument('--limit', type=int, default=None,
+                            help="Stop after processing this many jobs.")
+
+    def handle(self, *args, **options):
+        total = 0
+        while True:
+            remaining = None if options['limit'] is None else options['limit'] - total
+            total += process_jobs(limit=remaining)
+            if not options['watch'] or (remaining is not None and total >= options['limit']):
+                break
+            time.sleep(options['interval'])
+        self.stdout.write(self.style.SUCCESS(f"Processed {total} geocoding job(s)."))
@@ -0,0 +1,44 @@
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+
+from roadmech import template_profiler
+
+
+class Command(BaseCommand):
+    help = ("Request pages in-process and report how long each template took to render, "
+            "slowest first. Run with ROADMECH_TEMPLATE_PERF=1 to measure with fragment caching.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+', help="URL paths to request, e.g. /services/mechanic/3/.")
+        parser.add_argument('--user', help="Username to log in as before requesting the pages.")
+        parser.add_argument('--repeat', type=int, default=10, help="Requests per path.")
+        parser.add_argument('--host', default='localhost', help="Host header; must be in ALLOWED_HOSTS.")
+
+    def handle(self, *args, **options):
+        client = Client(HTTP_HOST=options['host'])
+        if options['user']:
+            try:
+                client.force_login(User.objects.get(username=options['user']))
+            except User.DoesNotExist:
+                raise CommandError(f"No user named {options['user']!r}.")
+
+        totals = template_profiler.TemplateProfile()
+        template_profiler.install()
+        try:
+            for path in options['paths']:
+                elapsed = 0.0
+                for _ in range(options['repeat']):
+                    start = time.perf_counter()
+                    with template_profiler.profile() as timings:
+                        response = client.get(path)
+                    elapsed += time.perf_counter() - start
+                    totals.merge(timings)
+                self.stdout.write(f"{path}: HTTP {response.status_code}, "
+                                  f"{elapsed * 1000 / options['repeat']:.2f} ms per request")
+        finally:
+            template_profiler.uninstall()
+        self.stdout.write('')
+        self.stdout.write(totals.report())
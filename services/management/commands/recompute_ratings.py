@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from accounts.models import MechanicProfile
+from services.models import ArchivedFeedback, Feedback
+from services.ratings import recompute_ratings
+
+
+class Command(BaseCommand):
+    help = "Rebuild the denormalized rating totals on every mechanic profile from live and archived Feedback."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mechanic', type=int, action='append', dest='mechanics',
+                            help="Only repair this mechanic profile id (may be repeated).")
+
+    def handle(self, *args, **options):
+        profiles = MechanicProfile.objects.all()
+        if options['mechanics']:
+            profiles = profiles.filter(pk__in=options['mechanics'])
+        updated = recompute_ratings(profiles, Feedback, ArchivedFeedback)
+        self.stdout.write(self.style.SUCCESS(f"Recomputed ratings for {updated} mechanic(s)."))
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from services.ratings import recompute_ratings
+
+
+def backfill_ratings(apps, schema_editor):
+    MechanicProfile = apps.get_model('accounts', 'MechanicProfile')
+    Feedback = apps.get_model('services', 'Feedback')
+    recompute_ratings(MechanicProfile.objects.all(), Feedback)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0017_mechanicprofile_rating_aggregates'),
+        ('services', '0013_geocodejob'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='feedback',
+            name='mechanic',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='feedbacks', to='accounts.mechanicprofile'),
+        ),
+        migrations.RunPython(backfill_ratings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:11
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0017_mechanicprofile_rating_aggregates'),
+        ('services', '0015_servicerequest_updated_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='servicerequest',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='request_user_history_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0017_mechanicprofile_rating_aggregates'),
+        ('services', '0016_servicerequest_history_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequestOffer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('distance_km', models.FloatField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('mechanic', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='request_offers', to='accounts.mechanicprofile')),
+                ('service_request', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='offers', to='services.servicerequest')),
+            ],
+            options={
+                'unique_together': {('service_request', 'mechanic')},
+            },
+        ),
+    ]
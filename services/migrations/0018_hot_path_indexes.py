@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:19
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0019_mechanicprofile_available_index'),
+        ('services', '0017_requestoffer'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='feedback',
+            name='mechanic',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='feedbacks', to='accounts.mechanicprofile'),
+        ),
+        migrations.AlterField(
+            model_name='servicerequest',
+            name='mechanic',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, to='accounts.mechanicprofile'),
+        ),
+        migrations.AddIndex(
+            model_name='feedback',
+            index=models.Index(fields=['mechanic', '-created_at'], name='feedback_mechanic_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='servicerequest',
+            index=models.Index(fields=['mechanic', 'status', '-created_at'], name='request_mechanic_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='servicerequest',
+            index=models.Index(fields=['status', 'created_at'], name='request_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='servicerequest',
+            index=models.Index(fields=['user', 'updated_at', 'id'], name='request_user_updated_idx'),
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:24
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0019_mechanicprofile_available_index'),
+        ('services', '0018_hot_path_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedServiceRequest',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('status', models.CharField(choices=[('Pending', 'Pending'), ('Accepted', 'Accepted'), ('Rejected', 'Rejected'), ('Completed', 'Completed'), ('Cancelled', 'Cancelled')], max_length=20)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('vehicle_type', models.CharField(choices=[('car', 'Car'), ('bike', 'Bike')], max_length=10)),
+                ('service_type', models.CharField(choices=[('towing', 'Towing'), ('fuel', 'Fuel Delivery'), ('battery', 'Battery Jumpstart'), ('tire', 'Tire Replacement'), ('other', 'Other')], max_length=20)),
+                ('vehicle_brand', models.CharField(blank=True, max_length=100, null=True)),
+                ('vehicle_model', models.CharField(blank=True, max_length=50, null=True)),
+                ('vehicle_year', models.PositiveIntegerField(blank=True, null=True)),
+                ('vehicle_number', models.CharField(blank=True, max_length=20, null=True)),
+                ('owner_name', models.CharField(blank=True, max_length=100, null=True)),
+                ('phone_number', models.CharField(blank=True, max_length=15, null=True)),
+                ('location', models.CharField(max_length=255)),
+                ('latitude', models.DecimalField(blank=True, decimal_places=6, max_digits=9, null=True)),
+                ('longitude', models.DecimalField(blank=True, decimal_places=6, max_digits=9, null=True)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('mechanic', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_requests', to='accounts.mechanicprofile')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_requests', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedFeedback',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('rating', models.IntegerField(choices=[(1, 1), (2, 2), (3, 3), (4, 4), (5, 5)])),
+                ('comment', models.TextField(blank=True, null=True)),
+                ('created_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('mechanic', models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='archived_feedbacks', to='accounts.mechanicprofile')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_feedbacks', to=settings.AUTH_USER_MODEL)),
+                ('service_request', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='feedbacks', to='services.archivedservicerequest')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='archivedservicerequest',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='archived_user_history_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedfeedback',
+            index=models.Index(fields=['mechanic', '-created_at'], name='archived_feedback_mechanic_idx'),
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
 import datetime
 # Remove this import to avoid circular imports
 # from accounts.models import MechanicProfile
@@ -26,9 +27,12 @@ class ServiceRequest(models.Model):
     ]
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     # Use string reference to avoid circular imports
-    mechanic = models.ForeignKey('accounts.MechanicProfile', on_delete=models.SET_NULL, null=True, blank=True)
+    # Indexed by request_mechanic_status_idx, which leads with mechanic
+    mechanic = models.ForeignKey('accounts.MechanicProfile', on_delete=models.SET_NULL, null=True, blank=True,
+                                 db_index=False)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='Pending')
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     vehicle_type = models.CharField(max_length=10, choices=VEHICLE_CHOICES)
     service_type = models.CharField(max_length=20, choices=SERVICE_CHOICES)
@@ -54,6 +58,26 @@ class ServiceRequest(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Keyset pagination of a customer's history on (created_at, id)
+            models.Index(fields=['user', '-created_at', '-id'], name='request_user_history_idx'),
+            # Mechanic dashboard counts and per-status lists, dispatcher workload
+            models.Index(fields=['mechanic', 'status', '-created_at'], name='request_mechanic_status_idx'),
+            # Status-wide listings in arrival order, e.g. the dispatcher's backlog
+            models.Index(fields=['status', 'created_at'], name='request_status_created_idx'),
+            # Customer change polling on (updated_at, id)
+            models.Index(fields=['user', 'updated_at', 'id'], name='request_user_updated_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember who the request belonged to so signals can notify them
+        instance._loaded_mechanic_id = instance.__dict__.get('mechanic_id')
+        return instance
+
+    # Rows of ArchivedServiceRequest say True; templates use this to hide actions
+    is_archived = False
 
     def __str__(self):
         return f"{self.user.username} - {self.service_type} ({self.vehicle_type})"
@@ -69,7 +93,9 @@ class ServiceRequest(models.Model):
     @property
     def feedback_exists(self):
         """Check if feedback already exists for this request"""
-        # Use the correct approach - query the Feedback model
+        # Querysets annotated with has_feedback already know the answer
+        if hasattr(self, 'has_feedback'):
+            return self.has_feedback
         from .models import Feedback  # Import here to avoid circular imports
         return Feedback.objects.filter(service_request=self).exists()
     
@@ -89,7 +115,8 @@ class Feedback(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     service_request = models.ForeignKey('ServiceRequest', on_delete=models.CASCADE, null=True, blank=True)
     # Use string reference to avoid circular imports
-    mechanic = models.ForeignKey('accounts.MechanicProfile', on_delete=models.CASCADE, null=True, blank=True)
+    mechanic = models.ForeignKey('accounts.MechanicProfile', on_delete=models.CASCADE, null=True, blank=True,
+                                 related_name='feedbacks', db_index=False)
 
     rating = models.IntegerField(choices=[(i, i) for i in range(1, 6)], default=5)
     comment = models.TextField(blank=True, null=True)
@@ -101,4 +128,153 @@ class Feedback(models.Model):
         return f"{self.user.username} rating ({self.rating}/5)"
 
     class Meta:
-        unique_together = ('user', 'service_request')
\ No newline at end of file
+        # Also serves the (service_request, user) "already reviewed?" lookups
+        unique_together = ('user', 'service_request')
+        indexes = [
+            # A mechanic's reviews, newest first; replaces the plain FK index
+            models.Index(fields=['mechanic', '-created_at'], name='feedback_mechanic_recent_idx'),
+        ]
+
+
+class ArchivedServiceRequest(models.Model):
+    """
+    A finished ServiceRequest moved out of the hot table by the
+    archive_requests command. Keeps the original id and every column.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_requests')
+    mechanic = models.ForeignKey('accounts.MechanicProfile', on_delete=models.SET_NULL, null=True, blank=True,
+                                 related_name='archived_requests')
+    status = models.CharField(max_length=20, choices=ServiceRequest.STATUS_CHOICES)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    vehicle_type = models.CharField(max_length=10, choices=ServiceRequest.VEHICLE_CHOICES)
+    service_type = models.CharField(max_length=20, choices=ServiceRequest.SERVICE_CHOICES)
+    vehicle_brand = models.CharField(max_length=100, blank=True, null=True)
+    vehicle_model = models.CharField(max_length=50, blank=True, null=True)
+    vehicle_year = models.PositiveIntegerField(null=True, blank=True)
+    vehicle_number = models.CharField(max_length=20, blank=True, null=True)
+    owner_name = models.CharField(max_length=100, blank=True, null=True)
+    phone_number = models.CharField(max_length=15, blank=True, null=True)
+    location = models.CharField(max_length=255)
+    latitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
+    longitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    is_archived = True
+    can_give_feedback = False
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-id'], name='archived_user_history_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} - {self.service_type} ({self.vehicle_type}, archived)"
+
+    @property
+    def feedback_exists(self):
+        if hasattr(self, 'has_feedback'):
+            return self.has_feedback
+        return self.feedbacks.exists()
+
+    def can_cancel(self):
+        return False
+
+
+class ArchivedFeedback(models.Model):
+    """Feedback that was archived together with its service request."""
+    id = models.BigIntegerField(primary_key=True)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_feedbacks')
+    service_request = models.ForeignKey(ArchivedServiceRequest, on_delete=models.CASCADE, null=True, blank=True,
+                                        related_name='feedbacks')
+    mechanic = models.ForeignKey('accounts.MechanicProfile', on_delete=models.CASCADE, null=True, blank=True,
+                                 related_name='archived_feedbacks', db_index=False)
+    rating = models.IntegerField(choices=[(i, i) for i in range(1, 6)])
+    comment = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['mechanic', '-created_at'], name='archived_feedback_mechanic_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} rating ({self.rating}/5, archived)"
+
+
+class RequestOffer(models.Model):
+    """A pending request broadcast to a mechanic; the first to accept wins."""
+    service_request = models.ForeignKey('ServiceRequest', on_delete=models.CASCADE, related_name='offers')
+    mechanic = models.ForeignKey('accounts.MechanicProfile', on_delete=models.CASCADE, related_name='request_offers')
+    distance_km = models.FloatField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('service_request', 'mechanic')
+
+    def __str__(self):
+        return f"Request #{self.service_request_id} offered to mechanic #{self.mechanic_id}"
+
+class GeocodeCache(models.Model):
+    """Geocoder results keyed by normalized address. A row with no
+    coordinates records an address the geocoder could not resolve."""
+    key = models.CharField(max_length=40, unique=True)
+    address = models.TextField()
+    latitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
+    longitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
+    expires_at = models.DateTimeField(db_index=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.address
+
+
+class GeocodeJob(models.Model):
+    """Address waiting to be geocoded for a mechanic or service request."""
+    TARGET_CHOICES = [
+        ('mechanic', 'Mechanic Profile'),
+        ('request', 'Service Request'),
+    ]
+    STATUS_CHOICES = [
+        ('Pending', 'Pending'),
+        ('Running', 'Running'),
+        ('Done', 'Done'),
+        ('Failed', 'Failed'),
+    ]
+    target = models.CharField(max_length=20, choices=TARGET_CHOICES)
+    object_id = models.PositiveBigIntegerField()
+    address = models.CharField(max_length=255)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='Pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    run_after = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='geocodejob_queue_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.target} #{self.object_id}: {self.address} ({self.status})"
+
+
+class GeocodeThrottle(models.Model):
+    """Single row holding the next time any process may call the geocoder."""
+    name = models.CharField(max_length=50, unique=True)
+    next_call_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return self.name
+
+
+class VersionCounter(models.Model):
+    """Named change counter shared by every process (see services.versions)."""
+    name = models.CharField(max_length=200, primary_key=True)
+    value = models.BigIntegerField()
+
+    def __str__(self):
+        return f"{self.name} = {self.value}"
@@ -0,0 +1,100 @@
+# services/nearby_cache.py
+"""
+Shared cache of ranked nearby-mechanic candidates per search cell.
+
+Breakdowns cluster on the same roads, so searches a few hundred metres
+apart fall into the same SEARCH_CELL_DEG cell and share one cached list:
+the mechanics around the cell centre, nearest first, with coordinates.
+The list is wide enough to hold the true answer for any point in the
+cell, and because a point is at most CELL_REACH_KM from the centre only
+the head of the list that can still reach the final page needs exact
+distances.
+
+Keys carry the version of every region (REGION_CELLS x REGION_CELLS grid
+cells) the list can cover. Saving, moving or deleting a mechanic bumps
+the regions it left and entered, so affected lists are never read again
+and simply expire. Values are plain lists, which every cache backend,
+local-memory and file-based included, can store.
+
+Keys have no vehicle or service-type part: no search filters mechanics by
+either (profiles only carry a free-text specialization), so such a key
+would only store the same list several times. Add it to _key() along with
+the filter if one is ever introduced.
+"""
+import hashlib
+import math
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+
+from .spatial import INVALIDATED_KEY, mechanic_index
+from .utils import KM_PER_DEG_LAT, distances_km, grid_cell, grid_cell_bounds, nearest_km
+from .versions import bump_version, get_versions
+
+SEARCH_CELL_DEG = 0.01  # roughly 1.1 km
+# Furthest any point of a search cell can be from its centre
+CELL_REACH_KM = SEARCH_CELL_DEG * KM_PER_DEG_LAT * math.sqrt(2) / 2 * 1.01
+REGION_CELLS = 10       # grid cells per region side, about 55 km
+CACHE_TTL = getattr(settings, 'NEARBY_CACHE_TTL', 60)
+
+
+# ---------------- Invalidation ----------------
+def _region_name(row, col):
+    return f'nearby-region:{row // REGION_CELLS}:{col // REGION_CELLS}'
+
+
+def bump_regions(*cells):
+    """Mark the regions holding these (grid_row, grid_col) cells as changed."""
+    for name in {_region_name(row, col) for row, col in cells if row is not None and col is not None}:
+        bump_version(name)
+
+
+def _key(row, col, center_lat, center_lon, reach_km, radius_km, limit):
+    min_row, max_row, min_col, max_col = grid_cell_bounds(center_lat, center_lon, reach_km)
+    names = [
+        f'nearby-region:{r}:{c}'
+        for r in range(min_row // REGION_CELLS, max_row // REGION_CELLS + 1)
+        for c in range(min_col // REGION_CELLS, max_col // REGION_CELLS + 1)
+    ]
+    versions = get_versions(names + [INVALIDATED_KEY])
+    digest = hashlib.md5(repr(versions).encode()).hexdigest()
+    return f'nearby:{row}:{col}:{radius_km}:{limit}:{digest}'
+
+
+# ---------------- Lookups ----------------
+def _candidates(center_lat, center_lon, reach_km, limit):
+    ids, lats, lons, dist = mechanic_index.nearest_points(center_lat, center_lon, radius_km=reach_km)
+    if limit is not None and len(ids) > limit:
+        # Anything further than this from the centre loses to the centre's
+        # `limit` nearest wherever the search point is in the cell
+        keep = dist <= dist[limit - 1] + 2 * CELL_REACH_KM
+        ids, lats, lons, dist = ids[keep], lats[keep], lons[keep], dist[keep]
+    return ids.tolist(), lats.tolist(), lons.tolist(), dist.tolist()
+
+
+def nearest_cached(lat, lon, radius_km, limit=None):
+    """
+    mechanic_index.nearest(lat, lon, radius_km=radius_km, k=limit), served
+    from the cell cache. Returns [(mechanic_id, distance_km)] nearest first.
+    """
+    lat, lon = float(lat), float(lon)
+    row, col = grid_cell(lat, lon, SEARCH_CELL_DEG)
+    center_lat, center_lon = (row + 0.5) * SEARCH_CELL_DEG, (col + 0.5) * SEARCH_CELL_DEG
+    reach_km = radius_km + CELL_REACH_KM
+
+    key = _key(row, col, center_lat, center_lon, reach_km, radius_km, limit)
+    cached = cache.get(key)
+    if cached is None:
+        cached = _candidates(center_lat, center_lon, reach_km, limit)
+        cache.set(key, cached, CACHE_TTL)
+    ids, lats, lons, from_center = (np.asarray(values) for values in cached)
+
+    # Only candidates this close to the centre can make the final page
+    bound = radius_km
+    if limit is not None and len(ids) > limit:
+        bound = min(bound, distances_km(lat, lon, lats[:limit], lons[:limit]).max())
+    head = int(np.searchsorted(from_center, bound + CELL_REACH_KM, side='right'))
+
+    keep, dist = nearest_km(lat, lon, lats[:head], lons[:head], radius_km, limit)
+    return [(int(ids[i]), float(d)) for i, d in zip(keep, dist)]
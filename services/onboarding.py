@@ -0,0 +1,239 @@
+# services/onboarding.py
+"""
+Bulk mechanic onboarding from CSV or JSON Lines files.
+
+Rows are streamed and checked against usernames, emails and phone numbers
+loaded once up front, instead of the per-row queries the registration form
+runs. Passwords are hashed across a process pool, missing coordinates are
+geocoded once per distinct address, and users and profiles are written with
+bulk_create one chunk per transaction. After every committed chunk the
+number of consumed rows is saved to a checkpoint file so an interrupted
+import resumes where it stopped.
+"""
+import csv
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal
+from pathlib import Path
+
+import django
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+
+from accounts.models import MechanicProfile
+from utils.geocode import geocode_addresses
+from .geocoding import acquire_upstream_slot
+from .models import GeocodeJob
+from .spatial import mechanic_index
+from .utils import grid_cell
+
+IMPORT_CHUNK_SIZE = 500
+REQUIRED_FIELDS = ('username', 'service_center_name', 'phone', 'location')
+PHONE_RE = re.compile(r'^[6-9]\d{9}$')
+
+
+class ImportResult:
+    def __init__(self, start=0):
+        self.start = start
+        self.rows = start
+        self.created = 0
+        self.rejected = []       # (row number, reason)
+        self.geocode_queued = 0
+
+
+# ---------------- Reading ----------------
+def read_rows(path):
+    """Yield one dict per record of a .csv or .jsonl file."""
+    path = Path(path)
+    with path.open(newline='', encoding='utf-8') as handle:
+        if path.suffix.lower() == '.csv':
+            yield from csv.DictReader(handle)
+        else:
+            for line in handle:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def checkpoint_path(path):
+    return Path(f'{path}.progress')
+
+
+def read_checkpoint(path):
+    try:
+        return int(checkpoint_path(path).read_text())
+    except (FileNotFoundError, ValueError):
+        return 0
+
+
+def write_checkpoint(path, rows):
+    target = checkpoint_path(path)
+    tmp = target.with_name(target.name + '.tmp')
+    tmp.write_text(str(rows))
+    os.replace(tmp, target)
+
+
+# ---------------- Validation ----------------
+class Registry:
+    """Usernames, emails and phones already taken, loaded once."""
+
+    def __init__(self):
+        self.usernames = {u.lower() for u in User.objects.values_list('username', flat=True)}
+        self.emails = {e.lower() for e in User.objects.exclude(email='').values_list('email', flat=True)}
+        self.phones = set(MechanicProfile.objects.values_list('phone', flat=True))
+
+    def check(self, row):
+        """Return a cleaned copy of row, or raise ValueError with the reason."""
+        row = {key: (value.strip() if isinstance(value, str) else value)
+               for key, value in row.items() if key}
+        for field in REQUIRED_FIELDS:
+            if not row.get(field):
+                raise ValueError(f"missing {field}")
+        row['phone'] = re.sub(r'[^\d]', '', str(row['phone']))
+        if not PHONE_RE.match(row['phone']):
+            raise ValueError("invalid phone number")
+        if row['username'].lower() in self.usernames:
+            raise ValueError("username already taken")
+        email = (row.get('email') or '').lower()
+        if email and email in self.emails:
+            raise ValueError("email already registered")
+        if row['phone'] in self.phones:
+            raise ValueError("phone number already registered")
+        row['latitude'] = _coordinate(row.get('latitude'), 'latitude', 90)
+        row['longitude'] = _coordinate(row.get('longitude'), 'longitude', 180)
+
+        # Later rows in the same file compete with this one too
+        self.usernames.add(row['username'].lower())
+        if email:
+            self.emails.add(email)
+        self.phones.add(row['phone'])
+        return row
+
+
+def _coordinate(value, name, limit):
+    """
+    Parse a coordinate to what MechanicProfile can store. A bad value is
+    rejected here, for its row alone, rather than failing the chunk's
+    bulk_create.
+    """
+    if value in (None, ''):
+        return None
+    field = MechanicProfile._meta.get_field(name)
+    try:
+        number = Decimal(str(value))
+        if not number.is_finite():
+            raise ValueError
+        number = number.quantize(Decimal(1).scaleb(-field.decimal_places))
+    except (ArithmeticError, ValueError):
+        raise ValueError(f"invalid {name}")
+    if abs(number) > limit or len(number.as_tuple().digits) > field.max_digits:
+        raise ValueError(f"{name} out of range")
+    return number
+
+
+# ---------------- Writing ----------------
+def _setup_worker():
+    # Spawned workers start without Django configured
+    django.setup()
+
+
+def hash_passwords(passwords, pool=None):
+    """Hash the non-empty passwords, on the pool when there is one."""
+    if pool is None:
+        return [make_password(p or None) for p in passwords]
+    to_hash = [p for p in passwords if p]
+    hashed = iter(pool.map(make_password, to_hash, chunksize=max(1, len(to_hash) // 32)))
+    return [next(hashed) if p else make_password(None) for p in passwords]
+
+
+def _geocode_missing(rows):
+    """Fill coordinates for rows that have none, one lookup per distinct address."""
+    addresses = [row['location'] for row in rows if row['latitude'] is None or row['longitude'] is None]
+    if not addresses:
+        return
+    found = geocode_addresses(addresses, throttle=acquire_upstream_slot)
+    for row in rows:
+        if row['latitude'] is None or row['longitude'] is None:
+            lat, lng = found.get(row['location'], (None, None))
+            if lat is not None:
+                row['latitude'] = Decimal(str(round(lat, 6)))
+                row['longitude'] = Decimal(str(round(lng, 6)))
+
+
+def write_chunk(rows, pool=None, geocode=True):
+    """Create users and profiles for validated rows. Returns how many were left to the geocode queue."""
+    if geocode:
+        _geocode_missing(rows)
+    passwords = hash_passwords([row.get('password') or '' for row in rows], pool)
+
+    with transaction.atomic():
+        users = User.objects.bulk_create([
+            User(username=row['username'], email=row.get('email') or '', password=password,
+                 first_name=row.get('first_name') or '', last_name=row.get('last_name') or '')
+            for row, password in zip(rows, passwords)
+        ])
+        profiles = []
+        for row, user in zip(rows, users):
+            grid_row, grid_col = grid_cell(row['latitude'], row['longitude'])
+            profiles.append(MechanicProfile(
+                user=user,
+                service_center_name=row['service_center_name'],
+                phone=row['phone'],
+                location=row['location'],
+                latitude=row['latitude'],
+                longitude=row['longitude'],
+                grid_row=grid_row,
+                grid_col=grid_col,
+                specialization=row.get('specialization') or None,
+            ))
+        profiles = MechanicProfile.objects.bulk_create(profiles)
+
+        # bulk_create skips the post_save signal that normally queues these
+        jobs = GeocodeJob.objects.bulk_create([
+            GeocodeJob(target='mechanic', object_id=profile.pk, address=profile.location[:255])
+            for profile in profiles if profile.latitude is None or profile.longitude is None
+        ])
+        transaction.on_commit(mechanic_index.invalidate)
+    return len(jobs)
+
+
+def import_mechanics(path, chunk_size=IMPORT_CHUNK_SIZE, workers=None, geocode=True, resume=True):
+    """Import every row of path not covered by its checkpoint. Returns an ImportResult."""
+    start = read_checkpoint(path) if resume else 0
+    result = ImportResult(start)
+    registry = Registry()
+    pool = None
+
+    def flush(chunk):
+        nonlocal pool
+        # Starting the workers costs more than hashing a partial chunk here,
+        # so an import smaller than one chunk never starts them
+        if pool is None and workers != 0 and len(chunk) >= chunk_size:
+            pool = ProcessPoolExecutor(workers, initializer=_setup_worker)
+        result.geocode_queued += write_chunk(chunk, pool, geocode)
+        result.created += len(chunk)
+        write_checkpoint(path, result.rows)
+
+    try:
+        chunk = []
+        for number, row in enumerate(read_rows(path), start=1):
+            if number <= start:
+                continue
+            result.rows = number
+            try:
+                chunk.append(registry.check(row))
+            except ValueError as exc:
+                result.rejected.append((number, str(exc)))
+            if len(chunk) >= chunk_size:
+                flush(chunk)
+                chunk = []
+        if chunk:
+            flush(chunk)
+        else:
+            write_checkpoint(path, result.rows)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    return result
@@ -0,0 +1,115 @@
+# services/pagination.py
+"""
+Opaque (timestamp, id) cursors for keyset pagination and delta polling,
+and a paginator for admin changelists that never counts a whole table.
+"""
+import base64
+from datetime import datetime
+
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+
+def encode_cursor(moment, pk):
+    raw = f"{moment.isoformat()}|{pk}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return (datetime, id) for a cursor, or None if it is missing or malformed."""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        moment, pk = raw.rsplit('|', 1)
+        return datetime.fromisoformat(moment), int(pk)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+# ---------------- Keyset Pages ----------------
+PAGE_SIZE = 20
+
+
+def keyset_page(queryset, cursor=None, page_size=PAGE_SIZE):
+    """
+    Return (rows, next_cursor) for a newest-first page of queryset, ordered
+    by (created_at, id). Each page is an index range scan, so its cost does
+    not depend on how many older rows exist.
+    """
+    return merged_keyset_page([queryset], cursor, page_size)
+
+
+def merged_keyset_page(querysets, cursor=None, page_size=PAGE_SIZE):
+    """
+    keyset_page() over several querysets whose ids never overlap, such as a
+    hot table and its archive. Each is read with its own range scan and the
+    newest rows of all of them make up the page.
+    """
+    position = decode_cursor(cursor)
+    rows = []
+    for queryset in querysets:
+        if position:
+            created_at, pk = position
+            queryset = queryset.filter(
+                Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk)
+            )
+        rows.extend(queryset.order_by('-created_at', '-id')[:page_size + 1])
+    if len(querysets) > 1:
+        rows.sort(key=lambda row: (row.created_at, row.id), reverse=True)
+
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
+    return rows, next_cursor
+
+
+# ---------------- Estimated Counts ----------------
+# Filtered counts stop here; the changelist then offers this many rows' worth of pages
+COUNT_CAP = 10000
+
+
+def table_row_estimate(model, using):
+    """Row count from the planner statistics, or None if there are none."""
+    connection = connections[using]
+    table = model._meta.db_table
+    try:
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'")
+                if cursor.fetchone() is None:
+                    return None
+                # First number of each stat is the row count of that index
+                cursor.execute('SELECT stat FROM sqlite_stat1 WHERE tbl = %s', [table])
+                counts = [int(stat.split()[0]) for stat, in cursor.fetchall()]
+                return max(counts) if counts else None
+            if connection.vendor == 'postgresql':
+                cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [table])
+                row = cursor.fetchone()
+                return row[0] if row and row[0] >= 0 else None
+    except DatabaseError:
+        return None
+    return None
+
+
+def estimated_count(queryset, cap=COUNT_CAP):
+    """
+    Table statistics for a large unfiltered queryset; otherwise an exact
+    count that gives up at cap rows.
+    """
+    if not queryset.query.where:
+        estimate = table_row_estimate(queryset.model, queryset.db)
+        if estimate is not None and estimate >= cap:
+            return estimate
+    return queryset.order_by()[:cap].count()
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator for large admin changelists; see estimated_count()."""
+
+    @cached_property
+    def count(self):
+        return estimated_count(self.object_list, COUNT_CAP)
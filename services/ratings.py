@@ -0,0 +1,52 @@
+# services/ratings.py
+"""
+Denormalized feedback aggregates on MechanicProfile.
+
+rating_sum and rating_count are adjusted with F() expressions whenever a
+Feedback row is created, edited or deleted, so concurrent submissions never
+lose an update. rating_avg is then derived from the stored totals.
+Archived feedback (see services.archive) keeps counting towards them.
+"""
+from django.db import transaction
+from django.db.models import Case, Count, F, FloatField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Cast, Coalesce
+
+
+def _average():
+    return Case(
+        When(rating_count=0, then=Value(0.0)),
+        default=Cast(F('rating_sum'), FloatField()) / F('rating_count'),
+        output_field=FloatField(),
+    )
+
+
+def apply_rating_change(mechanic_id, sum_delta, count_delta):
+    """Add sum_delta/count_delta to a mechanic's totals and refresh the average."""
+    from accounts.models import MechanicProfile
+
+    if mechanic_id is None or (sum_delta == 0 and count_delta == 0):
+        return
+    with transaction.atomic():
+        profiles = MechanicProfile.objects.filter(pk=mechanic_id)
+        profiles.update(
+            rating_sum=F('rating_sum') + sum_delta,
+            rating_count=F('rating_count') + count_delta,
+        )
+        profiles.update(rating_avg=_average())
+
+
+def recompute_ratings(profiles, *feedback_models):
+    """
+    Rebuild the aggregates for a MechanicProfile queryset in two UPDATEs,
+    counting the rows of every given feedback model (live and archived).
+    """
+    sums, counts = [], []
+    for feedback_model in feedback_models:
+        feedback = feedback_model.objects.filter(
+            mechanic=OuterRef('pk')
+        ).order_by().values('mechanic')
+        sums.append(Coalesce(Subquery(feedback.annotate(total=Sum('rating')).values('total')), 0))
+        counts.append(Coalesce(Subquery(feedback.annotate(total=Count('id')).values('total')), 0))
+    with transaction.atomic():
+        profiles.update(rating_sum=sum(sums[1:], sums[0]), rating_count=sum(counts[1:], counts[0]))
+        return profiles.update(rating_avg=_average())
@@ -0,0 +1,132 @@
+# services/signals.py
+import threading
+from contextlib import contextmanager
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from accounts.models import MechanicProfile
+from .events import publish_request_change
+from .geocoding import enqueue_geocode, needs_geocoding
+from .models import Feedback, ServiceRequest
+from .nearby_cache import bump_regions
+from .ratings import apply_rating_change
+from .spatial import mechanic_changed, mechanic_deleted
+from .versions import bump_feedback_version, bump_request_versions
+
+
+# ---------------- Mechanic Index ----------------
+@receiver(post_save, sender=MechanicProfile)
+def mechanic_profile_saved(sender, instance, **kwargs):
+    mechanic_changed(instance)
+    cells = (getattr(instance, '_loaded_cell', (None, None)), (instance.grid_row, instance.grid_col))
+    instance._loaded_cell = cells[1]
+    transaction.on_commit(lambda: bump_regions(*cells))
+
+
+@receiver(post_delete, sender=MechanicProfile)
+def mechanic_profile_deleted(sender, instance, **kwargs):
+    mechanic_deleted(instance.pk)
+    cell = (instance.grid_row, instance.grid_col)
+    transaction.on_commit(lambda: bump_regions(cell))
+
+
+# ---------------- User Roles ----------------
+def _expire_cached_role(user_id):
+    # RoleMiddleware trusts a session's cached role only while last_login is
+    # unchanged; the user row is loaded on every request anyway
+    User.objects.filter(pk=user_id).update(last_login=timezone.now())
+
+
+@receiver(post_save, sender=MechanicProfile)
+def mechanic_profile_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        _expire_cached_role(instance.user_id)
+
+
+@receiver(post_delete, sender=MechanicProfile)
+def mechanic_profile_removed(sender, instance, **kwargs):
+    _expire_cached_role(instance.user_id)
+
+
+# ---------------- Geocoding Queue ----------------
+@receiver(post_save, sender=MechanicProfile)
+def queue_mechanic_geocode(sender, instance, raw=False, **kwargs):
+    if not raw and needs_geocoding(instance):
+        enqueue_geocode('mechanic', instance)
+
+
+@receiver(post_save, sender=ServiceRequest)
+def queue_request_geocode(sender, instance, raw=False, **kwargs):
+    if not raw and needs_geocoding(instance):
+        enqueue_geocode('request', instance)
+
+
+# ---------------- Rating Aggregates ----------------
+_archiving = threading.local()
+
+
+@contextmanager
+def archiving():
+    """
+    Feedback deleted in this block is being moved to ArchivedFeedback, where
+    it still counts towards the mechanic's rating and still shows on the
+    profile, so the rating and feedback-version receivers leave it alone.
+    """
+    previous = getattr(_archiving, 'active', False)
+    _archiving.active = True
+    try:
+        yield
+    finally:
+        _archiving.active = previous
+
+
+@receiver(pre_save, sender=Feedback)
+def remember_previous_rating(sender, instance, raw=False, **kwargs):
+    instance._previous_rating = None
+    if not raw and instance.pk:
+        instance._previous_rating = Feedback.objects.filter(pk=instance.pk).values_list(
+            'mechanic_id', 'rating'
+        ).first()
+
+
+@receiver(post_save, sender=Feedback)
+def feedback_saved(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_previous_rating', None)
+    if previous is None:
+        apply_rating_change(instance.mechanic_id, instance.rating, 1)
+    elif previous[0] == instance.mechanic_id:
+        apply_rating_change(instance.mechanic_id, instance.rating - previous[1], 0)
+    else:
+        apply_rating_change(previous[0], -previous[1], -1)
+        apply_rating_change(instance.mechanic_id, instance.rating, 1)
+    previous_mechanic_id = previous[0] if previous else None
+    transaction.on_commit(lambda: bump_feedback_version(instance.mechanic_id, previous_mechanic_id))
+
+
+@receiver(post_delete, sender=Feedback)
+def feedback_deleted(sender, instance, **kwargs):
+    if getattr(_archiving, 'active', False):
+        return
+    apply_rating_change(instance.mechanic_id, -instance.rating, -1)
+    transaction.on_commit(lambda: bump_feedback_version(instance.mechanic_id))
+
+
+# ---------------- Request Changes ----------------
+@receiver(post_save, sender=ServiceRequest)
+def service_request_saved(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previous_mechanic_id = getattr(instance, '_loaded_mechanic_id', None)
+    instance._loaded_mechanic_id = instance.mechanic_id
+
+    def after_commit():
+        bump_request_versions(instance, previous_mechanic_id)
+        publish_request_change(instance, previous_mechanic_id)
+
+    transaction.on_commit(after_commit)
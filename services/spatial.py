@@ -0,0 +1,239 @@
+# services/spatial.py
+"""
+Process-local k-d tree of approved, available mechanics.
+
+The tree is built over unit vectors on the sphere so that straight-line
+(chord) distance orders points the same way as great-circle distance.
+Single mechanic changes are applied incrementally: moved or removed
+mechanics are masked out of the tree and new positions are kept in a small
+side table that is scanned with the batch distance kernel. The tree is
+rebuilt once the side table grows large, or when another process bumps
+the shared version counter. Live GPS moves are shared more cheaply: a
+separate counter tells other processes to read just the recently moved
+rows and fold them into their side tables.
+"""
+import math
+import threading
+from datetime import timedelta
+
+import numpy as np
+from django.db import transaction
+from django.utils import timezone
+from scipy.spatial import cKDTree
+
+from .utils import EARTH_RADIUS_KM, nearest_km
+from .versions import DATABASE, bump_version, get_versions
+
+VERSION_KEY = 'mechanic-index'
+# Bumped by publish_moves() once live positions are written
+MOVED_KEY = 'mechanic-index:moved'
+# Positions are stamped when a ping arrives but written up to a flush
+# interval later, so a moves check reads back this far past the last one
+MOVE_LOOKBACK = timedelta(minutes=1)
+# Bumped only by invalidate(), for caches built on the index that track
+# single mechanic changes themselves (see services.nearby_cache)
+INVALIDATED_KEY = 'mechanic-index:invalidated'
+# Rebuild the tree once this many incremental changes have piled up
+REBUILD_THRESHOLD = 256
+
+
+def _unit_vectors(lats, lons):
+    lat_r = np.radians(lats)
+    lon_r = np.radians(lons)
+    cos_lat = np.cos(lat_r)
+    return np.column_stack((cos_lat * np.cos(lon_r), cos_lat * np.sin(lon_r), np.sin(lat_r)))
+
+
+def _chord_length(radius_km):
+    angle = min(radius_km / EARTH_RADIUS_KM, math.pi)
+    return 2 * math.sin(angle / 2)
+
+
+class MechanicIndex:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._version = None
+        self._tree = None
+        self._ids = np.empty(0, dtype=np.int64)
+        self._lats = np.empty(0)
+        self._lons = np.empty(0)
+        self._positions = {}   # id -> row in the tree
+        self._masked = set()   # tree rows that are no longer valid
+        self._pending = {}     # id -> (lat, lon) not yet in the tree
+        self._moved_at = {}    # id -> time of the live position applied
+        self._moves_version = None
+        self._moves_checked_at = None
+
+    # ---------------- Building ----------------
+    def _load(self):
+        from accounts.models import MechanicProfile
+
+        # The version is read from the primary, so the tree must be too; a
+        # tree built from a lagging replica would be trusted until the next bump
+        rows = MechanicProfile.objects.using(DATABASE).filter(
+            approved=True, is_available=True,
+            latitude__isnull=False, longitude__isnull=False,
+        ).values_list('id', 'latitude', 'longitude')
+        return {pk: (float(lat), float(lon)) for pk, lat, lon in rows}
+
+    def _build(self, points):
+        ids = np.fromiter(points.keys(), dtype=np.int64, count=len(points))
+        coords = np.array(list(points.values()), dtype=np.float64).reshape(-1, 2)
+        self._ids = ids
+        self._lats, self._lons = coords[:, 0], coords[:, 1]
+        self._tree = cKDTree(_unit_vectors(self._lats, self._lons)) if len(ids) else None
+        self._positions = {int(pk): row for row, pk in enumerate(ids)}
+        self._masked = set()
+        self._pending = {}
+
+    def _points(self):
+        """Current id -> (lat, lon) mapping, including incremental changes."""
+        points = {
+            int(pk): (self._lats[row], self._lons[row])
+            for row, pk in enumerate(self._ids) if row not in self._masked
+        }
+        points.update(self._pending)
+        return points
+
+    def _load_moves(self):
+        from accounts.models import MechanicProfile
+
+        checked_at = timezone.now()
+        rows = MechanicProfile.objects.using(DATABASE).filter(
+            approved=True, is_available=True,
+            location_updated_at__gte=self._moves_checked_at - MOVE_LOOKBACK,
+        ).values_list('id', 'latitude', 'longitude', 'location_updated_at')
+        for pk, lat, lon, moved_at in rows:
+            self.move(pk, float(lat), float(lon), moved_at)
+        self._moves_checked_at = checked_at
+
+    def _ensure_current(self):
+        version, moves_version = get_versions([VERSION_KEY, MOVED_KEY])
+        if version != self._version:
+            checked_at = timezone.now()
+            self._build(self._load())
+            self._moved_at = {}
+            self._version = version
+            self._moves_version, self._moves_checked_at = moves_version, checked_at
+        elif moves_version != self._moves_version:
+            self._load_moves()
+            self._moves_version = moves_version
+        if len(self._pending) + len(self._masked) > REBUILD_THRESHOLD:
+            self._build(self._points())
+
+    # ---------------- Updates ----------------
+    def _discard(self, pk):
+        self._pending.pop(pk, None)
+        row = self._positions.get(pk)
+        if row is not None:
+            self._masked.add(row)
+
+    def update(self, mechanic):
+        """Apply a single saved MechanicProfile to the local tree."""
+        with self._lock:
+            if self._version is None:
+                return
+            self._discard(mechanic.pk)
+            if (mechanic.approved and mechanic.is_available
+                    and mechanic.latitude is not None and mechanic.longitude is not None):
+                self._pending[mechanic.pk] = (float(mechanic.latitude), float(mechanic.longitude))
+
+    def move(self, pk, lat, lon, moved_at=None):
+        """
+        Move an indexed mechanic to a live position; others are ignored, as
+        is a position older than one already applied.
+        """
+        with self._lock:
+            if self._version is None:
+                return
+            row = self._positions.get(pk)
+            if pk not in self._pending and (row is None or row in self._masked):
+                return
+            if moved_at is not None:
+                if pk in self._moved_at and self._moved_at[pk] >= moved_at:
+                    return
+                self._moved_at[pk] = moved_at
+            self._discard(pk)
+            self._pending[pk] = (float(lat), float(lon))
+
+    def remove(self, pk):
+        """Drop a deleted mechanic from the local tree."""
+        with self._lock:
+            if self._version is not None:
+                self._discard(pk)
+
+    def publish(self):
+        """Bump the shared version so other processes rebuild their trees."""
+        version = bump_version(VERSION_KEY)
+        with self._lock:
+            # Stay current only if nobody else changed the index in between
+            if self._version is not None and version == self._version + 1:
+                self._version = version
+            else:
+                self._version = None
+
+    def publish_moves(self):
+        """Tell other processes to read the live positions just written."""
+        version = bump_version(MOVED_KEY)
+        with self._lock:
+            # This process applied its own moves as the pings arrived
+            if self._moves_version is not None and version == self._moves_version + 1:
+                self._moves_version = version
+
+    def invalidate(self):
+        """Force every process to rebuild, e.g. after a queryset.update()."""
+        with self._lock:
+            self._version = None
+        bump_version(VERSION_KEY)
+        bump_version(INVALIDATED_KEY)
+
+    # ---------------- Queries ----------------
+    def _candidates(self, lat, lon, radius_km=None, k=None):
+        rows = []
+        if self._tree is not None:
+            point = _unit_vectors(np.array([float(lat)]), np.array([float(lon)]))[0]
+            if radius_km is not None:
+                rows = self._tree.query_ball_point(point, _chord_length(radius_km))
+            else:
+                count = min(k + len(self._masked), len(self._ids))
+                _, rows = self._tree.query(point, k=count)
+                rows = np.atleast_1d(rows)
+            rows = [row for row in rows if row not in self._masked]
+
+        ids = [int(self._ids[row]) for row in rows] + list(self._pending)
+        lats = np.concatenate((self._lats[rows], [p[0] for p in self._pending.values()]))
+        lons = np.concatenate((self._lons[rows], [p[1] for p in self._pending.values()]))
+        return np.array(ids, dtype=np.int64), lats, lons
+
+    def nearest_points(self, lat, lon, radius_km=None, k=None):
+        """nearest() as NumPy arrays (ids, lats, lons, distances_km)."""
+        if radius_km is None and k is None:
+            raise ValueError("nearest() needs radius_km or k")
+        with self._lock:
+            self._ensure_current()
+            ids, lats, lons = self._candidates(lat, lon, radius_km, k)
+
+        keep, dist = nearest_km(lat, lon, lats, lons, radius_km, k)
+        return ids[keep], lats[keep], lons[keep], dist
+
+    def nearest(self, lat, lon, radius_km=None, k=None):
+        """
+        Return [(mechanic_id, distance_km)] nearest first, within radius_km
+        and/or limited to the k nearest. At least one of the two is required.
+        """
+        ids, _, _, dist = self.nearest_points(lat, lon, radius_km, k)
+        return [(int(pk), float(d)) for pk, d in zip(ids, dist)]
+
+
+mechanic_index = MechanicIndex()
+
+
+def mechanic_changed(mechanic):
+    """Update the local tree now and tell other processes once committed."""
+    mechanic_index.update(mechanic)
+    transaction.on_commit(mechanic_index.publish)
+
+
+def mechanic_deleted(pk):
+    mechanic_index.remove(pk)
+    transaction.on_commit(mechanic_index.publish)
@@ -1,3 +1,1874 @@
-from django.test import TestCase
+import asyncio
+import csv
+import json
+import math
+import os
+import random
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import aclosing
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.contrib.auth.hashers import check_password
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, connections
+from django.db.models import Count, F, QuerySet
+from django.http import HttpResponse, JsonResponse
+from django.template import Engine, engines
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from geopy.exc import GeocoderUnavailable
+from PIL import Image
+
+from accounts.models import MechanicProfile
+from roadmech import template_profiler
+from roadmech.db_router import PrimaryReplicaRouter, STICKY_COOKIE, replica_reads
+from roadmech.middleware import PrimaryStickinessMiddleware
+from roadmech.query_log import fingerprint, query_budget
+from roadmech.static_assets import _choose_encoding, accepted_encodings, build_image_variants, variant_widths
+from utils import geocode
+from .archive import REQUEST_FIELDS, archive_finished_requests
+from .assignment import broadcast_request, cancel_request, claim_request
+from .dashboard import DASHBOARD_LIST_LIMIT, mechanic_dashboard_context
+from .dispatch import MAX_WORKLOAD, _write_assignments, dispatch_pending
+from .events import DashboardBroker
+from .live_location import LocationBuffer, location_buffer
+from . import geocoding
+from .models import (
+    ArchivedFeedback, ArchivedServiceRequest, Feedback, GeocodeCache, GeocodeJob, GeocodeThrottle, RequestOffer,
+    ServiceRequest,
+)
+from .nearby_cache import nearest_cached
+from .onboarding import hash_passwords, import_mechanics
+from .pagination import estimated_count, merged_keyset_page
+from .spatial import INVALIDATED_KEY, MOVED_KEY, VERSION_KEY, MechanicIndex, mechanic_index
+from .utils import distances_km, grid_cell, grid_cell_bounds, haversine_km, nearest_km, pairwise_distances_km
+from .versions import (
+    bump_version, bump_versions, get_version, get_versions, mechanic_feedback_version, mechanic_requests_version,
+    user_requests_version,
+)
+from .views import (
+    ALREADY_TAKEN, DEFAULT_SEARCH_RADIUS_KM, MAX_SEARCH_RADIUS_KM, POLL_SETTLE, STATUS_CONFLICT, history_page,
+)
+
+
+class FakeLocation:
+    def __init__(self, latitude, longitude):
+        self.latitude = latitude
+        self.longitude = longitude
+
+
+class FakeGeocoder:
+    """Stands in for the rate-limited Nominatim client."""
+
+    def __init__(self, places=None, delay=None):
+        self.places = places or {}
+        self.calls = []
+        self.delay = delay
+        self.lock = threading.Lock()
+
+    def __call__(self, address):
+        with self.lock:
+            self.calls.append(address)
+        if self.delay is not None:
+            self.delay.wait(5)
+        coords = self.places.get(address)
+        return FakeLocation(*coords) if coords else None
+
+
+class GeocodeCacheTests(TestCase):
+    def setUp(self):
+        geocode.memory_cache.clear()
+        self.fake = FakeGeocoder({'Valanchery, Kerala': (10.884653, 76.038162)})
+        patcher = mock.patch.object(geocode, 'geocode', self.fake)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_repeat_lookups_hit_upstream_once(self):
+        first = geocode.geocode_address('Valanchery, Kerala')
+        second = geocode.geocode_address('  valanchery   KERALA ')
+        self.assertEqual(first, (10.884653, 76.038162))
+        self.assertEqual(second, first)
+        self.assertEqual(len(self.fake.calls), 1)
+
+    def test_database_tier_survives_memory_eviction(self):
+        geocode.geocode_address('Valanchery, Kerala')
+        geocode.memory_cache.clear()
+        with self.assertNumQueries(1):
+            self.assertEqual(geocode.geocode_address('Valanchery, Kerala'), (10.884653, 76.038162))
+        self.assertEqual(len(self.fake.calls), 1)
+
+    def test_unknown_address_is_negatively_cached(self):
+        self.assertEqual(geocode.geocode_address('Nowhere Junction'), (None, None))
+        self.assertEqual(geocode.geocode_address('Nowhere Junction'), (None, None))
+        self.assertEqual(len(self.fake.calls), 1)
+        row = GeocodeCache.objects.get()
+        self.assertIsNone(row.latitude)
+
+    def test_expired_entries_are_refreshed(self):
+        geocode.geocode_address('Valanchery, Kerala')
+        GeocodeCache.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        geocode.memory_cache.clear()
+        geocode.geocode_address('Valanchery, Kerala')
+        self.assertEqual(len(self.fake.calls), 2)
+        self.assertEqual(GeocodeCache.objects.count(), 1)
+
+    def test_upstream_errors_are_not_cached(self):
+        with mock.patch.object(geocode, 'geocode', side_effect=GeocoderUnavailable):
+            self.assertEqual(geocode.geocode_address('Valanchery, Kerala'), (None, None))
+        self.assertFalse(GeocodeCache.objects.exists())
+        self.assertEqual(geocode.geocode_address('Valanchery, Kerala'), (10.884653, 76.038162))
+
+
+class GeocodeJobTests(TestCase):
+    def setUp(self):
+        geocode.memory_cache.clear()
+        self.fake = FakeGeocoder({'Valanchery, Kerala': (10.884653, 76.038162)})
+        patcher = mock.patch.object(geocode, 'geocode', self.fake)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.customer = User.objects.create(username='customer')
+        # No coordinates, so saving queues a job
+        self.service_request = ServiceRequest.objects.create(
+            user=self.customer, vehicle_type='car', service_type='fuel', location='Valanchery, Kerala',
+        )
+
+    def test_enqueue_keeps_one_pending_job_per_record(self):
+        geocoding.enqueue_geocode('request', self.service_request)
+        self.service_request.save()
+        job = GeocodeJob.objects.get()
+        self.assertEqual((job.target, job.object_id, job.status), ('request', self.service_request.pk, 'Pending'))
+
+    def test_claim_takes_each_job_once(self):
+        job = geocoding.claim_job()
+        self.assertEqual((job.status, job.attempts), ('Running', 1))
+        self.assertIsNone(geocoding.claim_job())
+
+    def test_jobs_wait_for_their_retry_time(self):
+        GeocodeJob.objects.update(run_after=timezone.now() + timedelta(minutes=1))
+        self.assertIsNone(geocoding.claim_job())
+
+    def test_stale_running_jobs_are_taken_over(self):
+        geocoding.claim_job()
+        # A live worker's job is left alone
+        self.assertIsNone(geocoding.claim_job())
+        GeocodeJob.objects.update(updated_at=timezone.now() - geocoding.STALE_AFTER - timedelta(seconds=1))
+        job = geocoding.claim_job()
+        self.assertEqual((job.status, job.attempts), ('Running', 2))
+
+    def test_run_job_writes_coordinates_and_touches_updated_at(self):
+        before = ServiceRequest.objects.get().updated_at
+        with mock.patch.object(geocoding, 'acquire_upstream_slot'):
+            self.assertEqual(geocoding.process_jobs(), 1)
+        service_request = ServiceRequest.objects.get()
+        self.assertEqual((float(service_request.latitude), float(service_request.longitude)), (10.884653, 76.038162))
+        self.assertGreater(service_request.updated_at, before)
+        self.assertEqual(GeocodeJob.objects.get().status, 'Done')
+
+    def test_retries_skip_the_negative_cache(self):
+        ServiceRequest.objects.update(location='Nowhere Junction')
+        GeocodeJob.objects.update(address='Nowhere Junction')
+        with mock.patch.object(geocoding, 'acquire_upstream_slot'):
+            for attempt in range(geocoding.MAX_ATTEMPTS):
+                GeocodeJob.objects.update(run_after=timezone.now())
+                geocoding.process_jobs()
+        self.assertEqual(self.fake.calls, ['Nowhere Junction'] * geocoding.MAX_ATTEMPTS)
+        self.assertEqual(GeocodeJob.objects.get().status, 'Failed')
+        # Ordinary lookups still trust the negative entry
+        self.assertEqual(geocode.geocode_address('Nowhere Junction'), (None, None))
+        self.assertEqual(len(self.fake.calls), geocoding.MAX_ATTEMPTS)
+
+
+class GeocodeThrottleTests(TestCase):
+    def setUp(self):
+        # Each sleep lets the clock catch up with the reserved slot
+        patcher = mock.patch.object(geocoding.time, 'sleep', side_effect=self.time_passes)
+        self.sleep = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def time_passes(self, seconds):
+        GeocodeThrottle.objects.update(next_call_at=timezone.now() - timedelta(milliseconds=1))
+
+    def slot(self):
+        return GeocodeThrottle.objects.get(name='nominatim').next_call_at
+
+    def test_first_call_goes_straight_through_and_reserves_the_next_slot(self):
+        before = timezone.now()
+        geocoding.acquire_upstream_slot()
+        self.sleep.assert_not_called()
+        self.assertGreaterEqual(self.slot(), before + geocoding.UPSTREAM_INTERVAL)
+
+    def test_next_call_waits_for_the_reserved_slot(self):
+        geocoding.acquire_upstream_slot()
+        geocoding.acquire_upstream_slot()
+        self.assertEqual(self.sleep.call_count, 1)
+        self.assertLessEqual(self.sleep.call_args[0][0], geocoding.UPSTREAM_INTERVAL.total_seconds())
+
+    def test_losing_the_compare_and_set_waits_for_the_winner(self):
+        GeocodeThrottle.objects.create(name='nominatim', next_call_at=timezone.now() - timedelta(seconds=5))
+        original_get = QuerySet.get
+        raced = []
+
+        def get(queryset, *args, **kwargs):
+            value = original_get(queryset, *args, **kwargs)
+            if queryset.model is GeocodeThrottle and queryset._fields == ('next_call_at',) and not raced:
+                # Another process claims the slot between our read and our update
+                raced.append(GeocodeThrottle.objects.update(next_call_at=timezone.now() + timedelta(seconds=1)))
+            return value
+
+        with mock.patch.object(QuerySet, 'get', get):
+            geocoding.acquire_upstream_slot()
+        self.assertEqual(raced, [1])
+        self.assertEqual(self.sleep.call_count, 1)
+
+
+class GeocodeCoalescingTests(TransactionTestCase):
+    def test_concurrent_lookups_share_one_upstream_call(self):
+        geocode.memory_cache.clear()
+        release = threading.Event()
+        fake = FakeGeocoder({'Tirur, Kerala': (10.9147, 75.9214)}, delay=release)
+        results = []
+
+        def lookup():
+            results.append(geocode.geocode_address('Tirur, Kerala'))
+
+        with mock.patch.object(geocode, 'geocode', fake):
+            threads = [threading.Thread(target=lookup) for _ in range(5)]
+            for thread in threads:
+                thread.start()
+            # Let the followers queue up behind the first lookup
+            while not fake.calls:
+                threading.Event().wait(0.01)
+            threading.Event().wait(0.1)
+            release.set()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(len(fake.calls), 1)
+        self.assertEqual(results, [(10.9147, 75.9214)] * 5)
+
+
+class RatingAggregateTests(TestCase):
+    def setUp(self):
+        self.customer = User.objects.create(username='customer')
+        self.mechanic = MechanicProfile.objects.create(
+            user=User.objects.create(username='garage'),
+            service_center_name='Garage', phone='9876543210', location='Valanchery',
+        )
+
+    def assertRating(self, total, count, average):
+        self.mechanic.refresh_from_db()
+        self.assertEqual((self.mechanic.rating_sum, self.mechanic.rating_count), (total, count))
+        self.assertEqual(self.mechanic.average_rating(), average)
+
+    def test_create_edit_delete(self):
+        first = Feedback.objects.create(user=self.customer, mechanic=self.mechanic, rating=5)
+        Feedback.objects.create(user=self.customer, mechanic=self.mechanic, rating=2)
+        self.assertRating(7, 2, 3.5)
+
+        first.rating = 4
+        first.save()
+        self.assertRating(6, 2, 3.0)
+
+        first.delete()
+        self.assertRating(2, 1, 2.0)
+
+    def test_profile_save_keeps_totals(self):
+        stale = MechanicProfile.objects.get(pk=self.mechanic.pk)
+        Feedback.objects.create(user=self.customer, mechanic=self.mechanic, rating=4)
+        stale.service_center_name = 'Renamed Garage'
+        stale.save()
+        self.assertRating(4, 1, 4.0)
+
+    def test_recompute_command_repairs_drift(self):
+        Feedback.objects.create(user=self.customer, mechanic=self.mechanic, rating=3)
+        MechanicProfile.objects.update(rating_sum=0, rating_count=0, rating_avg=0)
+        call_command('recompute_ratings', stdout=StringIO())
+        self.assertRating(3, 1, 3.0)
+
+
+class MechanicDashboardTests(TestCase):
+    def setUp(self):
+        self.mechanic_user = User.objects.create(username='garage')
+        self.mechanic = MechanicProfile.objects.create(
+            user=self.mechanic_user, service_center_name='Garage',
+            phone='9876543210', location='Valanchery',
+        )
+        self.customer = User.objects.create(username='customer')
+        self.client.force_login(self.mechanic_user)
+
+    def add_requests(self, count, status):
+        ServiceRequest.objects.bulk_create([
+            ServiceRequest(user=self.customer, mechanic=self.mechanic, status=status,
+                           vehicle_type='car', service_type='fuel', location='NH 66, Kuttippuram')
+            for _ in range(count)
+        ])
+
+    def test_query_budget_does_not_grow_with_history(self):
+        self.add_requests(3, 'Pending')
+        self.add_requests(DASHBOARD_LIST_LIMIT + 5, 'Completed')
+        # The first visit resolves the role and stores it in the session
+        self.client.get(reverse('mechanic_dashboard'))
+        # session, user, mechanic profile, status counts, request lists; the
+        # card fragment counter is only read with TEMPLATE_PERFORMANCE on
+        with self.assertNumQueries(5):
+            response = self.client.get(reverse('mechanic_dashboard'))
+        self.assertEqual(response.context['counts']['completed'], DASHBOARD_LIST_LIMIT + 5)
+        self.assertEqual(len(response.context['completed_requests']), DASHBOARD_LIST_LIMIT)
+
+        self.add_requests(50, 'Cancelled')
+        with self.assertNumQueries(5):
+            self.client.get(reverse('mechanic_dashboard'))
+
+    def test_only_own_requests_are_listed(self):
+        other = MechanicProfile.objects.create(
+            user=User.objects.create(username='other'), service_center_name='Other',
+            phone='9876543211', location='Tirur',
+        )
+        ServiceRequest.objects.create(user=self.customer, mechanic=other, vehicle_type='car',
+                                      service_type='fuel', location='Tirur bus stand')
+        self.add_requests(2, 'Pending')
+        response = self.client.get(reverse('mechanic_dashboard'))
+        self.assertEqual(response.context['counts']['pending'], 2)
+        self.assertEqual(len(response.context['pending_requests']), 2)
+
+
+class DashboardBrokerTests(SimpleTestCase):
+    async def test_events_fan_out_to_every_subscriber_of_that_mechanic(self):
+        broker = DashboardBroker()
+        with broker.subscribe(1) as first, broker.subscribe(1) as second, broker.subscribe(2) as other:
+            self.assertTrue(broker.has_subscribers(1))
+            # Published from a worker thread, as signal handlers are
+            thread = threading.Thread(target=broker.publish, args=(1, {'id': 7}))
+            thread.start()
+            thread.join()
+            self.assertEqual(await asyncio.wait_for(first.get(), 1), {'id': 7})
+            self.assertEqual(await asyncio.wait_for(second.get(), 1), {'id': 7})
+            self.assertTrue(other.empty())
+        self.assertFalse(broker.has_subscribers(1))
+        self.assertFalse(broker.has_subscribers(2))
+
+    async def test_a_full_queue_drops_events_instead_of_blocking(self):
+        broker = DashboardBroker()
+        with mock.patch('services.events.QUEUE_SIZE', 2), broker.subscribe(1) as queue:
+            for i in range(3):
+                broker.publish(1, {'id': i})
+            await asyncio.sleep(0)
+            self.assertEqual([queue.get_nowait() for _ in range(queue.qsize())], [{'id': 0}, {'id': 1}])
+
+
+class DashboardEventsTests(TestCase):
+    def setUp(self):
+        self.mechanic_user = User.objects.create(username='garage')
+        self.mechanic = MechanicProfile.objects.create(
+            user=self.mechanic_user, service_center_name='Garage', phone='9876543210', location='Valanchery',
+        )
+        self.service_request = ServiceRequest.objects.create(
+            user=User.objects.create(username='customer'), mechanic=self.mechanic, status='Pending',
+            vehicle_type='car', service_type='fuel', location='NH 66, Kuttippuram',
+        )
+        self.url = reverse('mechanic_dashboard_events')
+
+    def accept(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.service_request.status = 'Accepted'
+            self.service_request.save()
+
+    async def open_stream(self):
+        await self.async_client.aforce_login(self.mechanic_user)
+        response = await self.async_client.get(self.url)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = aiter(response.streaming_content)
+        self.assertEqual(await anext(stream), b'retry: 5000\n\n')
+        return stream
+
+    async def test_request_changes_are_streamed_to_the_mechanic(self):
+        async with aclosing(await self.open_stream()) as stream:
+            await sync_to_async(self.accept)()
+            chunk = (await asyncio.wait_for(anext(stream), 5)).decode()
+        self.assertTrue(chunk.startswith('event: request\ndata: '))
+        self.assertTrue(chunk.endswith('\n\n'))
+        event = json.loads(chunk.split('data: ', 1)[1])
+        self.assertEqual(event['id'], self.service_request.pk)
+        self.assertEqual(event['status'], 'Accepted')
+        self.assertEqual(event['counts']['accepted'], 1)
+
+    async def test_idle_streams_send_keep_alive_comments(self):
+        with mock.patch('services.views.SSE_KEEPALIVE_SECONDS', 0.01):
+            async with aclosing(await self.open_stream()) as stream:
+                self.assertEqual(await asyncio.wait_for(anext(stream), 5), b': keep-alive\n\n')
+
+    async def test_only_mechanics_can_subscribe(self):
+        self.assertEqual((await self.async_client.get(self.url)).status_code, 401)
+        await self.async_client.aforce_login(await User.objects.acreate(username='someone'))
+        self.assertEqual((await self.async_client.get(self.url)).status_code, 403)
+
+    def test_wsgi_workers_answer_no_content(self):
+        self.client.force_login(self.mechanic_user)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(response.streaming)
+
+
+class RequestPollingTests(TestCase):
+    def setUp(self):
+        self.customer = User.objects.create(username='customer')
+        self.mechanic = MechanicProfile.objects.create(
+            user=User.objects.create(username='garage'), service_center_name='Garage',
+            phone='9876543210', location='Valanchery',
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.first = ServiceRequest.objects.create(
+                user=self.customer, mechanic=self.mechanic, vehicle_type='car',
+                service_type='fuel', location='NH 66, Kuttippuram',
+            )
+        self.client.force_login(self.customer)
+        self.url = reverse('user_requests_poll')
+
+    def test_unchanged_state_is_not_modified_without_reading_requests(self):
+        etag = self.client.get(self.url)['ETag']
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse([q for q in queries if 'services_servicerequest' in q['sql']])
+
+    def settle(self):
+        ServiceRequest.objects.update(updated_at=F('updated_at') - POLL_SETTLE)
+
+    def test_since_cursor_returns_only_changes(self):
+        self.settle()
+        first_poll = self.client.get(self.url).json()
+        self.assertEqual([r['id'] for r in first_poll['requests']], [self.first.id])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second = ServiceRequest.objects.create(
+                user=self.customer, vehicle_type='bike', service_type='tire', location='Tirur bus stand',
+            )
+        response = self.client.get(self.url, {'since': first_poll['cursor']})
+        self.assertEqual([r['id'] for r in response.json()['requests']], [second.id])
+        self.assertNotEqual(response['ETag'], self.client.get(self.url)['ETag'])
+
+    def test_cursor_waits_for_late_commits(self):
+        # first was saved just now: its transaction could still be committing
+        # rows stamped earlier, so the cursor does not move past it yet
+        first_poll = self.client.get(self.url).json()
+        self.assertEqual(first_poll['cursor'], '')
+        late = ServiceRequest.objects.create(
+            user=self.customer, vehicle_type='bike', service_type='tire', location='Tirur bus stand',
+        )
+        ServiceRequest.objects.filter(pk=late.pk).update(updated_at=self.first.updated_at - timedelta(seconds=1))
+        response = self.client.get(self.url, {'since': first_poll['cursor']}).json()
+        self.assertEqual([r['id'] for r in response['requests']], [late.id, self.first.id])
+
+        self.settle()
+        cursor = self.client.get(self.url).json()['cursor']
+        self.assertEqual(self.client.get(self.url, {'since': cursor}).json()['requests'], [])
+
+    def test_mechanic_endpoint_sees_assignment_changes(self):
+        self.client.force_login(self.mechanic.user)
+        url = reverse('mechanic_requests_poll')
+        etag = self.client.get(url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.first.status = 'Accepted'
+            self.first.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['counts']['accepted'], 1)
+
+
+class DispatchTests(TestCase):
+    def setUp(self):
+        self.customer = User.objects.create(username='customer')
+
+    def add_mechanic(self, name, lat, lon, **extra):
+        return MechanicProfile.objects.create(
+            user=User.objects.create(username=name), service_center_name=name,
+            phone=f'98765{MechanicProfile.objects.count():05d}', location=name, latitude=lat, longitude=lon, **extra,
+        )
+
+    def add_request(self, lat, lon, **extra):
+        return ServiceRequest.objects.create(
+            user=self.customer, vehicle_type='car', service_type='fuel',
+            location='NH 66', latitude=lat, longitude=lon, **extra,
+        )
+
+    def test_requests_go_to_the_cheapest_overall_match(self):
+        near_a = self.add_mechanic('valanchery', 10.8846, 76.0381)
+        near_b = self.add_mechanic('tirur', 10.9147, 75.9214)
+        self.add_mechanic('kochi', 9.9312, 76.2673)
+        first = self.add_request(10.8850, 76.0400)
+        second = self.add_request(10.9100, 75.9250)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            assigned = dispatch_pending()
+
+        self.assertEqual({sr.pk: sr.mechanic_id for sr in assigned},
+                         {first.pk: near_a.pk, second.pk: near_b.pk})
+        first.refresh_from_db()
+        self.assertEqual((first.status, first.mechanic_id), ('Pending', near_a.pk))
+
+    def test_busy_and_distant_mechanics_are_skipped(self):
+        busy = self.add_mechanic('busy', 10.8846, 76.0381)
+        for _ in range(MAX_WORKLOAD):
+            self.add_request(10.88, 76.03, mechanic=busy, status='Accepted')
+        self.add_mechanic('kochi', 9.9312, 76.2673)
+        waiting = self.add_request(10.8850, 76.0400)
+
+        self.assertEqual(dispatch_pending(), [])
+        waiting.refresh_from_db()
+        self.assertIsNone(waiting.mechanic_id)
+
+    def test_requests_changed_mid_tick_are_left_alone(self):
+        mechanic = self.add_mechanic('valanchery', 10.8846, 76.0381)
+        cancelled = self.add_request(10.8850, 76.0400)
+        still_pending = self.add_request(10.8860, 76.0410)
+        ServiceRequest.objects.filter(pk=cancelled.pk).update(status='Cancelled')
+
+        assigned = _write_assignments({cancelled.pk: mechanic.pk, still_pending.pk: mechanic.pk})
+        self.assertEqual(assigned, {still_pending.pk})
+        cancelled.refresh_from_db()
+        self.assertIsNone(cancelled.mechanic_id)
+
+    def test_version_bumps_are_batched_per_tick(self):
+        mechanics = [self.add_mechanic(f'm{i}', 10.88 + i / 100, 76.03) for i in range(6)]
+        for mechanic in mechanics:
+            self.add_request(float(mechanic.latitude), 76.04)
+        before = [mechanic_requests_version(m.pk) for m in mechanics[:3]]
+        before_user = user_requests_version(self.customer.pk)
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.assertEqual(len(dispatch_pending()), 6)
+        # However many requests were dispatched: the savepoint pair, one UPDATE,
+        # then a lookup, an INSERT and an UPDATE for the three new counters
+        with self.assertNumQueries(6):
+            for callback in callbacks:
+                callback()
+
+        self.assertEqual([mechanic_requests_version(m.pk) for m in mechanics[:3]], [v + 1 for v in before])
+        self.assertEqual(user_requests_version(self.customer.pk), before_user + 1)
+
+
+class BroadcastAcceptTests(TestCase):
+    def setUp(self):
+        mechanic_index.invalidate()
+        self.addCleanup(mechanic_index.invalidate)
+        self.customer = User.objects.create(username='customer')
+        self.near, self.nearer, self.far = (
+            MechanicProfile.objects.create(
+                user=User.objects.create(username=name), service_center_name=name,
+                phone=phone, location=name, latitude=lat, longitude=lon,
+            )
+            for name, phone, lat, lon in [
+                ('tirur', '9876543210', 10.9147, 75.9214),
+                ('valanchery', '9876543211', 10.8846, 76.0381),
+                ('kochi', '9876543212', 9.9312, 76.2673),
+            ]
+        )
+        self.request = ServiceRequest.objects.create(
+            user=self.customer, vehicle_type='car', service_type='fuel',
+            location='NH 66, Kuttippuram', latitude=10.8850, longitude=76.0400,
+        )
+
+    def accept_as(self, mechanic):
+        self.client.force_login(mechanic.user)
+        response = self.client.post(reverse('accept_request', args=[self.request.id]), follow=True)
+        return [str(m) for m in response.context['messages']]
+
+    def test_broadcast_reaches_the_nearest_mechanics(self):
+        offered = broadcast_request(self.request, count=2)
+        self.assertEqual(offered, [self.nearer.pk, self.near.pk])
+        dashboard = mechanic_dashboard_context(self.near)
+        self.assertEqual([r.id for r in dashboard['pending_requests']], [self.request.id])
+        self.assertEqual(dashboard['counts']['pending'], 1)
+
+    def test_first_accept_wins_and_the_rest_are_told_it_is_taken(self):
+        broadcast_request(self.request, count=2)
+        self.assertEqual(self.accept_as(self.near), ["Service request accepted successfully!"])
+        self.assertEqual(self.accept_as(self.nearer), [ALREADY_TAKEN])
+        self.assertEqual(self.accept_as(self.far), ["You are not authorized to accept this request."])
+
+        self.request.refresh_from_db()
+        self.assertEqual((self.request.status, self.request.mechanic_id), ('Accepted', self.near.pk))
+        self.assertEqual(mechanic_dashboard_context(self.nearer)['counts']['pending'], 0)
+
+    def update_status_as(self, mechanic, status):
+        self.client.force_login(mechanic.user)
+        return self.client.post(reverse('update_request_status', args=[self.request.id]),
+                                json.dumps({'status': status}), content_type='application/json')
+
+    def test_status_api_reports_why_a_transition_failed(self):
+        broadcast_request(self.request, count=2)
+        self.assertEqual(self.update_status_as(self.near, 'Accepted').json(), {'success': True})
+
+        taken = self.update_status_as(self.nearer, 'Accepted')
+        self.assertEqual((taken.status_code, taken.json()['error']), (409, ALREADY_TAKEN))
+
+        self.assertEqual(self.update_status_as(self.near, 'Completed').json(), {'success': True})
+        again = self.update_status_as(self.near, 'Completed')
+        self.assertEqual((again.status_code, again.json()['error']),
+                         (409, STATUS_CONFLICT.format(status='accepted')))
+
+    def test_cancel_loses_to_an_earlier_accept(self):
+        ServiceRequest.objects.filter(pk=self.request.pk).update(mechanic=self.near)
+        stale = ServiceRequest.objects.get(pk=self.request.pk)
+        self.assertIsNotNone(claim_request(self.request.id, self.near))
+
+        self.assertIsNone(cancel_request(stale.id, self.customer))
+        self.request.refresh_from_db()
+        self.assertEqual(self.request.status, 'Accepted')
+
+
+class LiveLocationTests(TestCase):
+    def setUp(self):
+        mechanic_index.invalidate()
+        self.addCleanup(mechanic_index.invalidate)
+        patcher = mock.patch.object(location_buffer, 'interval', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(location_buffer.flush)
+        self.mechanic = MechanicProfile.objects.create(
+            user=User.objects.create(username='tow-truck'), service_center_name='Tow Truck',
+            phone='9876543210', location='Kochi', latitude=9.9312, longitude=76.2673,
+        )
+        self.client.force_login(self.mechanic.user)
+        self.url = reverse('mechanic_location_ping')
+
+    def test_pings_are_buffered_and_flushed_in_one_batch(self):
+        with self.assertNumQueries(0):
+            location_buffer.add(self.mechanic.pk, 10.80, 76.00)
+            location_buffer.add(self.mechanic.pk, 10.8846, 76.0381)
+        self.assertEqual(location_buffer.pending(), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(location_buffer.flush(), 1)
+        self.mechanic.refresh_from_db()
+        self.assertEqual((float(self.mechanic.latitude), float(self.mechanic.longitude)), (10.8846, 76.0381))
+        self.assertEqual((self.mechanic.grid_row, self.mechanic.grid_col), grid_cell(10.8846, 76.0381))
+        self.assertIsNotNone(self.mechanic.location_updated_at)
+
+    def test_search_sees_live_position_before_flush(self):
+        self.assertEqual(mechanic_index.nearest(10.8846, 76.0381, radius_km=5), [])
+        response = self.client.post(self.url, {'latitude': '10.8846', 'longitude': '76.0381'})
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual([pk for pk, _ in mechanic_index.nearest(10.8846, 76.0381, radius_km=5)],
+                         [self.mechanic.pk])
+
+    def test_an_older_ping_never_overwrites_a_newer_one(self):
+        other_process = LocationBuffer(interval=None)
+        other_process.add(self.mechanic.pk, 10.80, 76.00)
+        location_buffer.add(self.mechanic.pk, 10.8846, 76.0381)
+        # The newer ping is flushed first; the older one arrives last
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(location_buffer.flush(), 1)
+            self.assertEqual(other_process.flush(), 0)
+        self.mechanic.refresh_from_db()
+        self.assertEqual((float(self.mechanic.latitude), float(self.mechanic.longitude)), (10.8846, 76.0381))
+
+    def test_other_processes_read_only_the_moved_rows(self):
+        mechanic_index.nearest(9.9312, 76.2673, k=1)
+        other_process = MechanicIndex()
+        other_process.nearest(9.9312, 76.2673, k=1)
+        version = other_process._version
+
+        location_buffer.add(self.mechanic.pk, 10.8846, 76.0381)
+        with self.captureOnCommitCallbacks(execute=True):
+            location_buffer.flush()
+        with self.assertNumQueries(2):  # the counters, then the moved rows
+            self.assertEqual([pk for pk, _ in other_process.nearest(10.8846, 76.0381, radius_km=5)],
+                             [self.mechanic.pk])
+        self.assertEqual(other_process._version, version)
+        # The flushing process already had the position and reads nothing
+        with self.assertNumQueries(1):
+            self.assertEqual([pk for pk, _ in mechanic_index.nearest(10.8846, 76.0381, radius_km=5)],
+                             [self.mechanic.pk])
+
+    def test_a_stale_row_does_not_undo_a_newer_local_ping(self):
+        mechanic_index.nearest(9.9312, 76.2673, k=1)
+        earlier = timezone.now() - timedelta(seconds=3)
+        MechanicProfile.objects.filter(pk=self.mechanic.pk).update(
+            latitude=10.80, longitude=76.00, location_updated_at=earlier,
+        )
+        location_buffer.add(self.mechanic.pk, 10.8846, 76.0381)
+        bump_version(MOVED_KEY)  # another process flushed the older ping
+        self.assertEqual([pk for pk, _ in mechanic_index.nearest(10.8846, 76.0381, radius_km=1)],
+                         [self.mechanic.pk])
+
+    def test_invalid_pings_are_rejected(self):
+        response = self.client.post(self.url, '{"latitude": 95, "longitude": 76}',
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.client.force_login(User.objects.create(username='customer'))
+        self.assertEqual(self.client.post(self.url, {'latitude': 10, 'longitude': 76}).status_code, 403)
+
+
+class GridCellTests(SimpleTestCase):
+    def test_points_on_an_edge_belong_to_the_cell_above(self):
+        self.assertEqual(grid_cell(0, 0), (0, 0))
+        self.assertEqual(grid_cell(0.05, 0.05), (1, 1))
+        self.assertEqual(grid_cell(0.0499, 0.0499), (0, 0))
+        self.assertEqual(grid_cell(10.0, 76.0), (200, 1520))
+        self.assertEqual(grid_cell(9.9999, 75.9999), (199, 1519))
+
+    def test_negative_coordinates_round_down(self):
+        # floor, not truncation: cell 0 must not cover both sides of the equator
+        self.assertEqual(grid_cell(-0.01, -0.01), (-1, -1))
+        self.assertEqual(grid_cell(-0.05, -0.05), (-1, -1))
+        self.assertEqual(grid_cell(-0.0501, -0.0501), (-2, -2))
+        self.assertEqual(grid_cell(-10.0, -76.0), (-200, -1520))
+
+    def test_missing_or_textual_coordinates(self):
+        self.assertEqual(grid_cell(None, 76.0), (None, None))
+        self.assertEqual(grid_cell(10.0, None), (None, None))
+        self.assertEqual(grid_cell('10.0', '76.0'), (200, 1520))
+
+    def test_bounds_of_a_point_inside_one_cell(self):
+        row, col = grid_cell(10.025, 76.025)
+        self.assertEqual(grid_cell_bounds(10.025, 76.025, 1), (row, row, col, col))
+
+    def test_bounds_straddle_the_cell_edges_a_radius_crosses(self):
+        # Just inside the corner of cell (200, 1520): 1 km reaches three neighbours
+        self.assertEqual(grid_cell_bounds(10.0001, 76.0001, 1), (199, 200, 1519, 1520))
+        self.assertEqual(grid_cell_bounds(-0.0001, -0.0001, 1), (-1, 0, -1, 0))
+
+    def test_bounds_cover_every_point_within_the_radius(self):
+        rng = random.Random(0)
+        for lat, lon, radius_km in [(10.8846, 76.0381, 5), (-33.87, 151.21, 12), (64.1, -21.9, 30)]:
+            min_row, max_row, min_col, max_col = grid_cell_bounds(lat, lon, radius_km)
+            for _ in range(500):
+                point = lat + rng.uniform(-0.5, 0.5), lon + rng.uniform(-0.8, 0.8)
+                if haversine_km(lat, lon, *point) <= radius_km:
+                    row, col = grid_cell(*point)
+                    self.assertTrue(min_row <= row <= max_row and min_col <= col <= max_col, point)
+
+
+class DistanceTests(SimpleTestCase):
+    POINTS = [(10.8846, 76.0381), (9.9312, 76.2673), (8.5241, 76.9366), (-33.87, 151.21),
+              (64.1, -21.9), (10.8846, 76.0381 + 180), (-10.8846, 76.0381 - 180)]
+
+    def test_vectorized_distances_match_haversine(self):
+        lats, lons = zip(*self.POINTS)
+        for lat, lon in self.POINTS:
+            expected = [haversine_km(lat, lon, *point) for point in self.POINTS]
+            for got, want in zip(distances_km(lat, lon, lats, lons), expected):
+                self.assertAlmostEqual(got, want, places=6)
+
+    def test_pairwise_distances_match_haversine(self):
+        lats, lons = zip(*self.POINTS)
+        matrix = pairwise_distances_km(lats, lons, lats[:3], lons[:3])
+        self.assertEqual(matrix.shape, (len(self.POINTS), 3))
+        for i, a in enumerate(self.POINTS):
+            for j, b in enumerate(self.POINTS[:3]):
+                self.assertAlmostEqual(matrix[i, j], haversine_km(*a, *b), places=6)
+
+    def test_missing_coordinates(self):
+        self.assertIsNone(haversine_km(None, 76.0, 10.0, 76.0))
+        distances = distances_km(10.0, 76.0, [10.0, None], [76.0, 76.5])
+        self.assertEqual(distances[0], 0)
+        self.assertTrue(math.isnan(distances[1]))
+
+    def test_nearest_applies_radius_and_top_k(self):
+        lats, lons = zip(*self.POINTS)
+        origin = self.POINTS[0]
+        ranked = sorted(range(len(self.POINTS)), key=lambda i: haversine_km(*origin, *self.POINTS[i]))
+
+        idx, dist = nearest_km(*origin, lats, lons)
+        self.assertEqual(list(idx), ranked)
+        self.assertTrue((dist[:-1] <= dist[1:]).all())
+
+        idx, dist = nearest_km(*origin, lats, lons, radius_km=300)
+        self.assertEqual(list(idx), [0, 1, 2])
+        self.assertTrue((dist <= 300).all())
+
+        idx, _ = nearest_km(*origin, lats, lons, k=2)
+        self.assertEqual(list(idx), ranked[:2])
+        idx, _ = nearest_km(*origin, lats, lons, radius_km=300, k=10)
+        self.assertEqual(list(idx), [0, 1, 2])
+
+    def test_nearest_skips_missing_coordinates(self):
+        idx, dist = nearest_km(10.0, 76.0, [None, 10.1, 10.0], [76.0, 76.0, None])
+        self.assertEqual(list(idx), [1])
+        self.assertEqual(len(dist), 1)
+
+
+class NearbyMechanicsTests(TestCase):
+    def setUp(self):
+        self.customer = User.objects.create(username='customer')
+        self.client.force_login(self.customer)
+        self.service_request = ServiceRequest.objects.create(
+            user=self.customer, vehicle_type='car', service_type='fuel', location='Valanchery',
+        )
+        for i in range(3):
+            MechanicProfile.objects.create(
+                user=User.objects.create(username=f'mech{i}'), service_center_name=f'Garage {i}',
+                phone=f'98765432{i:02d}', location='Valanchery', latitude=10.8846 + i / 100, longitude=76.0381,
+            )
+        self.url = reverse('nearby_mechanics', args=[self.service_request.pk])
+
+    def names(self, response):
+        return [data['mechanic'].service_center_name for data in response.context['nearby_mechanics']]
+
+    @override_settings(NEARBY_MECHANICS_LIMIT=2)
+    def test_results_are_capped_and_the_page_says_so(self):
+        response = self.client.get(self.url)
+        self.assertEqual(self.names(response), ['Garage 0', 'Garage 1'])
+        self.assertContains(response, 'Showing the nearest 2')
+
+    @override_settings(NEARBY_MECHANICS_LIMIT=2)
+    def test_mechanics_filtered_out_after_the_lookup_are_replaced(self):
+        self.client.get(self.url)
+        # update() skips the signals, so the index and cache still list Garage 0
+        MechanicProfile.objects.filter(service_center_name='Garage 0').update(is_available=False)
+        self.assertEqual(self.names(self.client.get(self.url)), ['Garage 1', 'Garage 2'])
+
+    @override_settings(NEARBY_MECHANICS_LIMIT=None)
+    def test_no_limit_lists_everyone_in_range(self):
+        response = self.client.get(self.url)
+        self.assertEqual(self.names(response), ['Garage 0', 'Garage 1', 'Garage 2'])
+        self.assertContains(response, '3 mechanics found')
+
+    def test_repeat_visits_do_not_write(self):
+        self.client.get(self.url)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(self.url)
+        writes = [q['sql'] for q in queries.captured_queries
+                  if q['sql'].startswith(('INSERT', 'UPDATE', 'DELETE'))]
+        self.assertEqual(writes, [])
+
+
+class SearchMechanicsTests(TestCase):
+    def setUp(self):
+        self.mechanic = MechanicProfile.objects.create(
+            user=User.objects.create(username='garage'), service_center_name='Garage',
+            phone='9876543210', location='Valanchery', latitude=10.8846, longitude=76.0381,
+        )
+        self.client.force_login(User.objects.create(username='customer'))
+        self.url = reverse('search_mechanics')
+
+    def search(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200, params)
+        return response.context
+
+    def test_finds_mechanics_in_range(self):
+        context = self.search(lat=10.88, lon=76.03, radius=5)
+        self.assertEqual([m['mechanic'].pk for m in context['mechanics']], [self.mechanic.pk])
+
+    def test_unusable_coordinates_give_no_results(self):
+        for lat, lon in [('nan', '76.03'), ('10.88', 'nan'), ('inf', '76.03'), ('-inf', '76.03'),
+                         ('91', '76.03'), ('10.88', '180.5'), ('abc', '76.03')]:
+            self.assertEqual(self.search(lat=lat, lon=lon)['mechanics'], [], (lat, lon))
+
+    def test_unusable_radius_falls_back_to_the_default(self):
+        for radius in ('nan', 'inf', '0', '-5', 'abc'):
+            context = self.search(lat=10.88, lon=76.03, radius=radius)
+            self.assertEqual(context['radius'], DEFAULT_SEARCH_RADIUS_KM, radius)
+            self.assertEqual(len(context['mechanics']), 1, radius)
+        self.assertEqual(self.search(lat=10.88, lon=76.03, radius=1e9)['radius'], MAX_SEARCH_RADIUS_KM)
+
+    def test_min_rating_is_parsed_and_clamped(self):
+        for value, expected in [('abc', 0), ('nan', 0), ('', 0), ('-3', 0), ('9', 5), ('3.5', 3.5)]:
+            self.assertEqual(self.search(lat=10.88, lon=76.03, min_rating=value)['min_rating'], expected, value)
+        MechanicProfile.objects.filter(pk=self.mechanic.pk).update(rating_avg=4.2)
+        self.assertEqual(len(self.search(lat=10.88, lon=76.03, min_rating='4')['mechanics']), 1)
+        self.assertEqual(self.search(lat=10.88, lon=76.03, min_rating='4.5')['mechanics'], [])
+
+
+class MechanicIndexTests(TestCase):
+    def setUp(self):
+        self.mechanic = MechanicProfile.objects.create(
+            user=User.objects.create(username='garage'), service_center_name='Garage',
+            phone='9876543210', location='Valanchery', latitude=10.8846, longitude=76.0381,
+        )
+
+    def ids(self, index, **query):
+        return [pk for pk, _ in index.nearest(10.8846, 76.0381, **query)]
+
+    def test_publish_in_one_process_rebuilds_the_others(self):
+        # Two indexes stand in for two worker processes sharing the database
+        first, second = MechanicIndex(), MechanicIndex()
+        self.assertEqual(self.ids(first, k=1), [self.mechanic.pk])
+        self.assertEqual(self.ids(second, k=1), [self.mechanic.pk])
+
+        MechanicProfile.objects.filter(pk=self.mechanic.pk).update(is_available=False)
+        self.mechanic.refresh_from_db()
+        first.update(self.mechanic)
+        first.publish()
+        self.assertEqual(self.ids(first, k=1), [])
+        self.assertEqual(self.ids(second, k=1), [])
+
+    def test_moves_are_applied_without_a_rebuild(self):
+        index = MechanicIndex()
+        self.ids(index, k=1)
+        index.move(self.mechanic.pk, 9.9312, 76.2673)
+        index.move(self.mechanic.pk, 9.9320, 76.2680)
+        index.move(999999, 9.9312, 76.2673)  # not indexed: ignored
+        # Later positions replace earlier ones in the side table
+        self.assertEqual(index._pending, {self.mechanic.pk: (9.9320, 76.2680)})
+        with self.assertNumQueries(1):  # the version check only
+            self.assertEqual([pk for pk, _ in index.nearest(9.9320, 76.2680, k=5)], [self.mechanic.pk])
+        self.assertEqual(self.ids(index, radius_km=5), [])
+
+    def test_side_table_is_folded_into_a_new_tree(self):
+        others = MechanicProfile.objects.bulk_create([
+            MechanicProfile(user=User.objects.create(username=f'm{i}'), service_center_name=f'M{i}',
+                            phone=f'98765000{i:02d}', location='Tirur', latitude=10.9 + i / 100, longitude=75.9)
+            for i in range(3)
+        ])
+        index = MechanicIndex()
+        self.ids(index, k=1)
+        with mock.patch('services.spatial.REBUILD_THRESHOLD', 2):
+            for mechanic in others:
+                index.move(mechanic.pk, 11.5, 75.5 + mechanic.pk / 1000)
+            with self.assertNumQueries(1):
+                nearest = [pk for pk, _ in index.nearest(11.5, 75.5, k=3)]
+        self.assertEqual(index._pending, {})
+        self.assertEqual(index._masked, set())
+        self.assertEqual(sorted(nearest), sorted(m.pk for m in others))
+
+    def test_publish_keeps_the_local_tree_unless_someone_else_changed_it(self):
+        index = MechanicIndex()
+        self.ids(index, k=1)
+        index.publish()
+        with self.assertNumQueries(1):
+            self.ids(index, k=1)
+
+        bump_version(VERSION_KEY)  # another process
+        index.publish()
+        with self.assertNumQueries(2):  # version check and reload
+            self.ids(index, k=1)
+
+    def test_invalidate_reloads_and_expires_dependent_caches(self):
+        index = MechanicIndex()
+        self.ids(index, k=1)
+        MechanicProfile.objects.filter(pk=self.mechanic.pk).update(latitude=9.9312, longitude=76.2673)
+        before = get_version(INVALIDATED_KEY)
+        index.invalidate()
+        self.assertEqual(self.ids(index, radius_km=5), [])
+        self.assertNotEqual(get_version(INVALIDATED_KEY), before)
+
+    def test_bump_versions_creates_and_increments(self):
+        before = get_version('existing')
+        bump_versions(['existing', 'existing', 'new'])
+        existing, new = get_versions(['existing', 'new'])
+        self.assertEqual(existing, before + 1)
+        self.assertGreater(new, before)
+
+    def test_counters_do_not_live_in_the_cache(self):
+        before = get_version('example')
+        bump_version('example')
+        cache.clear()
+        self.assertEqual(get_version('example'), before + 1)
+
+
+class QueryPlanTests(TestCase):
+    """
+    Every query the main views run must be answered from an index. A plan
+    step of the form "SCAN <table>" (a full table scan) fails the test.
+    """
+    # Plan steps that read derived tables rather than real ones
+    DERIVED = ('SCAN (', 'SCAN qualify', 'SCAN subquery')
+
+    @classmethod
+    def setUpTestData(cls):
+        users = User.objects.bulk_create([User(username=f'user{i}') for i in range(60)])
+        cls.customer = users[0]
+        MechanicProfile.objects.bulk_create([
+            MechanicProfile(user=user, service_center_name=f'Garage {i}', phone=f'98765{i:05d}',
+                            location='Kerala', latitude=10 + i / 100, longitude=76 + i / 100,
+                            approved=i % 5 != 0, is_available=i % 3 != 0)
+            for i, user in enumerate(users[10:])
+        ])
+        mechanics = list(MechanicProfile.objects.all())
+        cls.mechanic = mechanics[1]
+        statuses = [s for s, _ in ServiceRequest.STATUS_CHOICES]
+        ServiceRequest.objects.bulk_create([
+            ServiceRequest(user=users[i % 10], mechanic=mechanics[i % len(mechanics)] if i % 4 else None,
+                           status=statuses[i % len(statuses)], vehicle_type='car', service_type='fuel',
+                           location='NH 66', latitude=10.5, longitude=76.2)
+            for i in range(600)
+        ])
+        requests = list(ServiceRequest.objects.filter(mechanic__isnull=False)[:100])
+        Feedback.objects.bulk_create([
+            Feedback(user=r.user, mechanic=r.mechanic, service_request=r, rating=1 + r.id % 5)
+            for r in requests
+        ])
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def full_scans(self, queries):
+        scans = []
+        with connection.cursor() as cursor:
+            for query in queries:
+                sql = query['sql']
+                if not sql.startswith('SELECT'):
+                    continue
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql.replace('%', '%%'))
+                for row in cursor.fetchall():
+                    detail = row[-1]
+                    if (detail.startswith('SCAN ') and 'INDEX' not in detail
+                            and not detail.startswith(self.DERIVED)):
+                        scans.append((detail, sql))
+        return scans
+
+    def assertIndexed(self, url, user, **params):
+        self.client.force_login(user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        self.assertLess(response.status_code, 400)
+        self.assertEqual(self.full_scans(queries), [])
+
+    def test_mechanic_views(self):
+        for name in ('mechanic_dashboard', 'mechanic_requests_poll'):
+            with self.subTest(name):
+                self.assertIndexed(reverse(name), self.mechanic.user)
+
+    def test_customer_views(self):
+        for name in ('user_dashboard', 'service_history', 'user_requests_poll'):
+            with self.subTest(name):
+                self.assertIndexed(reverse(name), self.customer)
+
+    def test_search_and_detail_views(self):
+        mechanic_index.invalidate()
+        self.addCleanup(mechanic_index.invalidate)
+        self.assertIndexed(reverse('search_mechanics'), self.customer, lat=10.2, lon=76.2, radius=20)
+        self.assertIndexed(reverse('mechanic_detail', args=[self.mechanic.pk]), self.customer)
+
+    def test_dispatch_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            dispatch_pending()
+        self.assertEqual(self.full_scans(queries), [])
+
+    def test_view_query_budgets(self):
+        mechanic_index.invalidate()
+        self.addCleanup(mechanic_index.invalidate)
+        budgets = [
+            (self.customer, reverse('search_mechanics'), {'lat': 10.2, 'lon': 76.2, 'radius': 50}, 4),
+            (self.customer, reverse('service_history'), {}, 4),
+            (self.customer, reverse('user_dashboard'), {}, 4),
+            (self.customer, reverse('mechanic_detail', args=[self.mechanic.pk]), {}, 5),
+            (self.mechanic.user, reverse('mechanic_dashboard'), {}, 5),
+        ]
+        for user, url, params, max_queries in budgets:
+            with self.subTest(url):
+                self.client.force_login(user)
+                self.client.get(url, params)
+                with query_budget(self, max_queries):
+                    self.client.get(url, params)
+
+    def test_admin_searches(self):
+        admin_user = User.objects.create(username='ops', is_staff=True, is_superuser=True)
+        for url, term in (('admin:services_servicerequest_changelist', 'user3'),
+                          ('admin:services_servicerequest_changelist', self.mechanic.phone),
+                          ('admin:accounts_mechanicprofile_changelist', 'Garage 1')):
+            with self.subTest(term):
+                self.assertIndexed(reverse(url), admin_user, q=term)
+
+
+class SqliteTuningTests(SimpleTestCase):
+    def test_new_connections_are_tuned(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            wrapper = connections['default'].__class__(
+                {**connection.settings_dict, 'NAME': os.path.join(tmp, 'db.sqlite3')}, alias='tuning-check',
+            )
+            try:
+                with wrapper.cursor() as cursor:
+                    pragmas = {}
+                    for name in ('journal_mode', 'synchronous', 'busy_timeout', 'mmap_size'):
+                        cursor.execute(f'PRAGMA {name}')
+                        pragmas[name] = cursor.fetchone()[0]
+            finally:
+                wrapper.close()
+        # synchronous=NORMAL is 1; timeout is given in seconds
+        self.assertEqual(pragmas, {'journal_mode': 'wal', 'synchronous': 1,
+                                   'busy_timeout': 20000, 'mmap_size': 268435456})
+
+
+class ReplicaRouterTests(SimpleTestCase):
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.router = PrimaryReplicaRouter()
+        for target in ('roadmech.db_router.replica_configured', 'roadmech.middleware.replica_configured'):
+            patcher = mock.patch(target, return_value=True)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        @replica_reads
+        def view(request):
+            return HttpResponse(self.router.db_for_read(ServiceRequest) or 'default')
+        self.view = view
+
+    def test_reads_are_routed_by_method_and_stickiness(self):
+        self.assertEqual(self.view(self.factory.get('/')).content, b'replica')
+        self.assertEqual(self.view(self.factory.post('/')).content, b'default')
+        pinned = self.factory.get('/')
+        pinned.COOKIES[STICKY_COOKIE] = '1'
+        self.assertEqual(self.view(pinned).content, b'default')
+        self.assertIsNone(self.router.db_for_read(ServiceRequest))
+        self.assertEqual(self.router.db_for_write(ServiceRequest), 'default')
+
+    def test_writes_pin_the_client_to_the_primary(self):
+        middleware = PrimaryStickinessMiddleware(lambda request: HttpResponse())
+        self.assertIn(STICKY_COOKIE, middleware(self.factory.post('/')).cookies)
+        self.assertNotIn(STICKY_COOKIE, middleware(self.factory.get('/')).cookies)
+
+
+class ReplicaReadYourWritesTests(TransactionTestCase):
+    """Primary and replica as two separate SQLite databases."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # The replica alias only exists for this test case, so it is added
+        # after the runner has set up the configured databases.
+        replica_dir = tempfile.TemporaryDirectory()
+        connections.settings['replica'] = {
+            **connections['default'].settings_dict, 'NAME': os.path.join(replica_dir.name, 'replica.sqlite3'),
+        }
+        cls.databases = cls.databases | {'replica'}
+        cls.addClassCleanup(replica_dir.cleanup)
+        cls.addClassCleanup(cls.drop_replica)
+        call_command('migrate', database='replica', verbosity=0)
+
+    @classmethod
+    def drop_replica(cls):
+        connections['replica'].close()
+        del connections['replica']
+        del connections.settings['replica']
+
+    def setUp(self):
+        routers = self.settings(DATABASE_ROUTERS=['roadmech.db_router.PrimaryReplicaRouter'])
+        routers.enable()
+        self.addCleanup(routers.disable)
+
+    def test_mechanic_index_is_built_from_the_primary(self):
+        mechanic_index.invalidate()
+        self.addCleanup(mechanic_index.invalidate)
+        mechanic = MechanicProfile.objects.create(
+            user=User.objects.create(username='garage'), service_center_name='Garage',
+            phone='9876543210', location='Valanchery', latitude=10.8846, longitude=76.0381,
+        )
+
+        @replica_reads
+        def view(request):
+            return JsonResponse([pk for pk, _ in mechanic_index.nearest(10.8846, 76.0381, k=1)], safe=False)
+
+        # Not replicated yet, but the shared tree must still include it
+        self.assertEqual(json.loads(view(RequestFactory().get('/')).content), [mechanic.pk])
+
+    def test_dashboard_reads_replica_until_the_user_writes(self):
+        customer = User.objects.create(username='customer')
+        service_request = ServiceRequest.objects.create(
+            user=customer, vehicle_type='car', service_type='fuel', location='NH 66',
+        )
+        self.client.force_login(customer)
+
+        # Not replicated yet, so the replica-backed dashboard can't see it
+        self.assertEqual(list(self.client.get(reverse('user_dashboard')).context['requests']), [])
+
+        self.client.post(reverse('cancel_request', args=[service_request.id]))
+        response = self.client.get(reverse('user_dashboard'))
+        self.assertEqual([r.id for r in response.context['requests']], [service_request.id])
+        self.assertEqual(response.context['requests'][0].status, 'Cancelled')
+
+
+class ArchiveTests(TestCase):
+    def setUp(self):
+        self.customer = User.objects.create(username='customer')
+        self.mechanic = MechanicProfile.objects.create(
+            user=User.objects.create(username='garage'), service_center_name='Garage',
+            phone='9876543210', location='Valanchery',
+        )
+
+    def add_request(self, status, age_days):
+        sr = ServiceRequest.objects.create(user=self.customer, mechanic=self.mechanic, status=status,
+                                           vehicle_type='car', service_type='fuel', location='NH 66')
+        moment = timezone.now() - timedelta(days=age_days)
+        ServiceRequest.objects.filter(pk=sr.pk).update(created_at=moment, updated_at=moment)
+        return sr
+
+    def test_archive_has_every_request_column(self):
+        archived = {f.attname for f in ArchivedServiceRequest._meta.concrete_fields}
+        self.assertLessEqual(set(REQUEST_FIELDS), archived)
+        self.assertLessEqual({f.attname for f in Feedback._meta.concrete_fields},
+                             {f.attname for f in ArchivedFeedback._meta.concrete_fields})
+
+    def test_old_finished_requests_move_with_their_feedback(self):
+        old_done = self.add_request('Completed', 200)
+        old_cancelled = self.add_request('Cancelled', 200)
+        old_open = self.add_request('Pending', 200)
+        recent_done = self.add_request('Completed', 5)
+        Feedback.objects.create(user=self.customer, mechanic=self.mechanic, service_request=old_done, rating=4)
+
+        out = StringIO()
+        call_command('archive_requests', days=90, batch_size=1, stdout=out)
+        self.assertIn('Archived 2', out.getvalue())
+
+        self.assertEqual(set(ServiceRequest.objects.values_list('id', flat=True)), {old_open.id, recent_done.id})
+        self.assertEqual(set(ArchivedServiceRequest.objects.values_list('id', flat=True)),
+                         {old_done.id, old_cancelled.id})
+        self.assertFalse(Feedback.objects.exists())
+        self.assertEqual(ArchivedFeedback.objects.get().service_request_id, old_done.id)
+
+        # Archived feedback still counts, including after a full recompute
+        self.mechanic.refresh_from_db()
+        self.assertEqual((self.mechanic.rating_sum, self.mechanic.rating_count), (4, 1))
+        call_command('recompute_ratings', stdout=StringIO())
+        self.mechanic.refresh_from_db()
+        self.assertEqual((self.mechanic.rating_sum, self.mechanic.rating_count), (4, 1))
+
+    def test_archiving_removes_offers_and_leaves_feedback_receivers_alone(self):
+        old_done = self.add_request('Completed', 200)
+        RequestOffer.objects.create(service_request=old_done, mechanic=self.mechanic)
+        with self.captureOnCommitCallbacks(execute=True):
+            Feedback.objects.create(user=self.customer, mechanic=self.mechanic, service_request=old_done, rating=4)
+        version = mechanic_feedback_version(self.mechanic.pk)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            archive_finished_requests(days=90)
+        self.assertFalse(RequestOffer.objects.exists())
+        self.assertEqual(mechanic_feedback_version(self.mechanic.pk), version)
+
+        # Ordinary deletes outside the archiver still update the rating
+        live = Feedback.objects.create(user=self.customer, mechanic=self.mechanic, rating=2)
+        live.delete()
+        self.mechanic.refresh_from_db()
+        self.assertEqual((self.mechanic.rating_sum, self.mechanic.rating_count), (4, 1))
+
+    def test_history_pages_read_both_tables(self):
+        ids = [self.add_request('Completed', age).id for age in (300, 200, 100)]
+        ids += [self.add_request('Pending', age).id for age in (50, 1)]
+        archive_finished_requests(days=90)
+        self.client.force_login(self.customer)
+
+        with mock.patch('services.views.PAGE_SIZE', 3):
+            first = self.client.get(reverse('service_history')).context
+            second = self.client.get(reverse('service_history'), {'cursor': first['next_cursor']}).context
+
+        seen = [r.id for r in first['service_requests']] + [r.id for r in second['service_requests']]
+        self.assertEqual(seen, ids[::-1])
+        self.assertTrue(second['service_requests'][-1].is_archived)
+        self.assertIsNone(second['next_cursor'])
+
+
+class MergedKeysetPageTests(TestCase):
+    def setUp(self):
+        self.customer = User.objects.create(username='customer')
+        self.moment = timezone.now() - timedelta(days=200)
+
+    def add_request(self, status, created_at):
+        sr = ServiceRequest.objects.create(user=self.customer, status=status, vehicle_type='car',
+                                           service_type='fuel', location='NH 66')
+        ServiceRequest.objects.filter(pk=sr.pk).update(created_at=created_at, updated_at=created_at)
+        return sr.id
+
+    def walk(self, page_size, cursor=None):
+        """Every page from cursor on, as lists of (id, archived)."""
+        request = RequestFactory().get('/', {'cursor': cursor} if cursor else {})
+        request.user = self.customer
+        pages = []
+        with mock.patch('services.views.PAGE_SIZE', page_size):
+            while True:
+                rows, cursor = history_page(request)
+                pages.append([(row.id, isinstance(row, ArchivedServiceRequest)) for row in rows])
+                if cursor is None:
+                    return pages
+                request = RequestFactory().get('/', {'cursor': cursor})
+                request.user = self.customer
+
+    def test_ties_on_created_at_are_split_by_id_across_both_tables(self):
+        # One timestamp for everything; alternate requests end up archived
+        ids = [self.add_request('Completed' if i % 2 else 'Pending', self.moment) for i in range(7)]
+        archive_finished_requests(days=90)
+        archived = set(ArchivedServiceRequest.objects.values_list('id', flat=True))
+        self.assertEqual(archived, set(ids[1::2]))
+
+        for page_size in range(1, 9):
+            pages = self.walk(page_size)
+            seen = [pk for page in pages for pk, _ in page]
+            self.assertEqual(seen, ids[::-1], page_size)
+            self.assertTrue(all(len(page) == page_size for page in pages[:-1]))
+            self.assertEqual({pk for page in pages for pk, is_archived in page if is_archived}, archived)
+
+    def test_cursor_on_the_last_live_row_continues_in_the_archive(self):
+        old = [self.add_request('Completed', self.moment - timedelta(days=i)) for i in (3, 2, 1)]
+        live = [self.add_request('Pending', self.moment + timedelta(days=i)) for i in (1, 2)]
+        archive_finished_requests(days=90)
+
+        # The first page ends exactly on the oldest live row
+        self.assertEqual(self.walk(2), [
+            [(live[1], False), (live[0], False)],
+            [(old[2], True), (old[1], True)],
+            [(old[0], True)],
+        ])
+
+        # A page that straddles the boundary, then the rest of the archive
+        pages = self.walk(3)
+        self.assertEqual(pages[0], [(live[1], False), (live[0], False), (old[2], True)])
+        self.assertEqual(pages[1], [(old[1], True), (old[0], True)])
+
+    def test_rows_added_after_the_first_page_do_not_shift_later_pages(self):
+        ids = [self.add_request('Pending', self.moment + timedelta(minutes=i)) for i in range(4)]
+        rows, cursor = merged_keyset_page([ServiceRequest.objects.filter(user=self.customer)], page_size=2)
+        self.add_request('Pending', timezone.now())
+        rows, _ = merged_keyset_page([ServiceRequest.objects.filter(user=self.customer)], cursor, page_size=2)
+        self.assertEqual([row.id for row in rows], [ids[1], ids[0]])
+
+    def test_malformed_cursor_starts_from_the_newest_row(self):
+        ids = [self.add_request('Pending', self.moment + timedelta(minutes=i)) for i in range(2)]
+        rows, _ = merged_keyset_page([ServiceRequest.objects.all()], 'not-a-cursor')
+        self.assertEqual([row.id for row in rows], ids[::-1])
+
+
+class ImportMechanicsTests(TestCase):
+    def setUp(self):
+        geocode.memory_cache.clear()
+        self.fake = FakeGeocoder({'Kottakkal, Kerala': (10.999, 76.001)})
+        patcher = mock.patch.object(geocode, 'geocode', self.fake)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+
+    def write(self, name, text):
+        path = os.path.join(self.dir.name, name)
+        with open(path, 'w') as handle:
+            handle.write(text)
+        return path
+
+    def run_import(self, path, *args):
+        out, err = StringIO(), StringIO()
+        call_command('import_mechanics', path, '--workers=0', *args, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def test_csv_import_validates_against_existing_and_earlier_rows(self):
+        User.objects.create(username='taken', email='old@example.com')
+        MechanicProfile.objects.create(user=User.objects.create(username='old'), service_center_name='Old',
+                                       phone='9000000000', location='Tirur')
+        path = self.write('garages.csv', '\n'.join([
+            'username,email,password,service_center_name,phone,location,latitude,longitude',
+            'g1,g1@example.com,,Garage One,98765 43210,"Kottakkal, Kerala",,',
+            'g2,g2@example.com,,Garage Two,9876500002,"kottakkal kerala",,',
+            'g3,g3@example.com,,Garage Three,9876500003,Tirur,10.91,75.92',
+            'taken,new@example.com,,Dup User,9876500004,Tirur,,',
+            'g5,OLD@example.com,,Dup Email,9876500005,Tirur,,',
+            'g6,,,Dup Phone,9000000000,Tirur,,',
+            'g7,,,Dup In File,9876500002,Tirur,,',
+            'g8,,,Bad Phone,12345,Tirur,,',
+        ]))
+        out, err = self.run_import(path)
+
+        self.assertIn('Imported 3', out)
+        self.assertEqual(err.count('Row '), 5)
+        g1, g2, g3 = (MechanicProfile.objects.get(user__username=name) for name in ('g1', 'g2', 'g3'))
+        self.assertEqual(g1.phone, '9876543210')
+        self.assertEqual((float(g1.latitude), float(g2.longitude)), (10.999, 76.001))
+        self.assertEqual((g3.grid_row, g3.grid_col), grid_cell(g3.latitude, g3.longitude))
+        self.assertFalse(g1.user.has_usable_password())
+        # Both spellings of the same address went upstream once
+        self.assertEqual(len(self.fake.calls), 1)
+
+    def test_rerun_resumes_after_checkpoint(self):
+        rows = [json.dumps({'username': f'm{i}', 'service_center_name': f'M{i}', 'phone': f'98765000{i:02d}',
+                            'location': 'Nowhere Junction'}) for i in range(5)]
+        path = self.write('garages.jsonl', '\n'.join(rows[:3]))
+        self.run_import(path, '--chunk-size=2', '--no-geocode')
+        self.assertEqual(MechanicProfile.objects.count(), 3)
+
+        with open(path, 'a') as handle:
+            handle.write('\n' + '\n'.join(rows[3:]))
+        out, err = self.run_import(path, '--no-geocode')
+        self.assertIn('Resumed after row 3', out)
+        self.assertEqual(err, '')
+        self.assertEqual(MechanicProfile.objects.count(), 5)
+        # Unresolved addresses are left to the background geocoding queue
+        self.assertEqual(GeocodeJob.objects.filter(target='mechanic').count(), 5)
+        self.assertEqual(self.fake.calls, [])
+
+    def test_bad_coordinates_are_rejected_row_by_row(self):
+        path = self.write('garages.csv', '\n'.join([
+            'username,service_center_name,phone,location,latitude,longitude',
+            'ok,Good,9876500001,Tirur,10.91,75.92',
+            'north,Too Far North,9876500002,Tirur,91,75.92',
+            'east,Too Far East,9876500003,Tirur,10.91,-180.5',
+            'nan,Not A Number,9876500004,Tirur,nan,75.92',
+            'inf,Infinite,9876500005,Tirur,10.91,inf',
+            'word,Garbled,9876500006,Tirur,north,75.92',
+            'precise,Rounded,9876500007,Tirur,10.9123456789,75.92',
+        ]))
+        out, err = self.run_import(path, '--no-geocode')
+
+        self.assertIn('Imported 2', out)
+        self.assertEqual(err.count('Row '), 5)
+        self.assertIn('latitude out of range', err)
+        self.assertIn('longitude out of range', err)
+        self.assertEqual(MechanicProfile.objects.get(user__username='precise').latitude, Decimal('10.912346'))
+
+    def test_small_imports_do_not_start_worker_processes(self):
+        path = self.write('garages.jsonl', '\n'.join(
+            json.dumps({'username': f'm{i}', 'service_center_name': f'M{i}', 'phone': f'98765000{i:02d}',
+                        'location': 'Nowhere Junction'}) for i in range(3)))
+        with mock.patch('services.onboarding.ProcessPoolExecutor') as executor:
+            result = import_mechanics(path, chunk_size=5, geocode=False)
+        executor.assert_not_called()
+        self.assertEqual(result.created, 3)
+
+    def test_passwords_are_hashed_in_worker_processes(self):
+        with ProcessPoolExecutor(1) as pool:
+            passwords = hash_passwords(['S3cret!pass', ''], pool)
+        self.assertTrue(check_password('S3cret!pass', passwords[0]))
+        self.assertFalse(passwords[1].startswith('pbkdf2'))
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.customer = User.objects.create(username='customer')
+        self.mechanic = MechanicProfile.objects.create(
+            user=User.objects.create(username='garage'), service_center_name='Garage, Ltd',
+            phone='9876543210', location='Valanchery',
+        )
+        self.done = ServiceRequest.objects.create(user=self.customer, mechanic=self.mechanic, status='Completed',
+                                                  vehicle_type='car', service_type='fuel', location='NH 66')
+        Feedback.objects.create(user=self.customer, mechanic=self.mechanic, service_request=self.done,
+                                rating=5, comment='Quick, "friendly"')
+        ServiceRequest.objects.filter(pk=self.done.pk).update(updated_at=timezone.now() - timedelta(days=200))
+        archive_finished_requests(days=90)
+        self.open = ServiceRequest.objects.create(user=self.customer, status='Pending',
+                                                  vehicle_type='bike', service_type='tire', location='Tirur')
+        self.client.force_login(User.objects.create(username='ops', is_staff=True))
+
+    def stream(self, response):
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_csv_export_streams_live_and_archived_rows(self):
+        response = self.client.get(reverse('export_data', args=['requests']))
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        rows = list(csv.DictReader(StringIO(self.stream(response))))
+        self.assertEqual([(int(r['id']), r['archived']) for r in rows], [(self.open.id, '0'), (self.done.id, '1')])
+        self.assertEqual(rows[1]['mechanic__service_center_name'], 'Garage, Ltd')
+
+    def test_filters_apply_to_both_tables(self):
+        response = self.client.get(reverse('export_data', args=['requests']),
+                                   {'format': 'jsonl', 'status': 'Completed', 'mechanic': self.mechanic.pk})
+        records = [json.loads(line) for line in self.stream(response).splitlines()]
+        self.assertEqual([(r['id'], r['archived']) for r in records], [(self.done.id, True)])
+
+        tomorrow = (timezone.localdate() + timedelta(days=1)).isoformat()
+        response = self.client.get(reverse('export_data', args=['feedback']), {'since': tomorrow})
+        self.assertEqual(self.stream(response).splitlines()[1:], [])
+
+        self.assertEqual(self.client.get(reverse('export_data', args=['requests']), {'status': 'Lost'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('export_data', args=['users'])).status_code, 404)
+
+    def test_exports_are_staff_only(self):
+        self.client.force_login(self.customer)
+        self.assertEqual(self.client.get(reverse('export_data', args=['requests'])).status_code, 302)
+
+    def test_command_writes_feedback_file(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        path = os.path.join(tmp.name, 'feedback.jsonl')
+        call_command('export_data', 'feedback', '--format=jsonl', '-o', path, stderr=StringIO())
+        with open(path) as handle:
+            records = [json.loads(line) for line in handle]
+        self.assertEqual([(r['comment'], r['archived']) for r in records], [('Quick, "friendly"', True)])
+
+
+class AdminTests(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create(username='ops', is_staff=True, is_superuser=True))
+        self.mechanic = MechanicProfile.objects.create(
+            user=User.objects.create(username='garage'), service_center_name='Garage',
+            phone='9876543210', location='Valanchery', latitude=10.88, longitude=76.03,
+        )
+
+    def add_requests(self, count, status='Accepted'):
+        customers = User.objects.bulk_create([User(username=f'c{User.objects.count()}-{i}') for i in range(count)])
+        ServiceRequest.objects.bulk_create([
+            ServiceRequest(user=user, mechanic=self.mechanic, status=status, vehicle_type='car',
+                           service_type='fuel', location='NH 66')
+            for user in customers
+        ])
+
+    def changelist_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(reverse('admin:services_servicerequest_changelist')).status_code, 200)
+        return len(queries)
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        self.add_requests(3)
+        self.changelist_queries()
+        few = self.changelist_queries()
+        self.add_requests(30)
+        self.assertEqual(self.changelist_queries(), few)
+
+    def test_unfiltered_count_comes_from_table_statistics(self):
+        self.add_requests(5)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        ServiceRequest.objects.all().delete()
+        # Statistics still say 5 rows; filtered counts are exact up to the cap
+        self.assertEqual(estimated_count(ServiceRequest.objects.all(), cap=2), 5)
+        self.assertEqual(estimated_count(ServiceRequest.objects.filter(status='Accepted'), cap=2), 0)
+        self.add_requests(3, status='Pending')
+        self.assertEqual(estimated_count(ServiceRequest.objects.filter(status='Pending'), cap=2), 2)
+
+    def test_bulk_request_actions(self):
+        self.add_requests(2)
+        self.add_requests(1, status='Completed')
+        ids = list(ServiceRequest.objects.values_list('pk', flat=True))
+        url = reverse('admin:services_servicerequest_changelist')
+        before = mechanic_requests_version(self.mechanic.pk)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(url, {'action': 'release_selected', '_selected_action': ids})
+        self.assertEqual(ServiceRequest.objects.filter(status='Pending', mechanic__isnull=True).count(), 2)
+        self.assertNotEqual(mechanic_requests_version(self.mechanic.pk), before)
+
+        self.client.post(url, {'action': 'cancel_selected', '_selected_action': ids})
+        self.assertEqual(dict(ServiceRequest.objects.values_list('status').annotate(n=Count('id'))),
+                         {'Cancelled': 2, 'Completed': 1})
+
+    def test_bulk_mechanic_actions_refresh_search_index(self):
+        mechanic_index.invalidate()
+        self.addCleanup(mechanic_index.invalidate)
+        self.assertEqual([pk for pk, _ in mechanic_index.nearest(10.88, 76.03, k=1)], [self.mechanic.pk])
+        url = reverse('admin:accounts_mechanicprofile_changelist')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(url, {'action': 'suspend_selected', '_selected_action': [self.mechanic.pk]})
+        self.assertFalse(MechanicProfile.objects.get().approved)
+        self.assertEqual(mechanic_index.nearest(10.88, 76.03, k=1), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(url, {'action': 'approve_selected', '_selected_action': [self.mechanic.pk]})
+        self.assertEqual(len(mechanic_index.nearest(10.88, 76.03, k=1)), 1)
+
+
+class NearbyCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        rng = random.Random(7)
+        users = User.objects.bulk_create([User(username=f'm{i}') for i in range(300)])
+        MechanicProfile.objects.bulk_create([
+            MechanicProfile(user=user, service_center_name=f'Garage {i}', phone=f'98765{i:05d}', location='Kerala',
+                            latitude=round(10.8 + rng.uniform(-0.3, 0.3), 6),
+                            longitude=round(76.0 + rng.uniform(-0.3, 0.3), 6))
+            for i, user in enumerate(users)
+        ])
+        mechanic_index.invalidate()
+        self.addCleanup(mechanic_index.invalidate)
+        self.points = [(10.8 + rng.uniform(-0.2, 0.2), 76.0 + rng.uniform(-0.2, 0.2)) for _ in range(40)]
+
+    def assertMatchesIndex(self, lat, lon, radius_km, limit):
+        expected = mechanic_index.nearest(lat, lon, radius_km=radius_km, k=limit)
+        got = nearest_cached(lat, lon, radius_km, limit)
+        self.assertEqual([pk for pk, _ in got], [pk for pk, _ in expected])
+        for (_, a), (_, b) in zip(got, expected):
+            self.assertAlmostEqual(a, b, places=9)
+
+    def test_results_match_uncached_index(self):
+        for lat, lon in self.points:
+            for radius_km, limit in ((5, None), (20, 10), (50, 1)):
+                self.assertMatchesIndex(lat, lon, radius_km, limit)
+                # Same cell, a few hundred metres away: served from the cache
+                self.assertMatchesIndex(lat + 0.003, lon - 0.003, radius_km, limit)
+
+    def test_nearby_searches_share_a_cell_entry(self):
+        with mock.patch.object(mechanic_index, 'nearest_points', wraps=mechanic_index.nearest_points) as build:
+            nearest_cached(10.8121, 76.0021, 10, 5)
+            nearest_cached(10.8179, 76.0079, 10, 5)
+            self.assertEqual(build.call_count, 1)
+            nearest_cached(10.8201, 76.0079, 10, 5)
+            self.assertEqual(build.call_count, 2)
+
+    def test_mechanic_changes_expire_cached_results(self):
+        nearest_pk, _ = nearest_cached(10.8, 76.0, 50, 1)[0]
+        mechanic = MechanicProfile.objects.get(pk=nearest_pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            mechanic.is_available = False
+            mechanic.save()
+        self.assertNotEqual(nearest_cached(10.8, 76.0, 50, 1)[0][0], nearest_pk)
+
+        # A live ping moves another mechanic right onto the search point
+        far = MechanicProfile.objects.order_by('-latitude').first()
+        with mock.patch.object(location_buffer, 'interval', None), self.captureOnCommitCallbacks(execute=True):
+            location_buffer.add(far.pk, 10.8, 76.0)
+            location_buffer.flush()
+        self.assertEqual(nearest_cached(10.8001, 76.0001, 50, 1)[0][0], far.pk)
+
+    def test_file_based_cache(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        backend = {'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                               'LOCATION': tmp.name}}
+        with override_settings(CACHES=backend):
+            for lat, lon in self.points[:5]:
+                self.assertMatchesIndex(lat, lon, 20, 10)
+                self.assertMatchesIndex(lat, lon, 20, 10)
+            self.assertTrue(os.listdir(tmp.name))
+
+
+class RoleMiddlewareTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username='driver')
+        self.client.force_login(self.user)
+
+    def test_role_is_resolved_once_and_refreshed_when_profile_changes(self):
+        self.client.get(reverse('home'))
+        with self.assertNumQueries(2):  # session and user; the role comes from the session
+            response = self.client.get(reverse('home'))
+        self.assertEqual(response.context['user_type'], 'user')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            mechanic = MechanicProfile.objects.create(user=self.user, service_center_name='Garage',
+                                                      phone='9876543210', location='Tirur')
+        self.assertRedirects(self.client.get(reverse('home')), reverse('mechanic_dashboard'),
+                             fetch_redirect_response=False)
+        self.assertRedirects(self.client.get(reverse('redirect_after_login')), reverse('mechanic_dashboard'),
+                             fetch_redirect_response=False)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            mechanic.delete()
+        self.assertEqual(self.client.get(reverse('home')).context['user_type'], 'user')
+
+    def test_anonymous_visitors_skip_role_lookup(self):
+        self.client.logout()
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('home'))
+        self.assertNotIn('user_type', response.context)
+
+
+@override_settings(DEBUG=False)
+class StaticAssetTests(SimpleTestCase):
+    def setUp(self):
+        self.source = tempfile.TemporaryDirectory()
+        self.root = tempfile.TemporaryDirectory()
+        self.addCleanup(self.source.cleanup)
+        self.addCleanup(self.root.cleanup)
+        os.makedirs(os.path.join(self.source.name, 'css'))
+        with open(os.path.join(self.source.name, 'css', 'site.css'), 'w') as f:
+            f.write('body { color: #222; }\n' * 200)
+
+    def collect(self):
+        with override_settings(STATICFILES_DIRS=[self.source.name], STATIC_ROOT=self.root.name,
+                               INSTALLED_APPS=['django.contrib.staticfiles']):
+            call_command('collectstatic', interactive=False, verbosity=0)
+
+    def test_collected_files_are_hashed_and_precompressed(self):
+        self.collect()
+        names = os.listdir(os.path.join(self.root.name, 'css'))
+        hashed = next(name for name in names if name.startswith('site.') and name.endswith('.css'))
+        self.assertNotEqual(hashed, 'site.css')
+        self.assertIn(hashed + '.gz', names)
+
+        with override_settings(STATIC_ROOT=self.root.name):
+            response = self.client.get(f'/static/css/{hashed}', HTTP_ACCEPT_ENCODING='gzip, deflate')
+            self.assertEqual(response['Content-Encoding'], 'gzip')
+            self.assertEqual(response['Vary'], 'Accept-Encoding')
+            self.assertIn('immutable', response['Cache-Control'])
+
+            plain = self.client.get('/static/css/site.css')
+            self.assertFalse(plain.has_header('Content-Encoding'))
+            self.assertNotIn('immutable', plain['Cache-Control'])
+            self.assertEqual(b''.join(plain.streaming_content).decode(), 'body { color: #222; }\n' * 200)
+
+            self.assertEqual(self.client.get('/static/../settings.py').status_code, 404)
+
+    def test_image_variants_are_never_upscaled(self):
+        Image.new('RGB', (900, 600), 'red').save(os.path.join(self.source.name, 'photo.jpg'))
+        written = build_image_variants(self.source.name)
+        # No JPEG at the source's own width: that is the original
+        self.assertEqual(sorted(path.name for path in written),
+                         ['photo-640.jpg', 'photo-640.webp', 'photo-900.webp'])
+        with Image.open(os.path.join(self.source.name, 'variants', 'photo-640.webp')) as image:
+            self.assertEqual(image.size, (640, 427))
+        self.assertEqual(build_image_variants(self.source.name), [])
+
+    def test_variants_bigger_than_their_source_are_dropped(self):
+        # Already heavily compressed: re-encoding can only add bytes
+        Image.effect_noise((700, 400), 80).convert('RGB').save(
+            os.path.join(self.source.name, 'noise.jpg'), quality=20)
+        os.mkdir(os.path.join(self.source.name, 'variants'))
+        stale = os.path.join(self.source.name, 'variants', 'noise-640.jpg')
+        Image.new('RGB', (640, 366)).save(stale)
+        self.assertEqual(build_image_variants(self.source.name, force=True), [])
+        self.assertEqual(os.listdir(os.path.join(self.source.name, 'variants')), [])
+
+    def test_widths_are_listed_once(self):
+        self.assertEqual(variant_widths(2560), [640, 1280])
+        self.assertEqual(variant_widths(900), [640, 900])
+        self.assertEqual(variant_widths(300), [300])
+
+    def test_accept_encoding_q_values_are_honoured(self):
+        both = [('.br', 'br'), ('.gz', 'gzip')]
+        cases = {
+            'gzip, deflate, br': 'br',
+            'br;q=0, gzip': 'gzip',
+            'br;q=0.2, gzip;q=0.8': 'gzip',
+            'GZIP; Q=0.5': 'gzip',
+            '*': 'br',
+            '*;q=0, gzip': 'gzip',
+            'gzip;q=0, br;q=0': None,
+            'identity': None,
+            'br;q=oops': None,
+            '': None,
+        }
+        for header, expected in cases.items():
+            chosen = _choose_encoding(accepted_encodings(header), both)
+            self.assertEqual(chosen and chosen[1], expected, header)
+
+    def test_refused_encodings_are_not_served(self):
+        self.collect()
+        hashed = next(name for name in os.listdir(os.path.join(self.root.name, 'css'))
+                      if name.startswith('site.') and name.endswith('.css'))
+        with override_settings(STATIC_ROOT=self.root.name):
+            response = self.client.get(f'/static/css/{hashed}', HTTP_ACCEPT_ENCODING='gzip;q=0, identity')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+
+    def test_pages_link_collected_stylesheets(self):
+        response = self.client.get(reverse('login'))
+        self.assertContains(response, '/static/css/base.css')
+        self.assertContains(response, '/static/css/accounts/login.css')
+        self.assertNotContains(response, '<style>')
+
+
+FRAGMENT_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'template_fragments': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                           'LOCATION': 'template-fragments-tests'},
+}
+
+
+@override_settings(CACHES=FRAGMENT_CACHES, TEMPLATE_PERFORMANCE=True)
+class TemplateFragmentTests(TestCase):
+    def setUp(self):
+        self.customer = User.objects.create(username='customer')
+        self.mechanic_user = User.objects.create(username='garage')
+        self.mechanic = MechanicProfile.objects.create(
+            user=self.mechanic_user, service_center_name='Garage', phone='9876543210', location='Valanchery',
+        )
+
+    def test_feedback_fragment_is_reused_until_feedback_changes(self):
+        url = reverse('mechanic_detail', args=[self.mechanic.pk])
+        with self.captureOnCommitCallbacks(execute=True):
+            Feedback.objects.create(user=self.customer, mechanic=self.mechanic, rating=5, comment='Quick fix')
+        self.client.get(url)
+
+        with CaptureQueriesContext(connection) as warm:
+            response = self.client.get(url)
+        self.assertContains(response, 'Quick fix')
+        self.assertFalse(any('services_feedback' in q['sql'] for q in warm.captured_queries))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Feedback.objects.create(user=self.customer, mechanic=self.mechanic, rating=4, comment='Fair price')
+        self.assertContains(self.client.get(url), 'Fair price')
+
+    def test_request_cards_are_cached_without_their_forms(self):
+        self.client.force_login(self.mechanic_user)
+        with self.captureOnCommitCallbacks(execute=True):
+            request = ServiceRequest.objects.create(user=self.customer, mechanic=self.mechanic, vehicle_type='car',
+                                                    service_type='fuel', location='Kuttippuram')
+        self.client.get(reverse('mechanic_dashboard'))
+
+        # Cached body, but the accept form still gets this session's CSRF token
+        with mock.patch.object(ServiceRequest, 'get_service_type_display') as display:
+            response = self.client.get(reverse('mechanic_dashboard'))
+        display.assert_not_called()
+        self.assertContains(response, 'Kuttippuram')
+        self.assertContains(response, 'name="csrfmiddlewaretoken"')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            request.location = 'Tirur'
+            request.save()
+        card = self.client.get(reverse('mechanic_request_card', args=[request.pk]))
+        self.assertContains(card, 'Tirur')
+        self.assertNotContains(card, 'Kuttippuram')
+
+    @override_settings(TEMPLATE_PERFORMANCE=False)
+    def test_fragment_counters_are_not_read_when_caching_is_off(self):
+        ServiceRequest.objects.create(user=self.customer, mechanic=self.mechanic, vehicle_type='car',
+                                      service_type='fuel', location='Kuttippuram')
+        self.client.force_login(self.mechanic_user)
+        for url in (reverse('mechanic_detail', args=[self.mechanic.pk]), reverse('mechanic_dashboard')):
+            with self.subTest(url), CaptureQueriesContext(connection) as queries:
+                self.assertEqual(self.client.get(url).status_code, 200)
+            self.assertFalse(any('services_versioncounter' in q['sql'] for q in queries.captured_queries))
+
+    def test_configured_loaders_are_djangos_default(self):
+        # The cached loader is not a performance-mode switch; see settings.TEMPLATES
+        configured = engines['django'].engine
+        default = Engine(dirs=configured.dirs, app_dirs=True, debug=True)
+        self.assertEqual(configured.loaders, default.loaders)
+
+
+class TemplateProfilerTests(TestCase):
+    def setUp(self):
+        self.addCleanup(template_profiler.uninstall)
+
+    def test_self_time_excludes_nested_templates(self):
+        template_profiler.install()
+        template_profiler.install()
+        with template_profiler.profile() as timings:
+            self.client.get(reverse('login'))
+        stats = timings.stats
+        self.assertEqual(stats['base.html'][0], 1)
+        self.assertEqual(stats['accounts/login.html'][0], 1)
+        calls, total, self_time = stats['accounts/login.html']
+        self.assertLessEqual(self_time, total - stats['base.html'][1] + 1e-6)
+        self.assertIn('accounts/login.html', timings.report())
+
+    @override_settings(TEMPLATE_PROFILING=True)
+    def test_middleware_reports_server_timing(self):
+        with self.assertLogs('roadmech.templates', 'INFO'):
+            response = self.client.get(reverse('login'))
+        self.assertIn('desc="base.html"', response['Server-Timing'])
+
+    def test_profile_templates_command(self):
+        out = StringIO()
+        call_command('profile_templates', reverse('login'), '--repeat', '2', '--host', 'testserver', stdout=out)
+        self.assertIn('HTTP 200', out.getvalue())
+        self.assertIn('accounts/login.html', out.getvalue())
+
+
+class QueryLogTests(TestCase):
+    def setUp(self):
+        self.customer = User.objects.create(username='customer')
+        for i in range(6):
+            ServiceRequest.objects.create(user=self.customer, vehicle_type='car', service_type='fuel',
+                                          location=f'Stop {i}')
+
+    def test_fingerprint_folds_literals_and_in_lists(self):
+        self.assertEqual(fingerprint("SELECT * FROM t WHERE id IN (%s, %s, %s) AND name = 'x' LIMIT 21"),
+                         fingerprint("SELECT * FROM t WHERE id IN (%s,%s)  AND name = 'y''s' LIMIT 1"))
+        self.assertEqual(fingerprint("SELECT a FROM t WHERE b = %s"), "SELECT a FROM t WHERE b = ?")
+
+    def test_query_budget_flags_per_row_queries(self):
+        with self.assertRaisesMessage(AssertionError, 'N+1'):
+            with query_budget(self, 20):
+                for service_request in ServiceRequest.objects.all():
+                    service_request.user.username  # one user query per request
+
+        with query_budget(self, 1) as recorder:
+            list(ServiceRequest.objects.select_related('user'))
+        self.assertEqual(recorder.count, 1)
+
+    @override_settings(QUERY_LOGGING=True)
+    def test_middleware_logs_one_json_line_per_request(self):
+        self.client.force_login(self.customer)
+        with self.assertLogs('roadmech.queries', 'INFO') as logs:
+            self.client.get(reverse('service_history'))
+        line = json.loads(logs.records[-1].getMessage())
+        self.assertEqual((line['path'], line['status']), (reverse('service_history'), 200))
+        self.assertGreater(line['queries'], 0)
+        self.assertEqual(line['n_plus_one'], [])
@@ -8,6 +8,7 @@ urlpatterns = [
     path('request/', views.request_service, name='request_service'),
     path('nearby/<int:request_id>/', views.nearby_mechanics, name='nearby_mechanics'),
     path('assign/<int:request_id>/<int:mechanic_id>/', views.assign_mechanic, name='assign_mechanic'),
+    path('broadcast/<int:request_id>/', views.broadcast_request, name='broadcast_request'),
     path('mechanic/<int:mechanic_id>/', views.mechanic_detail, name='mechanic_detail'),
     path('search/', views.search_mechanics, name='search_mechanics'),
     path('mechanic/<int:mechanic_id>/feedback/', views.give_feedback, name='give_feedback'),
@@ -16,9 +17,15 @@ urlpatterns = [
     path('feedback/<int:request_id>/', views.give_feedback, name='give_feedback'),
     path('service-history/', views.service_history, name='service_history'),
     path('mechanic/dashboard/', views.mechanic_dashboard, name='mechanic_dashboard'),
+    path('mechanic/location/', views.mechanic_location_ping, name='mechanic_location_ping'),
+    path('mechanic/dashboard/events/', views.mechanic_dashboard_events, name='mechanic_dashboard_events'),
+    path('mechanic/dashboard/requests/<int:request_id>/card/', views.mechanic_request_card, name='mechanic_request_card'),
+    path('api/mechanic/requests/', views.mechanic_requests_poll, name='mechanic_requests_poll'),
+    path('api/requests/', views.user_requests_poll, name='user_requests_poll'),
     path('update-status/<int:request_id>/', views.update_request_status, name='update_request_status'),
     path('complete/<int:request_id>/', views.complete_request, name='complete_request'), 
     path('cancel-request/<int:request_id>/', views.cancel_request, name='cancel_request'),
+    path('export/<str:kind>/', views.export_data, name='export_data'),
 
     
 ]
@@ -1,7 +1,12 @@
 # services/utils.py
-from math import radians, sin, cos, sqrt, atan2
 import math
 
+import numpy as np
+
+# Radius of earth in kilometers
+EARTH_RADIUS_KM = 6371.0
+
+
 def haversine_km(lat1, lon1, lat2, lon2):
     """
     Calculate the great-circle distance between two points 
@@ -10,57 +15,104 @@ def haversine_km(lat1, lon1, lat2, lon2):
     Returns:
         float: Distance in kilometers, or None if invalid coordinates
     """
-    # Check for None values
-    if None in [lat1, lon1, lat2, lon2]:
+    try:
+        lat1, lon1, lat2, lon2 = (float(c) for c in (lat1, lon1, lat2, lon2))
+    except (TypeError, ValueError):
         return None
-    
-    # Convert decimal degrees to radians
-    lat1_rad = math.radians(lat1)
-    lon1_rad = math.radians(lon1)
-    lat2_rad = math.radians(lat2)
-    lon2_rad = math.radians(lon2)
-    
-    # Haversine formula
-    dlon = lon2_rad - lon1_rad
+
+    lat1_rad, lat2_rad = math.radians(lat1), math.radians(lat2)
     dlat = lat2_rad - lat1_rad
+    dlon = math.radians(lon2 - lon1)
     a = math.sin(dlat/2)**2 + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(dlon/2)**2
-    c = 2 * math.asin(math.sqrt(a))
-    
-    # Radius of earth in kilometers
-    r = 6371
-    
-    return c * r
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(a, 1.0)))
 
-# Alternative implementation with error handling
-def calculate_distance_km(lat1, lon1, lat2, lon2):
+# Kept for callers of the old name
+calculate_distance_km = haversine_km
+
+
+# ---------------- Batch Distances ----------------
+def distances_km(lat, lon, lats, lons):
     """
-    Alternative implementation of Haversine formula with error handling.
+    Distances in kilometers from (lat, lon) to every point in lats/lons,
+    computed in a single NumPy pass. Missing coordinates give NaN.
     """
-    try:
-        # Check for valid coordinates
-        if not all(isinstance(coord, (int, float)) for coord in [lat1, lon1, lat2, lon2]):
-            return None
-        
-        # Earth radius in kilometers
-        R = 6371.0
-        
-        lat1_rad = math.radians(lat1)
-        lon1_rad = math.radians(lon1)
-        lat2_rad = math.radians(lat2)
-        lon2_rad = math.radians(lon2)
-        
-        dlon = lon2_rad - lon1_rad
-        dlat = lat2_rad - lat1_rad
-        
-        a = math.sin(dlat/2)**2 + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(dlon/2)**2
-        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-        
-        distance = R * c
-        return distance
-        
-    except (TypeError, ValueError):
-        return None
+    lats = np.radians(np.asarray(lats, dtype=np.float64))
+    lons = np.radians(np.asarray(lons, dtype=np.float64))
+    lat0 = math.radians(float(lat))
+    lon0 = math.radians(float(lon))
+
+    a = (np.sin((lats - lat0) / 2) ** 2
+         + math.cos(lat0) * np.cos(lats) * np.sin((lons - lon0) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def nearest_km(lat, lon, lats, lons, radius_km=None, k=None):
+    """
+    Rank points by distance from (lat, lon).
+
+    Returns (indices, distances) as NumPy arrays sorted nearest first,
+    limited to points within radius_km and to the k nearest when given.
+    Points with missing coordinates are left out.
+    """
+    dist = distances_km(lat, lon, lats, lons)
+    keep = ~np.isnan(dist)
+    if radius_km is not None:
+        keep &= dist <= radius_km
+    idx = np.flatnonzero(keep)
+
+    if k is not None and k < len(idx):
+        idx = idx[np.argpartition(dist[idx], k - 1)[:k]]
+    idx = idx[np.argsort(dist[idx], kind='stable')]
+    return idx, dist[idx]
+
+
+def pairwise_distances_km(lats1, lons1, lats2, lons2):
+    """
+    Matrix of distances in kilometers, shape (len(lats1), len(lats2)),
+    from every point in the first set to every point in the second.
+    """
+    lat1 = np.radians(np.asarray(lats1, dtype=np.float64))[:, None]
+    lon1 = np.radians(np.asarray(lons1, dtype=np.float64))[:, None]
+    lat2 = np.radians(np.asarray(lats2, dtype=np.float64))[None, :]
+    lon2 = np.radians(np.asarray(lons2, dtype=np.float64))[None, :]
+
+    a = (np.sin((lat2 - lat1) / 2) ** 2
+         + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+# ---------------- Grid Cells ----------------
+# Mechanics are bucketed into fixed-size lat/lon cells; the nearby search
+# cache (services.nearby_cache) expires cached results by cell.
+GRID_CELL_DEG = 0.05  # roughly 5.5 km at the equator
+KM_PER_DEG_LAT = 111.32
+
+
+def grid_cell(lat, lon, cell_deg=GRID_CELL_DEG):
+    """
+    Return the (row, col) grid cell containing a point, or (None, None)
+    if either coordinate is missing.
+    """
+    if lat is None or lon is None:
+        return None, None
+    return (
+        math.floor(float(lat) / cell_deg),
+        math.floor(float(lon) / cell_deg),
+    )
+
+
+def grid_cell_bounds(lat, lon, radius_km):
+    """
+    Return (min_row, max_row, min_col, max_col) covering every cell that can
+    contain a point within radius_km of (lat, lon).
+    """
+    lat, lon = float(lat), float(lon)
+    dlat = radius_km / KM_PER_DEG_LAT
+    # Longitude degrees shrink towards the poles, so size the box using the
+    # latitude furthest from the equator that is still inside the radius.
+    edge_lat = min(abs(lat) + dlat, 89.0)
+    dlon = radius_km / (KM_PER_DEG_LAT * math.cos(math.radians(edge_lat)))
+    min_row, min_col = grid_cell(lat - dlat, lon - dlon)
+    max_row, max_col = grid_cell(lat + dlat, lon + dlon)
+    return min_row, max_row, min_col, max_col
 
-# You can use either function, but make sure to import the correct one
-# For now, let's alias haversine_km to calculate_distance_km
-haversine_km = calculate_distance_km
\ No newline at end of file
@@ -0,0 +1,119 @@
+# services/versions.py
+"""
+Change counters shared by every worker process.
+
+Readers compare the counter against the value they last saw to decide
+whether a process-local copy of some data is still current. The counters
+live in the VersionCounter table on the primary database, not in the
+process-local cache, so a bump in one process is seen by all the others
+on their next read. Increments are a single conditional UPDATE and never
+lose a concurrent bump.
+"""
+import time
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+# Counters are always read from and written to the primary; a lagging
+# replica would hide recent bumps.
+DATABASE = 'default'
+# Counter names per statement in bump_versions(), well under SQLite's
+# bound-parameter limit
+BUMP_CHUNK = 500
+
+
+def _counters():
+    from .models import VersionCounter
+
+    return VersionCounter.objects.using(DATABASE)
+
+
+def _create(name):
+    # Seed from the clock so a counter recreated after its row was deleted
+    # (e.g. a flushed database) never repeats a value a process remembers
+    try:
+        with transaction.atomic(using=DATABASE):
+            _counters().create(name=name, value=time.time_ns())
+    except IntegrityError:
+        pass  # created concurrently by another process
+    return _counters().filter(name=name).values_list('value', flat=True).get()
+
+
+def get_version(name):
+    """Return the current value of the named counter, creating it if needed."""
+    version = _counters().filter(name=name).values_list('value', flat=True).first()
+    return version if version is not None else _create(name)
+
+
+def get_versions(names):
+    """get_version() for several counters in one query."""
+    found = dict(_counters().filter(name__in=names).values_list('name', 'value'))
+    return [found[name] if name in found else _create(name) for name in names]
+
+
+def bump_version(name):
+    """Increment the named counter and return its new value."""
+    with transaction.atomic(using=DATABASE):
+        if not _counters().filter(name=name).update(value=F('value') + 1):
+            _create(name)
+            _counters().filter(name=name).update(value=F('value') + 1)
+        return _counters().filter(name=name).values_list('value', flat=True).get()
+
+
+def bump_versions(names):
+    """
+    bump_version() for many counters at once: one UPDATE per chunk of names,
+    plus one INSERT for any that do not exist yet.
+    """
+    from .models import VersionCounter
+
+    names = sorted(set(names))
+    with transaction.atomic(using=DATABASE):
+        for start in range(0, len(names), BUMP_CHUNK):
+            chunk = names[start:start + BUMP_CHUNK]
+            if _counters().filter(name__in=chunk).update(value=F('value') + 1) == len(chunk):
+                continue
+            existing = set(_counters().filter(name__in=chunk).values_list('name', flat=True))
+            missing = [name for name in chunk if name not in existing]
+            # Seeded like _create(); a concurrent creator wins and is bumped below
+            _counters().bulk_create(
+                [VersionCounter(name=name, value=time.time_ns()) for name in missing],
+                ignore_conflicts=True,
+            )
+            _counters().filter(name__in=missing).update(value=F('value') + 1)
+
+
+# ---------------- Service Requests ----------------
+def mechanic_requests_version(mechanic_id):
+    return get_version(f'requests:mechanic:{mechanic_id}')
+
+
+def user_requests_version(user_id):
+    return get_version(f'requests:user:{user_id}')
+
+
+def request_version_names(service_request, *other_mechanic_ids):
+    """Counters bumped by bump_request_versions(), for batching several requests."""
+    return [f'requests:user:{service_request.user_id}'] + [
+        f'requests:mechanic:{mechanic_id}'
+        for mechanic_id in {service_request.mechanic_id, *other_mechanic_ids} - {None}
+    ]
+
+
+def bump_request_versions(service_request, *other_mechanic_ids):
+    """
+    Mark the owner's and the mechanic's request lists as changed, along with
+    those of any previous or offered mechanics passed in other_mechanic_ids.
+    """
+    bump_versions(request_version_names(service_request, *other_mechanic_ids))
+
+
+# ---------------- Feedback ----------------
+def mechanic_feedback_version(mechanic_id):
+    return get_version(f'feedback:mechanic:{mechanic_id}')
+
+
+def bump_feedback_version(*mechanic_ids):
+    """A review of these mechanics was written, moved or removed."""
+    for mechanic_id in set(mechanic_ids) - {None}:
+        bump_version(f'feedback:mechanic:{mechanic_id}')
@@ -2,19 +2,37 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.db.models import Avg
+from django.contrib.admin.views.decorators import staff_member_required
 from .forms import ServiceRequestForm, FeedbackForm
-from .models import ServiceRequest, Feedback
+from .models import ArchivedFeedback, ArchivedServiceRequest, ServiceRequest, Feedback
 from accounts.models import MechanicProfile
-from geopy.distance import geodesic
-from django.http import JsonResponse
+from roadmech.db_router import replica_reads
+from . import assignment
+from .dashboard import mechanic_dashboard_context, mechanic_requests, status_counts
+from .events import broker
+from .exports import EXPORTS, FORMATS, export_filters, export_lines, export_querysets
+from .live_location import location_buffer
+from .nearby_cache import nearest_cached
+from .pagination import PAGE_SIZE, decode_cursor, encode_cursor, merged_keyset_page
+from .versions import mechanic_feedback_version, mechanic_requests_version, user_requests_version
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db.models import Exists, OuterRef, Q
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.functional import SimpleLazyObject
+from django.views.decorators.http import condition, require_POST
+import asyncio
 import json
 import math
+from datetime import timedelta
+from decimal import Decimal
+from itertools import chain
 
 
 def home(request):
     # If user is logged in and is a mechanic, redirect to mechanic dashboard
-    if request.user.is_authenticated and hasattr(request.user, 'mechanicprofile'):
+    if request.role.kind == 'mechanic':
         return redirect('mechanic_dashboard')
     
     # Everyone else (regular users and guests) sees the home page
@@ -26,18 +44,28 @@ def choose_vehicle(request):
 
 
 # ---------------- Helper Function ----------------
-def haversine_km(lat1, lon1, lat2, lon2):
-    """Return distance in kilometers between two lat/lon points using Haversine."""
-    if None in (lat1, lon1, lat2, lon2):
-        return None
-    R = 6371.0  # Earth's radius in kilometers
-    lat1_r, lon1_r = math.radians(lat1), math.radians(lon1)
-    lat2_r, lon2_r = math.radians(lat2), math.radians(lon2)
-    dlat = lat2_r - lat1_r
-    dlon = lon2_r - lon1_r
-    a = math.sin(dlat/2)**2 + math.cos(lat1_r) * math.cos(lat2_r) * math.sin(dlon/2)**2
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-    return R * c
+def find_nearby_mechanics(lat, lon, radius_km, limit=None):
+    """
+    Return [{'mechanic', 'distance'}] for available mechanics within
+    radius_km of the point, nearest first. Geometry comes from the cell cache
+    over the in-memory mechanic index; the database is only asked for the
+    matching profiles.
+    """
+    fetch = limit
+    while True:
+        hits = nearest_cached(lat, lon, radius_km, fetch)
+        profiles = MechanicProfile.objects.filter(
+            approved=True, is_available=True
+        ).in_bulk([pk for pk, _ in hits])
+        nearby = [
+            {'mechanic': profiles[pk], 'distance': round(distance, 2)}
+            for pk, distance in hits if pk in profiles
+        ]
+        # Rows changed since the index last saw them can drop out here; ask
+        # for more until the page is full or nobody else is in range
+        if limit is None or len(nearby) >= limit or len(hits) < fetch:
+            return nearby[:limit]
+        fetch *= 2
 
 
 # ---------------- Service Request ----------------
@@ -88,7 +116,6 @@ def request_service(request):
 
 
 # ---------------- Nearby Mechanics ----------------
-
 @login_required
 def nearby_mechanics(request, request_id):
     service_request = get_object_or_404(ServiceRequest, id=request_id, user=request.user)
@@ -99,40 +126,24 @@ def nearby_mechanics(request, request_id):
     user_lat = 10.884653  # Valanchery coordinates
     user_lng = 76.038162
     
-    # Optional: Update the service request with correct coordinates
-    if service_request.latitude != user_lat or service_request.longitude != user_lng:
+    # Optional: Update the service request with correct coordinates. The
+    # columns load as Decimal, so compare as Decimal; a float never equals
+    # them and every visit would write.
+    if (service_request.latitude != Decimal(str(user_lat))
+            or service_request.longitude != Decimal(str(user_lng))):
         service_request.latitude = user_lat
         service_request.longitude = user_lng
         service_request.save()
 
-    # Rest of your code...
-    all_mechanics = MechanicProfile.objects.filter(
-        is_available=True, 
-        approved=True
-    ).exclude(latitude=None).exclude(longitude=None)
-    
-    nearby_mechanics = []
-    user_location = (user_lat, user_lng)
-
-    for mechanic in all_mechanics:
-        try:
-            mechanic_location = (float(mechanic.latitude), float(mechanic.longitude))
-            distance_km = geodesic(user_location, mechanic_location).km
-
-            if distance_km <= radius_km:
-                nearby_mechanics.append({
-                    'mechanic': mechanic,
-                    'distance': round(distance_km, 2)
-                })
-        except (TypeError, ValueError):
-            continue
-
-    nearby_mechanics.sort(key=lambda x: x['distance'])
+    # Capped at settings.NEARBY_MECHANICS_LIMIT; the page says when it is
+    limit = settings.NEARBY_MECHANICS_LIMIT
+    nearby_mechanics = find_nearby_mechanics(user_lat, user_lng, radius_km, limit=limit)
     
     context = {
         'service_request': service_request,
         'nearby_mechanics': nearby_mechanics,
         'radius_km': radius_km,
+        'results_limited': limit is not None and len(nearby_mechanics) >= limit,
         'user_location': f"{user_lat}, {user_lng}",
     }
     return render(request, 'services/nearby_mechanics.html', context)
@@ -143,39 +154,79 @@ def assign_mechanic(request, request_id, mechanic_id):
     sr = get_object_or_404(ServiceRequest, id=request_id, user=request.user)
     mech = get_object_or_404(MechanicProfile, id=mechanic_id)
 
-    sr.mechanic = mech
-    sr.status = 'Pending'   
-    sr.save()
+    # Only while nobody has accepted it; a mechanic may have just done so
+    if assignment.assign_request(sr.id, request.user, mech, previous_mechanic_id=sr.mechanic_id) is None:
+        messages.error(request, "This request has already been accepted or closed.")
     return redirect('service_success', request_id=sr.id)
 
 
+@login_required
+@require_POST
+def broadcast_request(request, request_id):
+    """Offer the request to the nearest available mechanics; first to accept wins."""
+    sr = get_object_or_404(ServiceRequest, id=request_id, user=request.user)
+    if sr.mechanic_id is not None:
+        sr = assignment.assign_request(sr.id, request.user, None, previous_mechanic_id=sr.mechanic_id)
+    if sr is None or sr.status != 'Pending':
+        messages.error(request, "This request has already been accepted or closed.")
+    elif assignment.broadcast_request(sr):
+        messages.success(request, "Your request was sent to the nearest available mechanics.")
+    else:
+        messages.error(request, "No available mechanics were found near you.")
+    return redirect('service_success', request_id=request_id)
+
+
 
 
 # ---------------- User Dashboard ----------------
-@login_required
-def user_dashboard(request):
-    reqs = ServiceRequest.objects.filter(user=request.user).order_by('-created_at')
-    return render(request, 'services/user_dashboard.html', {'requests': reqs})
+def user_history(user):
+    """A customer's requests with their mechanic and a has_feedback flag."""
+    return ServiceRequest.objects.filter(user=user).select_related('mechanic').annotate(
+        has_feedback=Exists(Feedback.objects.filter(service_request=OuterRef('pk'), user=user))
+    )
 
 
-@login_required
-def mechanic_dashboard(request):
-    mechanic = MechanicProfile.objects.get(user=request.user)
-    requests = ServiceRequest.objects.filter(mechanic=mechanic)
-    return render(request, 'services/mechanic_dashboard.html', {'requests': requests})
+def archived_history(user):
+    """The same for requests moved to the archive by archive_requests."""
+    return ArchivedServiceRequest.objects.filter(user=user).select_related('mechanic').annotate(
+        has_feedback=Exists(ArchivedFeedback.objects.filter(service_request=OuterRef('pk'), user=user))
+    )
+
+
+def history_page(request):
+    """One newest-first page of the user's live and archived requests."""
+    return merged_keyset_page(
+        [user_history(request.user), archived_history(request.user)], request.GET.get('cursor'), PAGE_SIZE
+    )
 
 
+@login_required
+@replica_reads
+def user_dashboard(request):
+    reqs, next_cursor = history_page(request)
+    return render(request, 'services/user_dashboard.html', {
+        'requests': reqs,
+        'next_cursor': next_cursor,
+    })
+
 
 # ---------------- Mechanic Accept Request ----------------
+ALREADY_TAKEN = "Sorry, this request has already been taken."
+# A transition other than accepting found the request in another state
+STATUS_CONFLICT = "This request is no longer {status}."
+
+
 @login_required
+@require_POST
 def accept_request(request, request_id):
-    service_request = get_object_or_404(ServiceRequest, id=request_id)
+    mechanic = get_object_or_404(MechanicProfile, user=request.user)
 
-    # ensure only the assigned mechanic can accept
-    if service_request.mechanic and request.user == service_request.mechanic.user:
-        service_request.status = 'Accepted'
-        service_request.save()
+    # One conditional UPDATE: the assigned mechanic, or the first offered
+    # mechanic to get here, wins; everyone else gets "already taken".
+    if assignment.claim_request(request_id, mechanic) is not None:
         messages.success(request, "Service request accepted successfully!")
+    elif ServiceRequest.objects.filter(Q(mechanic=mechanic) | Q(offers__mechanic=mechanic), id=request_id).exists():
+        messages.error(request, ALREADY_TAKEN)
     else:
         messages.error(request, "You are not authorized to accept this request.")
 
@@ -250,81 +301,97 @@ def give_feedback(request, request_id=None, mechanic_id=None):
 
 
 # ---------------- Mechanic Detail ----------------
+@replica_reads
 def mechanic_detail(request, mechanic_id):
-    mechanic = get_object_or_404(MechanicProfile, id=mechanic_id)
-    feedbacks = mechanic.feedbacks.all()
-    avg_rating = feedbacks.aggregate(Avg("rating"))["rating__avg"] or 0
+    mechanic = get_object_or_404(MechanicProfile.objects.select_related('user'), id=mechanic_id)
+    # Reviews of archived requests still belong on the profile. Only loaded
+    # if the feedback fragment is not already cached.
+    feedbacks = SimpleLazyObject(lambda: sorted(
+        chain(mechanic.feedbacks.select_related('user'), mechanic.archived_feedbacks.select_related('user')),
+        key=lambda fb: fb.created_at, reverse=True,
+    ))
 
     return render(request, 'services/mechanic_detail.html', {
         'mechanic': mechanic,
         'feedbacks': feedbacks,
-        'avg_rating': round(avg_rating, 1)
+        # Only keys the {% cache %} fragment, which is a no-op unless
+        # TEMPLATE_PERFORMANCE is on; skip the counter query otherwise
+        'feedback_version': mechanic_feedback_version(mechanic.pk) if settings.TEMPLATE_PERFORMANCE else None,
+        'avg_rating': mechanic.average_rating()
     })
 
 
 # ---------------- My Requests ----------------
 @login_required
+@replica_reads
 def my_requests(request):
-    requests = ServiceRequest.objects.filter(user=request.user).select_related('mechanic')
-    return render(request, 'services/my_requests.html', {'requests': requests})
+    requests, next_cursor = history_page(request)
+    return render(request, 'services/my_requests.html', {
+        'requests': requests,
+        'next_cursor': next_cursor,
+    })
 
 
 # ---------------- Search Mechanics ----------------
+DEFAULT_SEARCH_RADIUS_KM = 50
+# Wider searches would walk an unbounded number of cache regions
+MAX_SEARCH_RADIUS_KM = 500
+
+
+def _finite_float(value):
+    """float(value), or None if it is missing, malformed, NaN or infinite."""
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return number if math.isfinite(number) else None
+
+
 @login_required
+@replica_reads
 def search_mechanics(request):
     lat = request.GET.get("lat")
     lon = request.GET.get("lon")
-    radius_km = float(request.GET.get("radius", 50))
+    radius_km = _finite_float(request.GET.get("radius"))
+    if radius_km is None or radius_km <= 0:
+        radius_km = DEFAULT_SEARCH_RADIUS_KM
+    radius_km = min(radius_km, MAX_SEARCH_RADIUS_KM)
+    min_rating = _finite_float(request.GET.get("min_rating"))
+    min_rating = min(max(min_rating, 0), 5) if min_rating is not None else 0
+    sort = request.GET.get("sort", "distance")
     mechanics_list = []
 
     if lat and lon:
-        try:
-            lat_f, lon_f = float(lat), float(lon)
-        except ValueError:
-            lat_f = lon_f = None
-
-        if lat_f is not None:
-            qs = MechanicProfile.objects.filter(approved=True).exclude(
-                latitude__isnull=True, longitude__isnull=True
-            )
-
-            for mech in qs:
-                if mech.latitude is None or mech.longitude is None:
-                    continue
-                distance = haversine_km(lat_f, lon_f, mech.latitude, mech.longitude)
-                if distance <= radius_km:
-                    avg_rating = mech.feedbacks.aggregate(Avg('rating'))['rating__avg'] or 0
-                    mechanics_list.append({
-                        'mechanic': mech,
-                        'distance': round(distance, 2),
-                        'avg_rating': round(avg_rating, 1)
-                    })
-
-            mechanics_list.sort(key=lambda x: x['distance'])
+        lat_f, lon_f = _finite_float(lat), _finite_float(lon)
+        if lat_f is not None and lon_f is not None and abs(lat_f) <= 90 and abs(lon_f) <= 180:
+            # Ratings are stored on the profile, so this needs no extra queries
+            mechanics_list = [
+                dict(item, avg_rating=item['mechanic'].average_rating())
+                for item in find_nearby_mechanics(lat_f, lon_f, radius_km)
+                if item['mechanic'].rating_avg >= min_rating
+            ]
+            if sort == "rating":
+                mechanics_list.sort(key=lambda x: (-x['mechanic'].rating_avg, x['distance']))
 
     return render(request, "services/search_mechanics.html", {
         "query": f"{lat},{lon}" if lat and lon else "",
         "radius": radius_km,
+        "min_rating": min_rating,
+        "sort": sort,
         "mechanics": mechanics_list,
     })
 
 # services/views.py - Add this function
 @login_required
+@replica_reads
 def service_history(request):
-    # Get user's service requests ordered by creation date
-    service_requests = ServiceRequest.objects.filter(user=request.user).order_by('-created_at')
-    
-    # Add feedback information for each request
-    for req in service_requests:
-        req.feedback_exists = Feedback.objects.filter(service_request=req, user=request.user).exists()
-        req.can_give_feedback = (
-            req.status == 'Completed' and 
-            req.mechanic and 
-            not req.feedback_exists
-        )
+    # One page of the user's requests, newest first; feedback existence comes
+    # from an annotated EXISTS subquery instead of a query per row
+    service_requests, next_cursor = history_page(request)
     
     context = {
         'service_requests': service_requests,
+        'next_cursor': next_cursor,
     }
     return render(request, 'services/service_history.html', context)
 
@@ -337,34 +404,37 @@ def service_success(request, request_id):
 @login_required
 def update_request_status(request, request_id):
     if request.method == 'POST':
-        import json
-        service_request = get_object_or_404(ServiceRequest, id=request_id)
-        
-        # Check if the current user is the assigned mechanic
-        if service_request.mechanic.user != request.user:
+        mechanic = MechanicProfile.objects.filter(user=request.user).first()
+        if mechanic is None:
             return JsonResponse({'success': False, 'error': 'Not authorized'})
-        
-        data = json.loads(request.body)
-        new_status = data.get('status')
-        
-        if new_status in ['Accepted', 'Completed']:
-            service_request.status = new_status
-            service_request.save()
-            return JsonResponse({'success': True})
-    
+
+        try:
+            new_status = json.loads(request.body).get('status')
+        except (ValueError, AttributeError):
+            new_status = None
+
+        if new_status == 'Accepted':
+            if assignment.claim_request(request_id, mechanic) is None:
+                return JsonResponse({'success': False, 'error': ALREADY_TAKEN}, status=409)
+        elif new_status == 'Completed':
+            if assignment.complete_request(request_id, mechanic) is None:
+                error = STATUS_CONFLICT.format(status='accepted')
+                return JsonResponse({'success': False, 'error': error}, status=409)
+        else:
+            return JsonResponse({'success': False})
+        return JsonResponse({'success': True})
+
     return JsonResponse({'success': False})
 
 @login_required
 def complete_request(request, request_id):
     service_request = get_object_or_404(ServiceRequest, id=request_id)
     
-    if service_request.mechanic.user != request.user:
+    if service_request.mechanic is None or service_request.mechanic.user != request.user:
         messages.error(request, 'You are not authorized to complete this request.')
         return redirect('mechanic_dashboard')
     
-    if service_request.status == 'Accepted':
-        service_request.status = 'Completed'
-        service_request.save()
+    if assignment.complete_request(service_request.id, service_request.mechanic) is not None:
         messages.success(request, 'Service marked as completed!')
     else:
         messages.warning(request, 'This request cannot be marked as completed.')
@@ -373,36 +443,17 @@ def complete_request(request, request_id):
 
 
 @login_required
+@replica_reads
 def mechanic_dashboard(request):
     try:
         mechanic = MechanicProfile.objects.get(user=request.user)
-        requests = ServiceRequest.objects.filter(mechanic=mechanic)
-        
-        # Separate requests by status (including cancelled)
-        pending_requests = requests.filter(status='Pending')
-        accepted_requests = requests.filter(status='Accepted')
-        completed_requests = requests.filter(status='Completed')
-        cancelled_requests = requests.filter(status='Cancelled')  # Add cancelled requests
-        
-        # Calculate average rating
-        from django.db.models import Avg
-        average_rating = Feedback.objects.filter(
-            mechanic=mechanic
-        ).aggregate(Avg('rating'))['rating__avg'] or 0.0
-        
-        context = {
-            'mechanic': mechanic,
-            'pending_requests': pending_requests,
-            'my_accepted': accepted_requests,
-            'completed_requests': completed_requests,
-            'cancelled_requests': cancelled_requests,  # Add to context
-            'average_rating': round(average_rating, 1),
-        }
-        return render(request, 'services/mechanic_dashboard.html', context)
-        
     except MechanicProfile.DoesNotExist:
         messages.error(request, 'You are not registered as a mechanic.')
         return redirect('home')
+
+    # Counts and capped per-status lists in two queries, however busy the garage
+    context = mechanic_dashboard_context(mechanic)
+    return render(request, 'services/mechanic_dashboard.html', context)
     
 @login_required
 def create_service_request(request):
@@ -425,12 +476,194 @@ def create_service_request(request):
 def cancel_request(request, request_id):
     service_request = get_object_or_404(ServiceRequest, id=request_id, user=request.user)
     
-    # Check if the request can be cancelled (only Pending)
-    if service_request.status == 'Pending':
-        service_request.status = 'Cancelled'
-        service_request.save()
+    # Only Pending requests can be cancelled, checked in the UPDATE itself
+    if assignment.cancel_request(service_request.id, request.user) is not None:
         messages.success(request, 'Service request has been cancelled successfully.')
     else:
         messages.error(request, 'Only pending requests can be cancelled.')
     
-    return redirect('request_service')
\ No newline at end of file
+    return redirect('request_service')
+
+# ---------------- Live Location ----------------
+def _ping_coordinates(request):
+    data = request.POST
+    if request.content_type == 'application/json':
+        try:
+            data = json.loads(request.body)
+        except ValueError:
+            return None
+    try:
+        lat = float(data.get('latitude', data.get('lat')))
+        lon = float(data.get('longitude', data.get('lon')))
+    except (AttributeError, TypeError, ValueError):
+        return None
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        return None
+    return lat, lon
+
+
+@login_required
+@require_POST
+def mechanic_location_ping(request):
+    """Accept a GPS fix from the mechanic's device; buffered, never written inline."""
+    mechanic_id = request.role.mechanic_id
+    if mechanic_id is None:
+        return JsonResponse({'error': 'Not a mechanic'}, status=403)
+
+    coords = _ping_coordinates(request)
+    if coords is None:
+        return JsonResponse({'error': 'latitude and longitude are required'}, status=400)
+    location_buffer.add(mechanic_id, *coords)
+    return HttpResponse(status=204)
+
+
+# ---------------- Live Dashboard ----------------
+SSE_KEEPALIVE_SECONDS = 25
+
+
+async def mechanic_dashboard_events(request):
+    """Server-Sent Events stream of this mechanic's request changes (ASGI only)."""
+    if not isinstance(request, ASGIRequest):
+        # A WSGI worker would be tied up for the life of the stream; 204
+        # tells EventSource to stop and the page falls back to reloading.
+        return HttpResponse(status=204)
+    user = await request.auser()
+    if not user.is_authenticated:
+        return HttpResponse(status=401)
+    mechanic_id = await MechanicProfile.objects.filter(user=user).values_list('id', flat=True).afirst()
+    if mechanic_id is None:
+        return HttpResponse(status=403)
+
+    async def stream():
+        with broker.subscribe(mechanic_id) as queue:
+            yield "retry: 5000\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), SSE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"event: request\ndata: {json.dumps(event)}\n\n"
+
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@login_required
+def mechanic_request_card(request, request_id):
+    """Render a single dashboard card so live updates can patch it in."""
+    mechanic = get_object_or_404(MechanicProfile, user=request.user)
+    service_request = get_object_or_404(
+        mechanic_requests(mechanic.pk).select_related('user'), id=request_id,
+    )
+    return render(request, 'services/partials/request_card.html', {
+        'r': service_request,
+        'cards_version': mechanic_requests_version(mechanic.pk) if settings.TEMPLATE_PERFORMANCE else None,
+    })
+
+
+# ---------------- Polling API ----------------
+POLL_PAGE_SIZE = 100
+# updated_at is stamped at save() but only visible at commit, so a request
+# saved just before a poll can appear after a later-stamped one that poll
+# already returned. The cursor never moves past rows younger than this;
+# they are sent again on the next poll and clients replace them by id.
+POLL_SETTLE = timedelta(seconds=5)
+
+
+def _request_json(service_request):
+    mechanic = service_request.mechanic
+    return {
+        'id': service_request.id,
+        'status': service_request.status,
+        'service_type': service_request.service_type,
+        'vehicle_type': service_request.vehicle_type,
+        'location': service_request.location,
+        'mechanic': {'id': mechanic.id, 'name': mechanic.service_center_name} if mechanic else None,
+        'created_at': service_request.created_at.isoformat(),
+        'updated_at': service_request.updated_at.isoformat(),
+    }
+
+
+def _requests_delta(request, queryset):
+    """JSON of requests changed after the `since` cursor, oldest change first."""
+    settled = timezone.now() - POLL_SETTLE
+    changed = queryset
+    since = decode_cursor(request.GET.get('since'))
+    if since:
+        changed = changed.filter(
+            Q(updated_at__gt=since[0]) | Q(updated_at=since[0], id__gt=since[1])
+        )
+    rows = list(changed.select_related('mechanic').order_by('updated_at', 'id')[:POLL_PAGE_SIZE + 1])
+    has_more = len(rows) > POLL_PAGE_SIZE
+    rows = rows[:POLL_PAGE_SIZE]
+    # The cursor comes from the rows returned, stopping at the last settled one
+    last = next((r for r in reversed(rows) if r.updated_at <= settled), None)
+    cursor = encode_cursor(last.updated_at, last.id) if last else request.GET.get('since', '')
+    has_more = has_more and last is rows[-1]
+
+    response = JsonResponse({
+        'counts': status_counts(queryset),
+        'requests': [_request_json(r) for r in rows],
+        'cursor': cursor,
+        'has_more': has_more,
+    })
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def _mechanic_poll_etag(request):
+    # The change counter is one primary-key read shared by every worker, so
+    # an unchanged dashboard is answered with 304 before the ServiceRequest
+    # table is touched.
+    mechanic_id = request.role.mechanic_id
+    request.poll_mechanic_id = mechanic_id
+    if mechanic_id is None:
+        return None
+    return f"m{mechanic_id}-{mechanic_requests_version(mechanic_id)}-{request.GET.get('since', '')}"
+
+
+def _user_poll_etag(request):
+    return f"u{request.user.id}-{user_requests_version(request.user.id)}-{request.GET.get('since', '')}"
+
+
+@login_required
+@condition(etag_func=_mechanic_poll_etag)
+def mechanic_requests_poll(request):
+    if request.poll_mechanic_id is None:
+        return JsonResponse({'error': 'Not a mechanic'}, status=403)
+    return _requests_delta(request, mechanic_requests(request.poll_mechanic_id))
+
+
+@login_required
+@condition(etag_func=_user_poll_etag)
+def user_requests_poll(request):
+    return _requests_delta(request, ServiceRequest.objects.filter(user=request.user))
+
+
+# ---------------- Exports ----------------
+@staff_member_required
+@replica_reads
+def export_data(request, kind):
+    """Stream service requests or feedback as CSV (default) or JSON Lines."""
+    fmt = request.GET.get('format', 'csv')
+    if kind not in EXPORTS or fmt not in FORMATS:
+        raise Http404("Unknown export")
+    try:
+        filters = export_filters(
+            kind, since=request.GET.get('since'), until=request.GET.get('until'),
+            status=request.GET.get('status'), mechanic=request.GET.get('mechanic'),
+        )
+    except ValueError as exc:
+        return HttpResponse(str(exc), status=400, content_type='text/plain')
+
+    # Rows are read after this view returns, so pin the querysets to the
+    # database @replica_reads picked for it now.
+    querysets = [qs.using(qs.db) for qs in export_querysets(kind, filters)]
+    stamp = timezone.now().strftime('%Y%m%d-%H%M%S')
+    response = StreamingHttpResponse(export_lines(kind, fmt, querysets), content_type=FORMATS[fmt])
+    response['Content-Disposition'] = f'attachment; filename="{kind}-{stamp}.{fmt}"'
+    response['Cache-Control'] = 'no-store'
+    return response
@@ -1,15 +1,175 @@
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from geopy.exc import GeopyError
 from geopy.geocoders import Nominatim
 from geopy.extra.rate_limiter import RateLimiter
 
 geolocator = Nominatim(user_agent="roadmech_app")   # set a descriptive user_agent
-# RateLimiter prevents too many quick successive requests
-geocode = RateLimiter(geolocator.geocode, min_delay_seconds=1, max_retries=2, error_wait_seconds=2)
+# RateLimiter prevents too many quick successive requests. Errors are raised
+# rather than swallowed so that an outage is never cached as "not found".
+geocode = RateLimiter(geolocator.geocode, min_delay_seconds=1, max_retries=2,
+                      error_wait_seconds=2, swallow_exceptions=False)
+
+# How long resolved and unresolved addresses are trusted, in seconds
+CACHE_TTL = getattr(settings, 'GEOCODE_CACHE_TTL', 30 * 24 * 3600)
+NEGATIVE_CACHE_TTL = getattr(settings, 'GEOCODE_NEGATIVE_CACHE_TTL', 24 * 3600)
+MEMORY_CACHE_SIZE = getattr(settings, 'GEOCODE_MEMORY_CACHE_SIZE', 2048)
+
 
-def geocode_address(address):
-    """Return (lat, lng) or (None, None)."""
+def normalize_address(address):
+    """Lowercase and strip punctuation and repeated spaces from an address."""
     if not address:
-        return None, None
+        return ''
+    return ' '.join(re.sub(r'[^\w\s]', ' ', address.lower()).split())
+
+
+class MemoryCache:
+    """Small thread-safe LRU of normalized address -> ((lat, lng), expiry)."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= time.time():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return entry[0]
+
+    def set(self, key, coords, expires_at):
+        with self._lock:
+            self._data[key] = (coords, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+memory_cache = MemoryCache(MEMORY_CACHE_SIZE)
+
+# Lookups currently talking to the database or the geocoder, so that
+# concurrent requests for the same address wait for one result.
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = (None, None)
+
+
+def _cache_key(normalized):
+    return hashlib.sha1(normalized.encode('utf-8')).hexdigest()
+
+
+def _lookup(normalized, address, throttle=None, skip_negative=False):
+    """Database tier, then the upstream geocoder. Returns ((lat, lng), expiry)."""
+    from services.models import GeocodeCache
+
+    key = _cache_key(normalized)
+    row = GeocodeCache.objects.filter(key=key, expires_at__gt=timezone.now()).first()
+    if row is not None and not (skip_negative and row.latitude is None):
+        if row.latitude is None:
+            return (None, None), row.expires_at.timestamp()
+        return (float(row.latitude), float(row.longitude)), row.expires_at.timestamp()
+
+    if throttle is not None:
+        throttle()
     location = geocode(address)
     if location:
-        return location.latitude, location.longitude
-    return None, None
+        coords = (location.latitude, location.longitude)
+        ttl = CACHE_TTL
+    else:
+        coords = (None, None)
+        ttl = NEGATIVE_CACHE_TTL
+    expires_at = timezone.now() + timedelta(seconds=ttl)
+    GeocodeCache.objects.update_or_create(key=key, defaults={
+        'address': normalized,
+        'latitude': round(coords[0], 6) if coords[0] is not None else None,
+        'longitude': round(coords[1], 6) if coords[1] is not None else None,
+        'expires_at': expires_at,
+    })
+    return coords, expires_at.timestamp()
+
+
+def geocode_address(address, throttle=None, skip_negative=False):
+    """
+    Return (lat, lng) or (None, None).
+
+    throttle, if given, is called right before a request actually goes to
+    the upstream geocoder; cache hits never call it. skip_negative ignores
+    cached "not found" answers, for retries that must ask upstream again.
+    """
+    normalized = normalize_address(address)
+    if not normalized:
+        return None, None
+
+    coords = memory_cache.get(normalized)
+    if coords is not None and not (skip_negative and coords[0] is None):
+        return coords
+
+    # A retry must not settle for a concurrent lookup's cached negative
+    inflight_key = (normalized, skip_negative)
+    with _inflight_lock:
+        call = _inflight.get(inflight_key)
+        leader = call is None
+        if leader:
+            call = _inflight[inflight_key] = _Call()
+    if not leader:
+        call.done.wait()
+        return call.result
+
+    try:
+        coords, expires_at = _lookup(normalized, address, throttle, skip_negative)
+        memory_cache.set(normalized, coords, expires_at)
+        call.result = coords
+    except GeopyError:
+        # Upstream trouble: answer "unknown" without caching it anywhere
+        call.result = (None, None)
+    finally:
+        with _inflight_lock:
+            del _inflight[inflight_key]
+        call.done.set()
+    return call.result
+
+
+def geocode_addresses(addresses, throttle=None):
+    """
+    Geocode many addresses at once. Returns {address: (lat, lng)}.
+
+    Each distinct normalized address is resolved once; database cache hits
+    are loaded with a single query before anything goes upstream.
+    """
+    from services.models import GeocodeCache
+
+    by_normalized = {}
+    for address in addresses:
+        normalized = normalize_address(address)
+        if normalized:
+            by_normalized.setdefault(normalized, address)
+
+    missing = [n for n in by_normalized if memory_cache.get(n) is None]
+    keys = {_cache_key(n): n for n in missing}
+    for row in GeocodeCache.objects.filter(key__in=keys, expires_at__gt=timezone.now()):
+        coords = (None, None) if row.latitude is None else (float(row.latitude), float(row.longitude))
+        memory_cache.set(keys[row.key], coords, row.expires_at.timestamp())
+
+    resolved = {n: geocode_address(address, throttle) for n, address in by_normalized.items()}
+    return {address: resolved.get(normalize_address(address), (None, None)) for address in addresses}